@@ -0,0 +1,347 @@
+import asyncio
+import logging
+import math
+import sqlite3
+import threading
+import time
+from collections import deque
+from fastapi import HTTPException
+from starlette.responses import JSONResponse
+from .config import (
+    ADMISSION_MAX_IN_FLIGHT,
+    ADMISSION_MAX_IN_FLIGHT_BYTES,
+    ADMISSION_MAX_QUEUED,
+    ADMISSION_QUEUE_TIMEOUT_SECONDS,
+    EXECUTOR_RETRY_AFTER_SECONDS,
+    RATE_LIMIT_PER_SECOND,
+    RATE_LIMIT_BURST,
+    RATE_LIMIT_BACKEND,
+    RATE_LIMIT_SQLITE_PATH
+)
+from .metrics import REGISTRY, CallbackMetric, STAGE_DURATION, ADMISSION_REJECTED
+from .rules import MAX_FILE_BYTES
+
+logger = logging.getLogger(__name__)
+
+# Admission control and per-client rate limits for the upload endpoints. Both run as ASGI middleware, before
+# the request body is read - FastAPI parses (and spools) a multipart upload before the endpoint is called, so
+# by then a burst of large uploads has already been taken on. A client over its rate gets a 429, and a worker
+# with no room left a 503, both with a Retry-After header and without reading a byte of the upload.
+#
+# Requests are admitted while the worker has fewer than max_requests in flight and their declared sizes
+# (Content-Length, or MAX_FILE_BYTES without one) fit in max_bytes. A request that doesn't fit waits in a
+# short FIFO queue; its wait is recorded as the "admission_wait" stage.
+
+# POST paths under admission control - every endpoint that takes an upload
+ADMITTED_PATHS = ("/creative-approval", "/jobs")
+
+# Largest body each single-creative endpoint takes: the file, plus room for the multipart encoding and the
+# other form fields. FastAPI parses - and spools to disk - a whole multipart body before the endpoint runs,
+# so the limit is enforced here as the body arrives: a declared Content-Length over it is refused without
+# reading a byte, and a body without one is cut off as soon as it crosses it. The batch endpoint checks each
+# file and archive as it reads them
+MULTIPART_OVERHEAD_BYTES = 64 * 1024
+BODY_LIMITS = {
+    "/creative-approval": MAX_FILE_BYTES + MULTIPART_OVERHEAD_BYTES,
+    "/creative-approval/raw": MAX_FILE_BYTES,
+    "/jobs": MAX_FILE_BYTES + MULTIPART_OVERHEAD_BYTES
+}
+
+class Busy(Exception):
+    pass
+
+# Per-worker limits on in-flight requests and upload bytes. Only used from the event loop
+class AdmissionController:
+    def __init__(
+        self,
+        max_requests: int = ADMISSION_MAX_IN_FLIGHT,
+        max_bytes: int = ADMISSION_MAX_IN_FLIGHT_BYTES,
+        max_queued: int = ADMISSION_MAX_QUEUED,
+        queue_timeout: float = ADMISSION_QUEUE_TIMEOUT_SECONDS,
+        retry_after: int = EXECUTOR_RETRY_AFTER_SECONDS
+    ):
+        self.max_requests = max_requests
+        self.max_bytes = max_bytes
+        self.max_queued = max_queued
+        self.queue_timeout = queue_timeout
+        self.retry_after = retry_after
+        self.in_flight = 0
+        self.in_flight_bytes = 0
+        self._waiting: deque[tuple[int, asyncio.Future]] = deque()
+
+    # A request larger than max_bytes on its own is still admitted, once nothing else is in flight
+    def _fits(self, size: int) -> bool:
+        if self.in_flight >= self.max_requests:
+            return False
+        return self.in_flight == 0 or self.in_flight_bytes + size <= self.max_bytes
+
+    def _take(self, size: int) -> None:
+        self.in_flight += 1
+        self.in_flight_bytes += size
+
+    # Admit waiting requests, oldest first, while they fit
+    def _wake(self) -> None:
+        while self._waiting and self._fits(self._waiting[0][0]):
+            size, future = self._waiting.popleft()
+            if not future.done():
+                self._take(size)
+                future.set_result(None)
+
+    # Wait for room for a request of `size` bytes. Returns the seconds spent queued; raises Busy when the
+    # queue is full or the wait runs past queue_timeout
+    async def acquire(self, size: int) -> float:
+        if not self._waiting and self._fits(size):
+            self._take(size)
+            return 0.0
+        if len(self._waiting) >= self.max_queued or self.queue_timeout <= 0:
+            raise Busy()
+
+        start = time.perf_counter()
+        waiter = (size, asyncio.get_running_loop().create_future())
+        self._waiting.append(waiter)
+        try:
+            await asyncio.wait([waiter[1]], timeout=self.queue_timeout)
+        except asyncio.CancelledError:
+            # The client went away while queued - give the slot back if it was granted meanwhile
+            self._abandon(waiter)
+            raise
+        if not waiter[1].done():
+            self._abandon(waiter)
+            raise Busy()
+        return time.perf_counter() - start
+
+    def _abandon(self, waiter: tuple[int, asyncio.Future]) -> None:
+        if waiter[1].done():
+            self.release(waiter[0])
+        else:
+            waiter[1].cancel()
+            self._waiting.remove(waiter)
+
+    def release(self, size: int) -> None:
+        self.in_flight -= 1
+        self.in_flight_bytes -= size
+        self._wake()
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiting)
+
+# Token buckets per client, in this worker's memory. take() returns 0 when a request may go ahead,
+# else the seconds until the client's next token
+class MemoryRateLimiter:
+    def __init__(self, rate: float = RATE_LIMIT_PER_SECOND, burst: int = RATE_LIMIT_BURST, max_clients: int = 10000):
+        self.rate = rate
+        self.burst = burst
+        self.max_clients = max_clients
+        # client → (tokens, time of the last update)
+        self._buckets: dict[str, tuple[float, float]] = {}
+        self._lock = threading.Lock()
+
+    def take(self, client: str, now: float | None = None) -> float:
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            tokens, updated = self._buckets.get(client, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - updated) * self.rate)
+            if tokens < 1:
+                self._buckets[client] = (tokens, now)
+                return (1 - tokens) / self.rate
+            self._buckets[client] = (tokens - 1, now)
+            if len(self._buckets) > self.max_clients:
+                self._forget_idle(now)
+            return 0.0
+
+    # Drop buckets that have refilled - a client without a bucket starts with a full one anyway
+    def _forget_idle(self, now: float) -> None:
+        for client, (tokens, updated) in list(self._buckets.items()):
+            if tokens + (now - updated) * self.rate >= self.burst:
+                del self._buckets[client]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._buckets.clear()
+
+# Token buckets in a local SQLite file - shared by every uvicorn worker on the host, so a client's rate
+# is enforced across all of them. The file is opened on first use, in the process using it - never carried
+# across a fork. Each take() is one short write transaction, so the middleware runs it in a thread. A take() that can't get the write lock within busy_timeout lets the request through rather
+# than stall it, and buckets that have refilled are deleted every prune_interval seconds
+class SQLiteRateLimiter:
+    def __init__(
+        self,
+        path: str = RATE_LIMIT_SQLITE_PATH,
+        rate: float = RATE_LIMIT_PER_SECOND,
+        burst: int = RATE_LIMIT_BURST,
+        busy_timeout: float = 0.25,
+        prune_interval: float = 60
+    ):
+        self.path = path
+        self.rate = rate
+        self.burst = burst
+        self.busy_timeout = busy_timeout
+        self.prune_interval = prune_interval
+        self._pruned_at: float | None = None
+        self._lock = threading.Lock()
+        self._conn: sqlite3.Connection | None = None
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None, timeout=self.busy_timeout)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS buckets (client TEXT PRIMARY KEY, tokens REAL NOT NULL, updated_at REAL NOT NULL)"
+            )
+            self._conn = conn
+        return self._conn
+
+    def take(self, client: str, now: float | None = None) -> float:
+        now = time.time() if now is None else now
+        with self._lock:
+            try:
+                wait = self._take(client, now)
+                if self._pruned_at is None or now - self._pruned_at >= self.prune_interval:
+                    self._pruned_at = now
+                    self._forget_idle(now)
+            except sqlite3.OperationalError as e:
+                logger.warning("Rate limit check skipped: %s", e)
+                return 0.0
+        return wait
+
+    def _take(self, client: str, now: float) -> float:
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT tokens, updated_at FROM buckets WHERE client = ?", (client,)).fetchone()
+            tokens, updated = row if row is not None else (self.burst, now)
+            # Clocks of different workers can disagree slightly - never refill backwards
+            tokens = min(self.burst, tokens + max(0.0, now - updated) * self.rate)
+            wait = (1 - tokens) / self.rate if tokens < 1 else 0.0
+            conn.execute(
+                "INSERT OR REPLACE INTO buckets VALUES (?, ?, ?)", (client, tokens if wait else tokens - 1, max(now, updated))
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return wait
+
+    # Drop buckets that have refilled - a client without a bucket starts with a full one anyway
+    def _forget_idle(self, now: float) -> None:
+        self._connect().execute("DELETE FROM buckets WHERE tokens + (? - updated_at) * ? >= ?", (now, self.rate, self.burst))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._connect().execute("DELETE FROM buckets")
+
+def build_rate_limiter(
+    backend: str = RATE_LIMIT_BACKEND, rate: float = RATE_LIMIT_PER_SECOND
+) -> MemoryRateLimiter | SQLiteRateLimiter | None:
+    if rate <= 0:
+        return None
+    if backend == "memory":
+        return MemoryRateLimiter(rate)
+    if backend == "sqlite":
+        return SQLiteRateLimiter(rate=rate)
+    raise ValueError(f"Unknown rate limit backend: {backend}")
+
+ADMISSION = AdmissionController()
+RATE_LIMITER = build_rate_limiter()
+
+REGISTRY.register(CallbackMetric(
+    "creative_admission_in_flight", "Upload requests being evaluated by this worker", "gauge", lambda: ADMISSION.in_flight
+))
+REGISTRY.register(CallbackMetric(
+    "creative_admission_in_flight_bytes", "Declared upload bytes of the requests in flight", "gauge",
+    lambda: ADMISSION.in_flight_bytes
+))
+REGISTRY.register(CallbackMetric(
+    "creative_admission_queued", "Upload requests waiting for admission", "gauge", lambda: ADMISSION.queued
+))
+
+def client_id(scope) -> str:
+    for name, value in scope["headers"]:
+        if name == b"x-api-key":
+            return "key:" + value.decode("latin-1")
+    client = scope.get("client")
+    return "addr:" + (client[0] if client else "unknown")
+
+def content_length(scope) -> int | None:
+    for name, value in scope["headers"]:
+        if name == b"content-length" and value.isdigit():
+            return int(value)
+    return None
+
+def declared_size(scope) -> int:
+    size = content_length(scope)
+    return MAX_FILE_BYTES if size is None else size
+
+# Same detail as the endpoints' own size checks
+def too_large(size: int | None = None) -> HTTPException:
+    limit_mb = round(MAX_FILE_BYTES / (1024 * 1024))
+    if size is None:
+        return HTTPException(status_code=422, detail=f"File too large: over {limit_mb} MB limit")
+    return HTTPException(status_code=422, detail=f"File too large: {round(size / (1024 * 1024), 2)} MB (limit {limit_mb} MB)")
+
+# Pass the body through, raising a 422 once more than limit bytes have arrived
+def limit_body(receive, limit: int):
+    received = 0
+
+    async def limited():
+        nonlocal received
+        message = await receive()
+        if message["type"] == "http.request":
+            received += len(message.get("body", b""))
+            if received > limit:
+                raise too_large()
+        return message
+
+    return limited
+
+def rejection(status_code: int, detail: str, retry_after: float) -> JSONResponse:
+    return JSONResponse(
+        {"detail": detail}, status_code=status_code, headers={"Retry-After": str(max(1, math.ceil(retry_after)))}
+    )
+
+# Limit the body size, rate limit, then admit every POST to the upload endpoints; everything else passes straight through
+class AdmissionMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "POST" or not scope["path"].startswith(ADMITTED_PATHS):
+            await self.app(scope, receive, send)
+            return
+
+        limit = BODY_LIMITS.get(scope["path"])
+        if limit is not None:
+            size = content_length(scope)
+            if size is not None and size > limit:
+                error = too_large(size)
+                await JSONResponse({"detail": error.detail}, status_code=error.status_code)(scope, receive, send)
+                return
+            receive = limit_body(receive, limit)
+
+        if RATE_LIMITER is not None:
+            if isinstance(RATE_LIMITER, SQLiteRateLimiter):
+                wait = await asyncio.to_thread(RATE_LIMITER.take, client_id(scope))
+            else:
+                wait = RATE_LIMITER.take(client_id(scope))
+            if wait:
+                ADMISSION_REJECTED.inc(reason="rate_limited")
+                response = rejection(429, "Rate limit exceeded for this client. Please retry.", wait)
+                await response(scope, receive, send)
+                return
+
+        size = declared_size(scope)
+        try:
+            queued = await ADMISSION.acquire(size)
+        except Busy:
+            ADMISSION_REJECTED.inc(reason="busy")
+            response = rejection(503, "Server busy: too many uploads in progress. Please retry.", ADMISSION.retry_after)
+            await response(scope, receive, send)
+            return
+
+        STAGE_DURATION.observe(queued, stage="admission_wait")
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            ADMISSION.release(size)
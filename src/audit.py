@@ -0,0 +1,376 @@
+import argparse
+import asyncio
+import csv
+import io
+import json
+import logging
+import os
+import sqlite3
+import sys
+import tempfile
+from collections import Counter
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, as_completed, wait
+from typing import Iterator
+from fastapi import HTTPException
+from .config import AUDIT_WORKERS, AUDIT_CHECKPOINT_EVERY
+from .engine import RuleEngine
+from .executor import ENGINE
+from .models import AuditRecord, BatchItemError
+from .ocr import check_ocr_engine
+from .pipeline import parse_metadata
+from .rules import MAX_FILE_BYTES
+from .services import ImageRejected
+from .upload import UploadBuffer
+
+logger = logging.getLogger(__name__)
+
+# Bulk audit: python -m src.audit SOURCE -o OUTPUT
+#
+# Re-runs stored creatives through the same rule sets and checks as /creative-approval, without HTTP -
+# e.g. every creative on file after terms.py or rules.py change. SOURCE is a directory (walked recursively,
+# in sorted order, for PNG/JPEG/GIF files) or a manifest with one creative per line: a path, or a JSON
+# object {"path": ..., "metadata": {...}}. Paths in a manifest are relative to the manifest.
+#
+# A pool of worker processes reads and evaluates the creatives (the parent never holds their bytes), and
+# results are appended to OUTPUT - NDJSON, or CSV - in the order they finish. At most IN_FLIGHT_PER_WORKER
+# creatives per worker are queued at a time, so memory stays flat however large the corpus.
+#
+# OUTPUT.checkpoint records how far the run got: every creative before `completed` in the walk order, plus
+# those listed in `ahead`, are in OUTPUT's first `offset` bytes. --resume truncates OUTPUT back to the
+# offset and skips those creatives, so an interrupted run continues without duplicates. The checkpoint is
+# removed once the run finishes. --diff compares each decision to a previous run's output (either format),
+# which is loaded into a temporary SQLite file rather than memory.
+
+# The same rule sets as the service, but audits leave the near-duplicate index alone: re-running old
+# creatives mustn't fill it with them, or hand their outcomes to look-alikes uploaded later
+AUDIT_RULES = RuleEngine(phash_mode="off")
+
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".gif")
+IN_FLIGHT_PER_WORKER = 4
+
+# Status recorded for a creative that couldn't be evaluated; its reasons are the error detail
+ERROR_STATUS = "ERROR"
+
+CSV_FIELDS = [
+    "path", "sha256", "rules_version", "status", "reasons", "img_format", "img_width", "img_height",
+    "img_size_mb", "error_status_code", "previous_status", "previous_reasons", "changed"
+]
+
+# Creatives to audit, in a stable order: (path as reported, location on disk, raw metadata)
+def iter_creatives(source: str, metadata: dict | None = None) -> Iterator[tuple[str, str, dict | None]]:
+    if os.path.isdir(source):
+        for root, dirs, files in os.walk(source):
+            dirs[:] = sorted(name for name in dirs if not name.startswith("."))
+            for name in sorted(files):
+                if name.startswith(".") or not name.lower().endswith(IMAGE_EXTENSIONS):
+                    continue
+                location = os.path.join(root, name)
+                yield os.path.relpath(location, source).replace(os.sep, "/"), location, metadata
+        return
+
+    base = os.path.dirname(os.path.abspath(source))
+    with open(source) as manifest:
+        for number, line in enumerate(manifest, 1):
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            if not line.startswith("{"):
+                yield line, os.path.join(base, line), metadata
+                continue
+            try:
+                entry = json.loads(line)
+            except ValueError as e:
+                raise ValueError(f"{source}:{number}: invalid manifest entry: {e}")
+            if not isinstance(entry.get("path"), str):
+                raise ValueError(f"{source}:{number}: manifest entry has no path")
+            yield entry["path"], os.path.join(base, entry["path"]), entry.get("metadata", metadata)
+
+# Read a creative from disk, with the same size limit as an upload
+def read_creative(location: str) -> UploadBuffer:
+    with open(location, "rb") as file:
+        size = os.fstat(file.fileno()).st_size
+        if size > MAX_FILE_BYTES:
+            limit_mb = round(MAX_FILE_BYTES / (1024 * 1024))
+            raise HTTPException(status_code=422, detail=f"File too large: {round(size / (1024 * 1024), 2)} MB (limit {limit_mb} MB)")
+        return UploadBuffer(file.read())
+
+_loop: asyncio.AbstractEventLoop | None = None
+
+# Worker process setup: image analysis runs inline (the audit pool is the parallelism), on the worker's own loop
+def init_worker() -> None:
+    global _loop
+    ENGINE.mode = "inline"
+    _loop = asyncio.new_event_loop()
+
+# Evaluate one creative under its market's current rule set. Failures are recorded, like a batch item's
+def audit_creative(path: str, location: str, metadata: dict | None) -> AuditRecord:
+    global _loop
+    if _loop is None:
+        _loop = asyncio.new_event_loop()
+
+    record = AuditRecord(path=path)
+    try:
+        meta = parse_metadata(metadata)
+        ruleset = AUDIT_RULES.ruleset_for(meta.market)
+        record.rules_version = ruleset.version
+        contents = read_creative(location)
+        record.sha256 = contents.digest
+        record.result = _loop.run_until_complete(ruleset.evaluate(contents, os.path.basename(location), meta))
+    except HTTPException as e:
+        record.error = BatchItemError(status_code=e.status_code, detail=e.detail)
+    except ImageRejected as e:
+        record.error = BatchItemError(status_code=422, detail=e.detail)
+    except OSError as e:
+        record.error = BatchItemError(status_code=422, detail=f"Could not read file: {e.strerror}")
+    except Exception:
+        logger.exception("Unexpected error auditing %s", path)
+        record.error = BatchItemError(status_code=500, detail="Unexpected error evaluating creative")
+    return record
+
+# A record's decision: its status and reason messages, or ERROR and the error detail
+def decision(record: AuditRecord) -> tuple[str, list[str]]:
+    if record.result is not None:
+        return record.result.status, [str(reason) for reason in record.result.reasons]
+    detail = record.error.detail if record.error else ""
+    return ERROR_STATUS, [detail if isinstance(detail, str) else json.dumps(detail)]
+
+def csv_row(record: AuditRecord) -> list:
+    status, reasons = decision(record)
+    result = record.result
+    return [
+        record.path, record.sha256, record.rules_version, status, json.dumps(reasons),
+        result.img_format if result else None, result.img_width if result else None,
+        result.img_height if result else None, result.img_size_mb if result else None,
+        record.error.status_code if record.error else None, record.previous_status,
+        json.dumps(record.previous_reasons) if record.previous_reasons is not None else None, record.changed
+    ]
+
+def csv_line(values: list) -> bytes:
+    line = io.StringIO()
+    csv.writer(line).writerow(values)
+    return line.getvalue().encode()
+
+def encode_record(record: AuditRecord, format: str) -> bytes:
+    if format == "csv":
+        return csv_line(csv_row(record))
+    return (record.model_dump_json() + "\n").encode()
+
+def output_format(path: str) -> str:
+    return "csv" if path.lower().endswith(".csv") else "ndjson"
+
+# (path, status, reasons) for every creative in an audit output file, NDJSON or CSV
+def read_decisions(path: str) -> Iterator[tuple[str, str, list[str]]]:
+    with open(path, newline="") as output:
+        if output_format(path) == "csv":
+            for row in csv.DictReader(output):
+                yield row["path"], row["status"], json.loads(row["reasons"])
+            return
+        for line in output:
+            if line.strip():
+                record = AuditRecord.model_validate_json(line)
+                yield (record.path, *decision(record))
+
+# Decisions from a previous run, keyed by path, in a temporary SQLite file so a large run isn't held in memory
+class PreviousRun:
+    def __init__(self, path: str):
+        self._dir = tempfile.TemporaryDirectory()
+        self._conn = sqlite3.connect(os.path.join(self._dir.name, "previous.sqlite3"))
+        self._conn.execute("CREATE TABLE decisions (path TEXT PRIMARY KEY, status TEXT NOT NULL, reasons TEXT NOT NULL)")
+        self._conn.executemany(
+            "INSERT OR REPLACE INTO decisions VALUES (?, ?, ?)",
+            ((creative, status, json.dumps(reasons)) for creative, status, reasons in read_decisions(path))
+        )
+        self._conn.commit()
+
+    def get(self, path: str) -> tuple[str, list[str]] | None:
+        row = self._conn.execute("SELECT status, reasons FROM decisions WHERE path = ?", (path,)).fetchone()
+        return (row[0], json.loads(row[1])) if row else None
+
+    def close(self) -> None:
+        self._conn.close()
+        self._dir.cleanup()
+
+# Which creatives, by position in the walk order, are already in the output
+class Progress:
+    def __init__(self, completed: int = 0, ahead: list[int] = ()):
+        self.completed = completed
+        self.ahead = set(ahead)
+
+    def __contains__(self, index: int) -> bool:
+        return index < self.completed or index in self.ahead
+
+    def done(self, index: int) -> None:
+        self.ahead.add(index)
+        while self.completed in self.ahead:
+            self.ahead.remove(self.completed)
+            self.completed += 1
+
+# Counts for the end-of-run report: decisions this run, and with --diff, each change from the previous run
+class AuditSummary:
+    def __init__(self):
+        self.audited = 0
+        self.skipped = 0
+        self.statuses: Counter[str] = Counter()
+        self.changes: Counter[tuple[str, str]] = Counter()
+
+    def add(self, record: AuditRecord) -> None:
+        self.audited += 1
+        self.statuses[decision(record)[0]] += 1
+        if record.changed:
+            self.changes[record.previous_status or "new", decision(record)[0]] += 1
+
+    def __str__(self) -> str:
+        statuses = ", ".join(f"{status} {count}" for status, count in sorted(self.statuses.items()))
+        lines = [f"Audited {self.audited} creatives ({self.skipped} already done): {statuses or 'none'}"]
+        if self.changes:
+            changes = ", ".join(f"{old} → {new} {count}" for (old, new), count in sorted(self.changes.items()))
+            lines.append(f"Changed decisions: {sum(self.changes.values())} ({changes})")
+        return "\n".join(lines)
+
+def checkpoint_path(output: str) -> str:
+    return output + ".checkpoint"
+
+# Written to a temporary file and renamed into place, so a crash never leaves half a checkpoint
+def write_checkpoint(path: str, state: dict) -> None:
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), suffix=".tmp")
+    with os.fdopen(fd, "w") as checkpoint:
+        json.dump(state, checkpoint)
+    os.replace(tmp, path)
+
+def load_checkpoint(path: str, source: str, format: str) -> dict | None:
+    if not os.path.exists(path):
+        return None
+    with open(path) as checkpoint:
+        state = json.load(checkpoint)
+    if state["source"] != os.path.abspath(source) or state["format"] != format:
+        raise ValueError(f"{path} is a checkpoint for {state['source']} ({state['format']}), not {source} ({format})")
+    return state
+
+# Audit every creative in source into output. workers=0 evaluates in this process
+def run_audit(
+    source: str,
+    output: str,
+    format: str | None = None,
+    workers: int = AUDIT_WORKERS,
+    resume: bool = False,
+    previous_path: str | None = None,
+    metadata: dict | None = None,
+    checkpoint_every: int = AUDIT_CHECKPOINT_EVERY
+) -> AuditSummary:
+    format = format or output_format(output)
+    checkpoint = checkpoint_path(output)
+    state = load_checkpoint(checkpoint, source, format) if resume else None
+    progress = Progress(state["completed"], state["ahead"]) if state else Progress()
+    previous = PreviousRun(previous_path) if previous_path else None
+    summary = AuditSummary()
+    # Output up to the last whole record
+    offset = state["offset"] if state else 0
+
+    out = open(output, "r+b" if state else "wb")
+    if state:
+        out.truncate(state["offset"])
+        out.seek(state["offset"])
+    elif format == "csv":
+        out.write(csv_line(CSV_FIELDS))
+        offset = out.tell()
+
+    def save_checkpoint() -> None:
+        out.flush()
+        write_checkpoint(checkpoint, {
+            "source": os.path.abspath(source),
+            "format": format,
+            "offset": offset,
+            "completed": progress.completed,
+            "ahead": sorted(progress.ahead)
+        })
+
+    def write(index: int, record: AuditRecord) -> None:
+        nonlocal offset
+        if previous is not None:
+            before = previous.get(record.path)
+            if before is not None:
+                record.previous_status, record.previous_reasons = before
+            record.changed = before != decision(record)
+        out.write(encode_record(record, format))
+        offset = out.tell()
+        progress.done(index)
+        summary.add(record)
+        if summary.audited % checkpoint_every == 0:
+            save_checkpoint()
+
+    def pending_creatives():
+        for index, creative in enumerate(iter_creatives(source, metadata)):
+            if index in progress:
+                summary.skipped += 1
+            else:
+                yield index, creative
+
+    try:
+        if workers <= 0:
+            for index, creative in pending_creatives():
+                write(index, audit_creative(*creative))
+        else:
+            pool = ProcessPoolExecutor(max_workers=workers, initializer=init_worker)
+            try:
+                in_flight = {}
+                for index, creative in pending_creatives():
+                    if len(in_flight) >= workers * IN_FLIGHT_PER_WORKER:
+                        finished, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                        for future in finished:
+                            write(in_flight.pop(future), future.result())
+                    in_flight[pool.submit(audit_creative, *creative)] = index
+                for future in as_completed(in_flight):
+                    write(in_flight[future], future.result())
+            finally:
+                pool.shutdown(wait=True, cancel_futures=True)
+    except BaseException:
+        # Keep what finished, so --resume picks up from here
+        save_checkpoint()
+        raise
+    else:
+        out.flush()
+        if os.path.exists(checkpoint):
+            os.remove(checkpoint)
+    finally:
+        out.close()
+        if previous is not None:
+            previous.close()
+
+    return summary
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m src.audit", description="Audit stored creatives against the current rules")
+    parser.add_argument("source", help="directory of creatives, or a manifest file with one creative per line")
+    parser.add_argument("-o", "--output", required=True, help="results file (.ndjson or .csv)")
+    parser.add_argument("--format", choices=("ndjson", "csv"), help="output format (default: from the output file's extension)")
+    parser.add_argument("--workers", type=int, default=AUDIT_WORKERS, help="worker processes (0: evaluate in this process)")
+    parser.add_argument("--metadata", help="JSON metadata for creatives without their own, e.g. '{\"market\": \"UK\"}'")
+    parser.add_argument("--resume", action="store_true", help="continue an interrupted run from OUTPUT.checkpoint")
+    parser.add_argument("--diff", metavar="PREVIOUS", help="compare each decision with a previous run's output")
+    args = parser.parse_args(argv)
+
+    metadata = None
+    if args.metadata:
+        try:
+            metadata = parse_metadata(args.metadata).model_dump(exclude_none=True)
+        except HTTPException as e:
+            parser.error(f"invalid --metadata: {e.detail}")
+
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s:     %(message)s")
+    if args.workers <= 0:
+        init_worker()
+    try:
+        check_ocr_engine()
+        summary = run_audit(args.source, args.output, args.format, args.workers, args.resume, args.diff, metadata)
+    except KeyboardInterrupt:
+        print(f"Interrupted - continue with --resume ({checkpoint_path(args.output)})", file=sys.stderr)
+        return 130
+    except (OSError, ValueError, RuntimeError) as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 1
+
+    print(summary, file=sys.stderr)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
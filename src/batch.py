@@ -0,0 +1,124 @@
+import asyncio
+import json
+import zipfile
+from typing import AsyncIterator, Awaitable, Callable
+from fastapi import HTTPException, UploadFile
+from .config import BATCH_MAX_ITEMS, BATCH_CONCURRENCY, BATCH_MAX_ZIP_BYTES
+from .metrics import STAGE_DURATION
+from .models import BatchItemError, BatchItemResult
+from .pipeline import evaluate_creative, parse_metadata
+from .rules import MAX_FILE_BYTES
+from .services import ImageRejected, read_file
+from .upload import Contents
+
+ZIP_CONTENT_TYPES = ("application/zip", "application/x-zip-compressed")
+
+# One creative in a batch: its position, filename, and a loader for its bytes.
+# Bytes are only loaded once the item is being evaluated, so at most BATCH_CONCURRENCY
+# creatives are held in memory at a time
+class BatchItem:
+    def __init__(self, index: int, filename: str | None, load: Callable[[], Awaitable[Contents]]):
+        self.index = index
+        self.filename = filename
+        self.load = load
+
+def is_zip_upload(file: UploadFile) -> bool:
+    return file.content_type in ZIP_CONTENT_TYPES or (file.filename or "").lower().endswith(".zip")
+
+# Read one archive member, enforcing MAX_FILE_BYTES on the decompressed size (the header's size can't be trusted)
+def read_zip_member(archive: zipfile.ZipFile, info: zipfile.ZipInfo) -> bytes:
+    limit_mb = round(MAX_FILE_BYTES / (1024 * 1024))
+    if info.file_size > MAX_FILE_BYTES:
+        raise HTTPException(status_code=422, detail=f"File too large: over {limit_mb} MB limit")
+
+    with archive.open(info) as member:
+        contents = member.read(MAX_FILE_BYTES + 1)
+    if len(contents) > MAX_FILE_BYTES:
+        raise HTTPException(status_code=422, detail=f"File too large: over {limit_mb} MB limit")
+    return contents
+
+# Expand the uploads into batch items - plain files as they are, zip archives into one item per image
+async def collect_items(files: list[UploadFile]) -> list[BatchItem]:
+    items: list[BatchItem] = []
+
+    for file in files:
+        if not is_zip_upload(file):
+            items.append(BatchItem(len(items), file.filename, lambda file=file: read_file(file)))
+            continue
+
+        try:
+            archive = zipfile.ZipFile((await read_file(file, max_bytes=BATCH_MAX_ZIP_BYTES)).open())
+        except zipfile.BadZipFile:
+            raise HTTPException(status_code=422, detail=f"Invalid zip archive: {file.filename}")
+
+        for info in archive.infolist():
+            name = info.filename.rsplit("/", 1)[-1]
+            if info.is_dir() or not name or name.startswith(".") or info.filename.startswith("__MACOSX/"):
+                continue
+
+            async def load(archive=archive, info=info) -> bytes:
+                return read_zip_member(archive, info)
+
+            items.append(BatchItem(len(items), name, load))
+
+    if len(items) > BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=422, detail=f"Too many creatives: {len(items)} (limit {BATCH_MAX_ITEMS})")
+
+    return items
+
+# Parse batch metadata: a JSON list with one entry per creative (in upload/archive order),
+# or a JSON object keyed by filename. Entries are validated per item, so one bad entry only fails its own creative
+def parse_batch_metadata(metadata: str | None, items: list[BatchItem]) -> list:
+    if not metadata:
+        return [None] * len(items)
+
+    try:
+        parsed = json.loads(metadata)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=f"Invalid batch metadata: {e}")
+
+    if isinstance(parsed, list):
+        if len(parsed) != len(items):
+            raise HTTPException(
+                status_code=422,
+                detail=f"Batch metadata has {len(parsed)} entries for {len(items)} creatives"
+            )
+        return parsed
+
+    if isinstance(parsed, dict):
+        return [parsed.get(item.filename) for item in items]
+
+    raise HTTPException(status_code=422, detail="Batch metadata must be a JSON list or object")
+
+# Evaluate every item with bounded parallelism, yielding each result as soon as it finishes.
+# Failures are captured per item and never abort the rest of the batch
+async def evaluate_batch(
+    items: list[BatchItem],
+    metadata: list,
+    concurrency: int = BATCH_CONCURRENCY
+) -> AsyncIterator[BatchItemResult]:
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def run(item: BatchItem, raw_meta) -> BatchItemResult:
+        async with semaphore:
+            try:
+                meta = parse_metadata(raw_meta)
+                with STAGE_DURATION.time(stage="upload_read"):
+                    contents = await item.load()
+                result = await evaluate_creative(contents, item.filename, meta)
+                return BatchItemResult(index=item.index, filename=item.filename, result=result)
+            except HTTPException as e:
+                error = BatchItemError(status_code=e.status_code, detail=e.detail)
+            except ImageRejected as e:
+                error = BatchItemError(status_code=422, detail=e.detail)
+            except Exception:
+                error = BatchItemError(status_code=500, detail="Unexpected error evaluating creative")
+            return BatchItemResult(index=item.index, filename=item.filename, error=error)
+
+    tasks = [asyncio.create_task(run(item, raw_meta)) for item, raw_meta in zip(items, metadata)]
+    try:
+        for task in asyncio.as_completed(tasks):
+            yield await task
+    finally:
+        for task in tasks:
+            task.cancel()
@@ -0,0 +1,221 @@
+import hashlib
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from fastapi import HTTPException
+from . import rules, terms
+from .config import (
+    CACHE_BACKEND,
+    CACHE_MAX_ENTRIES,
+    CACHE_TTL_SECONDS,
+    CACHE_SQLITE_PATH
+)
+from .executor import ENGINE
+from .metrics import REGISTRY, CallbackMetric
+from .models import CreativeApprovalResponse, Metadata
+from .upload import Contents, as_upload
+
+logger = logging.getLogger(__name__)
+
+# Result cache for /creative-approval - re-submitting the same creative bytes with the same
+# filename and metadata returns the stored response without decoding the image again.
+
+# Version of the rules and terms tables: any change to a threshold or keyword list changes
+# every cache key, so stale decisions are never served after a deploy
+def tables_version(*modules) -> str:
+    digest = hashlib.sha256()
+    for module in modules:
+        for name in sorted(vars(module)):
+            if name.isupper():
+                digest.update(f"{module.__name__}.{name}={getattr(module, name)!r};".encode())
+    return digest.hexdigest()[:16]
+
+RULES_VERSION = tables_version(rules, terms)
+
+# Cache key: hash of the file bytes (taken when the upload was read), the filename, the normalised
+# metadata and the tables version
+def cache_key(contents: Contents, filename: str | None, meta: Metadata, version: str = RULES_VERSION) -> str:
+    digest = hashlib.sha256(as_upload(contents).digest.encode())
+    digest.update(b"\0" + (filename or "").encode())
+    digest.update(b"\0" + meta.model_dump_json(exclude_none=True).encode())
+    digest.update(b"\0" + version.encode())
+    return digest.hexdigest()
+
+# Bounded in-memory LRU with a TTL - per worker process
+class MemoryCache:
+    def __init__(self, max_entries: int = CACHE_MAX_ENTRIES, ttl: float = CACHE_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: OrderedDict[str, tuple[float, CreativeApprovalResponse]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> CreativeApprovalResponse | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, response = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return response
+
+    def set(self, key: str, response: CreativeApprovalResponse) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, response)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+# Local SQLite file - shared by every uvicorn worker on the host, and survives restarts. Responses are stored
+# with their reason codes, so a cached result can still be served with ?reason_codes=true.
+# Calls are blocking (ResultCache runs them on the executor's I/O threads). One that can't get the file's
+# lock within busy_timeout is a miss, or isn't stored. Expired and least recently used entries are pruned
+# every max_entries / 10 writes, so each worker can take the table up to 10% past max_entries in between
+class SQLiteCache:
+    def __init__(
+        self,
+        path: str = CACHE_SQLITE_PATH,
+        max_entries: int = CACHE_MAX_ENTRIES,
+        ttl: float = CACHE_TTL_SECONDS,
+        busy_timeout: float = 0.25
+    ):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.busy_timeout = busy_timeout
+        self.prune_every = max(1, max_entries // 10)
+        self._writes = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=busy_timeout)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS results ("
+            "key TEXT PRIMARY KEY, response TEXT NOT NULL, expires_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+        )
+
+    def get(self, key: str) -> CreativeApprovalResponse | None:
+        now = time.time()
+        try:
+            with self._lock:
+                row = self._conn.execute(
+                    "SELECT response FROM results WHERE key = ? AND expires_at >= ?", (key, now)
+                ).fetchone()
+                if row is None:
+                    return None
+                self._conn.execute("UPDATE results SET accessed_at = ? WHERE key = ?", (now, key))
+        except sqlite3.OperationalError as e:
+            logger.warning("Result cache lookup skipped: %s", e)
+            return None
+        return CreativeApprovalResponse.model_validate_json(row[0])
+
+    def set(self, key: str, response: CreativeApprovalResponse) -> None:
+        now = time.time()
+        try:
+            with self._lock:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?)",
+                    (key, response.model_dump_json(context={"reason_codes": True}), now + self.ttl, now)
+                )
+                self._writes += 1
+                if self._writes >= self.prune_every:
+                    self._writes = 0
+                    self._prune(now)
+        except sqlite3.OperationalError as e:
+            logger.warning("Result not cached: %s", e)
+
+    # Drop expired entries, then the least recently used ones over the limit
+    def _prune(self, now: float) -> None:
+        self._conn.execute("DELETE FROM results WHERE expires_at < ?", (now,))
+        self._conn.execute(
+            "DELETE FROM results WHERE key IN ("
+            "SELECT key FROM results ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,)
+        )
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM results")
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+
+# Front for whichever backend is configured - counts hits and misses
+class ResultCache:
+    def __init__(self, backend: MemoryCache | SQLiteCache | None):
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.backend is not None
+
+    # The SQLite backend blocks on its file, so it runs on the executor's I/O threads. With those saturated,
+    # a lookup is a miss and a result isn't stored
+    async def _call(self, fn, *args):
+        if isinstance(self.backend, SQLiteCache):
+            return await ENGINE.run_io(fn, *args)
+        return fn(*args)
+
+    async def get(self, key: str) -> CreativeApprovalResponse | None:
+        if self.backend is None:
+            return None
+        try:
+            response = await self._call(self.backend.get, key)
+        except HTTPException:
+            response = None
+        if response is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return response
+
+    async def set(self, key: str, response: CreativeApprovalResponse) -> None:
+        if self.backend is None:
+            return
+        try:
+            await self._call(self.backend.set, key, response)
+        except HTTPException:
+            pass
+
+    def clear(self) -> None:
+        self.hits = self.misses = 0
+        if self.backend is not None:
+            self.backend.clear()
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self.backend) if self.backend is not None else 0,
+            "hits": self.hits,
+            "misses": self.misses
+        }
+
+def build_cache(backend: str = CACHE_BACKEND) -> ResultCache:
+    if backend == "memory":
+        return ResultCache(MemoryCache())
+    if backend == "sqlite":
+        return ResultCache(SQLiteCache())
+    if backend == "none":
+        return ResultCache(None)
+    raise ValueError(f"Unknown cache backend: {backend}")
+
+RESULT_CACHE = build_cache()
+
+REGISTRY.register(CallbackMetric(
+    "creative_cache_hits_total", "Result cache hits", "counter", lambda: RESULT_CACHE.hits
+))
+REGISTRY.register(CallbackMetric(
+    "creative_cache_misses_total", "Result cache misses", "counter", lambda: RESULT_CACHE.misses
+))
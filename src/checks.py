@@ -1,33 +1,97 @@
-from .terms import (
-    PROHIBITED_THEMES_KEYWORDS, 
-    AGE_PROHIBITED_THEMES_KEYWORDS,
-    RESTRICTED_THEMES_KEYWORDS,
-    RESTRICTED_COUNTRY_KEYWORDS
-)
 from .constants import (
     STATUS_APPROVED,
     STATUS_REJECTED,
     STATUS_REQUIRES_REVIEW
 )
-from .models import Metadata
+from .matcher import (
+    TokenMatcher,
+    KEYWORD_MATCHER,
+    PROHIBITED,
+    AGE_PROHIBITED,
+    RESTRICTED,
+    RESTRICTED_COUNTRY
+)
+from .models import ImageAnalysis, Metadata, Thresholds
+from .reasons import Reason
 from .services import is_child_audience, is_child_placement
 
+# Every check returns a status and the reasons for it - codes and values, only rendered as messages when the
+# response is serialised (see reasons.py)
+
+# Check resolution is within the min/max dimensions.
+# Too small → REQUIRES_REVIEW; too large → REJECTED
+def check_resolution(width: int, height: int, thresholds: Thresholds = Thresholds()) -> tuple[str, list[Reason]]:
+    status, reasons = STATUS_APPROVED, []
+
+    if width < thresholds.min_width or height < thresholds.min_height:
+        status = STATUS_REQUIRES_REVIEW
+        reasons.append(Reason("resolution_too_low", width, height))
+
+    if width > thresholds.max_width or height > thresholds.max_height:
+        status = STATUS_REJECTED
+        reasons.append(Reason("resolution_too_high", width, height))
+
+    return status, reasons
+
+# Check aspect ratio is within bounds, e.g. no wider than 2:1 or taller than 1:2
+def check_aspect_ratio(width: int, height: int, thresholds: Thresholds = Thresholds()) -> tuple[str, list[Reason]]:
+    aspect_ratio = width / height
+    if aspect_ratio > thresholds.max_aspect_ratio or aspect_ratio < thresholds.min_aspect_ratio:
+        bounds = (thresholds.min_aspect_ratio, thresholds.max_aspect_ratio)
+        return STATUS_REQUIRES_REVIEW, [Reason("aspect_ratio_out_of_bounds", *bounds, aspect_ratio)]
+
+    return STATUS_APPROVED, []
+
+# Check GIFs aren't too complex, changing frames too fast, or flashing (more than 3 flashes in any second, per WCAG 2.3.1)
+def check_gif(analysis: ImageAnalysis, thresholds: Thresholds = Thresholds()) -> tuple[str, list[Reason]]:
+    reasons = []
+
+    # A truncated frame count stopped at the limit - the GIF has more frames than that
+    if analysis.frames_truncated or analysis.frame_count > thresholds.max_gif_frames:
+        code = "gif_too_complex_truncated" if analysis.frames_truncated else "gif_too_complex"
+        reasons.append(Reason(code, analysis.frame_count))
+
+    if analysis.fps > thresholds.max_gif_fps:
+        reasons.append(Reason("gif_framerate_too_high", analysis.fps))
+
+    if analysis.flashes_per_second > thresholds.max_gif_flashes_per_second:
+        reasons.append(Reason("gif_flashing", analysis.flashes_per_second))
+
+    if reasons:
+        return STATUS_REQUIRES_REVIEW, reasons
+
+    return STATUS_APPROVED, []
+
+# Check contrast is high enough for the creative to be legible
+def check_contrast(analysis: ImageAnalysis, thresholds: Thresholds = Thresholds()) -> tuple[str, list[Reason]]:
+    reasons = []
+
+    if analysis.contrast < thresholds.min_contrast:
+        reasons.append(Reason("contrast_too_low", analysis.contrast))
+
+    # WCAG contrast ratio between the darkest and lightest tones - off by default (every image is at least 1:1);
+    # a rule set can require e.g. 3 for the WCAG AA minimum for graphics and large text
+    if analysis.luminance_ratio < thresholds.min_luminance_ratio:
+        reasons.append(Reason("luminance_range_too_narrow", analysis.luminance_ratio))
+
+    if reasons:
+        return STATUS_REQUIRES_REVIEW, reasons
+
+    return STATUS_APPROVED, []
+
 # Check filename doesn't contain any prohibited terms or restricted themes/country names
-def check_filename(filename: str) -> tuple[str, list[str]]:
-    text = filename.lower()
+def check_filename(filename: str, matcher: TokenMatcher = KEYWORD_MATCHER) -> tuple[str, list[Reason]]:
+    hits = matcher.scan(filename)
     reasons = []
 
-    for word in PROHIBITED_THEMES_KEYWORDS:
-        if word in text:
-            return STATUS_REJECTED, [f"Prohibited term in filename: {word}"]
+    for word in hits.get(PROHIBITED, []):
+        return STATUS_REJECTED, [Reason("prohibited_term_filename", word)]
 
-    for word in RESTRICTED_THEMES_KEYWORDS:
-        if word in text:
-            reasons.append(f"Restricted term in filename: {word}")
+    for word in hits.get(RESTRICTED, []):
+        reasons.append(Reason("restricted_term_filename", word))
 
-    for word in RESTRICTED_COUNTRY_KEYWORDS:
-        if word in text:
-            reasons.append(f"Restricted country name in filename: {word}")
+    for word in hits.get(RESTRICTED_COUNTRY, []):
+        reasons.append(Reason("restricted_country_filename", word))
 
     if reasons:
         return STATUS_REQUIRES_REVIEW, reasons
@@ -36,60 +100,56 @@ def check_filename(filename: str) -> tuple[str, list[str]]:
 
 # Check the metadata doesn't contain any prohibited terms or restricted themes/country names.
 # Also checks for any age prohibited themes if placement or audience is child related
-def check_metadata(meta: Metadata) -> tuple[str, list[str]]:
+def check_metadata(meta: Metadata, matcher: TokenMatcher = KEYWORD_MATCHER) -> tuple[str, list[Reason]]:
     reasons = []
     text_fields = [meta.market, meta.placement, meta.audience, meta.category]
 
-    # Flatten into a single lowercase string for scanning
-    combined_text = " ".join([t for t in text_fields if t]).lower()
+    # Flatten into a single string and scan it once for every keyword list (the matcher normalises case)
+    combined_text = " ".join([t for t in text_fields if t])
+    hits = matcher.scan(combined_text)
 
     placement = (meta.placement or "").lower()
-    market = (meta.market or "").lower()
+    market = meta.market or ""
+
+    # Age restricted themes only matter in the category field when the audience/placement is child related
+    category_is_age_prohibited = bool(
+        meta.category and matcher.scan(meta.category).get(AGE_PROHIBITED)
+    )
     
     # Check for child related audience - 
     #   if audience is children, and if category includes age restricted themes → auto-reject.
     #   else, append a new reason, prompting at least a requires_review status
-    if is_child_audience(meta.audience):
-        if meta.category and any(
-            word in (meta.category or "").lower()
-            for word in AGE_PROHIBITED_THEMES_KEYWORDS
-        ):
-            return STATUS_REJECTED, [f"Child-related audience found: {meta.audience}. Category not allowed."]
+    if is_child_audience(meta.audience, matcher):
+        if category_is_age_prohibited:
+            return STATUS_REJECTED, [Reason("child_audience_category", meta.audience)]
 
-        reasons.append(f"Child-related audience found: {meta.audience}")
+        reasons.append(Reason("child_audience", meta.audience))
 
     # Check for child related placement - 
     #   if placement is children related, and if category includes age restricted themes → auto-reject.
     #   else, append a new reason, prompting at least a requires_review status
-    if is_child_placement(placement):
-        if meta.category and any(
-            word in (meta.category or "").lower()
-            for word in AGE_PROHIBITED_THEMES_KEYWORDS
-        ):
-            return STATUS_REJECTED, [f"Child-related placement found: {placement}. Category not allowed."]
-
-        reasons.append(f"Child-related placement found: {placement}")
-
-        # Check for prohibited themes in metadata → instantly return a reject
-    for word in PROHIBITED_THEMES_KEYWORDS:
-        if word in combined_text:
-            return STATUS_REJECTED, [f"Prohibited term found in metadata: {word}"]
+    if is_child_placement(placement, matcher):
+        if category_is_age_prohibited:
+            return STATUS_REJECTED, [Reason("child_placement_category", placement)]
+
+        reasons.append(Reason("child_placement", placement))
+
+    # Check for prohibited themes in metadata → instantly return a reject
+    for word in hits.get(PROHIBITED, []):
+        return STATUS_REJECTED, [Reason("prohibited_term_metadata", word)]
         
     # Check for age restricted → add reason to reasons array, prompting requires_review response
-    for word in AGE_PROHIBITED_THEMES_KEYWORDS:
-        if word in combined_text :
-            reasons.append(f"Age restricted term found in metadata: {word}")
+    for word in hits.get(AGE_PROHIBITED, []):
+        reasons.append(Reason("age_restricted_term_metadata", word))
 
     # Check for restricted themes → add reason to reasons array, prompting requires_review response
-    for word in RESTRICTED_THEMES_KEYWORDS:
-        if word in combined_text:
-            reasons.append(f"Restricted term found in metadata: {word}")
+    for word in hits.get(RESTRICTED, []):
+        reasons.append(Reason("restricted_term_metadata", word))
 
     # If there is a market (country), check its not in the restricted countries list
     if market:
-        for country in RESTRICTED_COUNTRY_KEYWORDS:
-            if country in market:
-                reasons.append(f"Restricted country found in metadata: {country}")
+        for country in matcher.scan(market).get(RESTRICTED_COUNTRY, []):
+            reasons.append(Reason("restricted_country_metadata", country))
 
     # if there are reasons, and a REJECTION hasn't yet been returned, return a REQUIRES_REVIEW status
     if reasons:
@@ -97,3 +157,22 @@ def check_metadata(meta: Metadata) -> tuple[str, list[str]]:
 
     return STATUS_APPROVED, []
 
+# Check text recognised in the image itself (see ocr.py) for prohibited, age restricted and restricted terms,
+# with the same keyword lists and outcomes as the metadata
+def check_text(text: str, matcher: TokenMatcher = KEYWORD_MATCHER) -> tuple[str, list[Reason]]:
+    hits = matcher.scan(text)
+    reasons = []
+
+    for word in hits.get(PROHIBITED, []):
+        return STATUS_REJECTED, [Reason("prohibited_term_text", word)]
+
+    for word in hits.get(AGE_PROHIBITED, []):
+        reasons.append(Reason("age_restricted_term_text", word))
+
+    for word in hits.get(RESTRICTED, []):
+        reasons.append(Reason("restricted_term_text", word))
+
+    if reasons:
+        return STATUS_REQUIRES_REVIEW, reasons
+
+    return STATUS_APPROVED, []
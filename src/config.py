@@ -0,0 +1,150 @@
+import os
+
+# Runtime settings, overridable through environment variables.
+# Thresholds for the checks themselves live in rules.py
+
+# Execution engine for CPU-bound image work:
+#   "process" → decode and image statistics run in a process pool (default)
+#   "thread"  → run in a thread pool (useful where fork is unavailable)
+#   "inline"  → run directly on the event loop (tests/debugging only)
+EXECUTOR_MODE = os.getenv("EXECUTOR_MODE", "process")
+EXECUTOR_PROCESS_WORKERS = int(os.getenv("EXECUTOR_PROCESS_WORKERS", os.cpu_count() or 1))
+EXECUTOR_THREAD_WORKERS = int(os.getenv("EXECUTOR_THREAD_WORKERS", 4))
+
+# Maximum number of image analyses, and of blocking I/O calls (cache, job store), queued or running in the
+# executor before new requests get a 503. The two are capped separately, so a full analysis queue doesn't
+# hold up requests that only need I/O
+EXECUTOR_MAX_QUEUE_DEPTH = int(os.getenv("EXECUTOR_MAX_QUEUE_DEPTH", 32))
+EXECUTOR_MAX_IO_QUEUE_DEPTH = int(os.getenv("EXECUTOR_MAX_IO_QUEUE_DEPTH", 64))
+EXECUTOR_RETRY_AFTER_SECONDS = int(os.getenv("EXECUTOR_RETRY_AFTER_SECONDS", 1))
+
+# Admission control for the upload endpoints (see src/admission.py), per worker and before the upload is read:
+# at most ADMISSION_MAX_IN_FLIGHT requests and ADMISSION_MAX_IN_FLIGHT_BYTES of uploads (by Content-Length) are
+# evaluated at once. Up to ADMISSION_MAX_QUEUED more wait for a slot, for at most ADMISSION_QUEUE_TIMEOUT_SECONDS;
+# anything past that gets a 503 with a Retry-After header
+ADMISSION_MAX_IN_FLIGHT = int(os.getenv("ADMISSION_MAX_IN_FLIGHT", 32))
+ADMISSION_MAX_IN_FLIGHT_BYTES = int(os.getenv("ADMISSION_MAX_IN_FLIGHT_BYTES", 256 * 1024 * 1024))
+ADMISSION_MAX_QUEUED = int(os.getenv("ADMISSION_MAX_QUEUED", 64))
+ADMISSION_QUEUE_TIMEOUT_SECONDS = float(os.getenv("ADMISSION_QUEUE_TIMEOUT_SECONDS", 1))
+
+# Per-client rate limits on the upload endpoints: a token bucket per API key (the X-API-Key header, or the
+# client's address without one), refilled at RATE_LIMIT_PER_SECOND requests a second up to RATE_LIMIT_BURST.
+# Requests with an empty bucket get a 429 with a Retry-After header. 0 → no rate limits (default)
+#   "memory" → buckets per worker (default), "sqlite" → local file shared by every worker on the host
+RATE_LIMIT_PER_SECOND = float(os.getenv("RATE_LIMIT_PER_SECOND", 0))
+RATE_LIMIT_BURST = int(os.getenv("RATE_LIMIT_BURST", 20))
+RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND", "memory")
+RATE_LIMIT_SQLITE_PATH = os.getenv("RATE_LIMIT_SQLITE_PATH", "creative_rate_limits.sqlite3")
+
+# Compiled keyword matchers are cached here (see compile_matcher in src/matcher.py), so starting with
+# the same term lists loads the matcher instead of rebuilding it. Empty → always build (default; the
+# Docker image sets it to a directory it precompiles into)
+MATCHER_CACHE_DIR = os.getenv("MATCHER_CACHE_DIR", "")
+
+# Uploads are read in chunks of this size, so an oversized upload is cut off after at most one extra chunk
+UPLOAD_CHUNK_BYTES = int(os.getenv("UPLOAD_CHUNK_BYTES", 64 * 1024))
+
+# Contrast scoring:
+#   "estimate" → score a thumbnail no larger than CONTRAST_SAMPLE_SIZE px on its longest side
+#                (JPEGs are decoded in draft mode); scores under MIN_CONTRAST + CONTRAST_ESTIMATE_MARGIN
+#                are re-checked with the exact score, so only clear passes are estimated (default)
+#   "exact"    → standard deviation over every pixel of the full-resolution image
+CONTRAST_MODE = os.getenv("CONTRAST_MODE", "estimate")
+CONTRAST_SAMPLE_SIZE = int(os.getenv("CONTRAST_SAMPLE_SIZE", 512))
+CONTRAST_ESTIMATE_MARGIN = float(os.getenv("CONTRAST_ESTIMATE_MARGIN", 2.0))
+
+# Flash detection decodes every GIF frame up to this many. GIFs with more frames than MAX_GIF_FRAMES
+# already go to review, so by default only the frames a GIF within the limit could have are decoded
+GIF_FLASH_FRAME_LIMIT = int(os.getenv("GIF_FLASH_FRAME_LIMIT", 100))
+
+# Each evaluation gets this long (0 → no limit). Once it's spent, the checks not yet run are skipped and the
+# creative goes to review with the reasons found so far (see src/engine.py)
+EVALUATION_DEADLINE_SECONDS = float(os.getenv("EVALUATION_DEADLINE_SECONDS", 10))
+
+# Stop evaluating a creative at the first REJECTED check, for every market without its own "short_circuit"
+# setting - its response then gives that check's reasons only. Off → every check runs and all reasons are given
+FAST_REJECT = os.getenv("FAST_REJECT", "false").lower() in ("1", "true", "yes")
+
+# Result cache for repeat submissions of the same creative:
+#   "memory" → per-worker LRU (default), "sqlite" → local file shared by every worker on the host, "none" → off
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "memory")
+CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", 1024))
+CACHE_TTL_SECONDS = float(os.getenv("CACHE_TTL_SECONDS", 24 * 60 * 60))
+CACHE_SQLITE_PATH = os.getenv("CACHE_SQLITE_PATH", "creative_cache.sqlite3")
+
+# Near-duplicate detection (see src/phash.py) - perceptual hashes of evaluated creatives, kept in a local
+# SQLite file shared by every worker on the host:
+#   "hint"      → evaluate as usual, and report the nearest earlier creative's decision in the response (default)
+#   "fast_path" → hash first, and reuse a near-duplicate's pixel check outcomes instead of analysing the pixels
+#                 (not for GIFs, whose animation the hash doesn't see); header and keyword checks always run
+#   "off"       → no hashing
+# Creatives within PHASH_MAX_DISTANCE bits (of 64) of each other are near-duplicates
+PHASH_MODE = os.getenv("PHASH_MODE", "hint")
+PHASH_SQLITE_PATH = os.getenv("PHASH_SQLITE_PATH", "creative_phash.sqlite3")
+PHASH_MAX_DISTANCE = int(os.getenv("PHASH_MAX_DISTANCE", 6))
+
+# Text-in-image scanning (see src/ocr.py) - text recognised in the creative is matched against the same keyword
+# lists as the metadata. Needs a local OCR engine, and never calls out to a network service:
+#   "off"       → no OCR (default)
+#   "tesseract" → Tesseract, through pytesseract (pip install pytesseract, plus the tesseract binary)
+# The image is downscaled to OCR_MAX_SIDE px and cropped to its OCR_MAX_REGIONS largest text-like regions, and
+# recognition stops once OCR_TIMEOUT_SECONDS are spent on a creative. Results are cached per image content
+# (OCR_CACHE_MAX_ENTRIES per worker)
+OCR_ENGINE = os.getenv("OCR_ENGINE", "off")
+OCR_LANGUAGES = os.getenv("OCR_LANGUAGES", "eng")
+OCR_MAX_SIDE = int(os.getenv("OCR_MAX_SIDE", 1280))
+OCR_MAX_REGIONS = int(os.getenv("OCR_MAX_REGIONS", 6))
+OCR_TIMEOUT_SECONDS = float(os.getenv("OCR_TIMEOUT_SECONDS", 2))
+OCR_CACHE_MAX_ENTRIES = int(os.getenv("OCR_CACHE_MAX_ENTRIES", 4096))
+
+# Batch endpoint: maximum creatives per request (after expanding zip archives), how many are
+# evaluated at once, and the largest zip archive accepted
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", 500))
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", EXECUTOR_PROCESS_WORKERS))
+BATCH_MAX_ZIP_BYTES = int(os.getenv("BATCH_MAX_ZIP_BYTES", 200 * 1024 * 1024))
+
+# Per-market rule sets (JSON, or YAML with PyYAML installed) - see src/engine.py for the format.
+# Unset → the built-in thresholds and terms for every market. The file is polled for changes
+# every RULESETS_RELOAD_SECONDS and recompiled in the background
+RULESETS_PATH = os.getenv("RULESETS_PATH", "")
+RULESETS_RELOAD_SECONDS = float(os.getenv("RULESETS_RELOAD_SECONDS", 2))
+
+# Keyword lists (a JSON/YAML file, or a directory of <category>.txt files) that replace the built-in
+# lists in terms.py - see src/terms_store.py. Unset → built-in lists only. Polled every TERMS_RELOAD_SECONDS
+TERMS_PATH = os.getenv("TERMS_PATH", "")
+TERMS_RELOAD_SECONDS = float(os.getenv("TERMS_RELOAD_SECONDS", 2))
+
+# Asynchronous jobs (POST /jobs): SQLite file the jobs are kept in, worker tasks evaluating them, the most
+# jobs queued or running before submissions get a 503, how long finished jobs stay available for polling,
+# and the timeout for each webhook call
+JOBS_SQLITE_PATH = os.getenv("JOBS_SQLITE_PATH", "creative_jobs.sqlite3")
+JOBS_WORKERS = int(os.getenv("JOBS_WORKERS", EXECUTOR_PROCESS_WORKERS))
+JOBS_MAX_PENDING = int(os.getenv("JOBS_MAX_PENDING", 1000))
+JOBS_RETENTION_SECONDS = float(os.getenv("JOBS_RETENTION_SECONDS", 24 * 60 * 60))
+JOBS_WEBHOOK_TIMEOUT_SECONDS = float(os.getenv("JOBS_WEBHOOK_TIMEOUT_SECONDS", 5))
+
+# Hosts a job's callback_url may point at, comma-separated - "hooks.example.com", or ".example.com" for any
+# subdomain. Listed hosts are trusted as they are, internal ones included. Unset → any host, but only if every
+# address it resolves to is public: loopback, private, link-local and reserved addresses are never called
+JOBS_CALLBACK_HOSTS = tuple(
+    host.strip().lower() for host in os.getenv("JOBS_CALLBACK_HOSTS", "").split(",") if host.strip()
+)
+
+# On shutdown, queued jobs get this long to finish before the workers stop; the rest resume on the next start
+JOBS_DRAIN_SECONDS = float(os.getenv("JOBS_DRAIN_SECONDS", 10))
+
+# Production server (python -m src.server) - see src/server.py. SERVER_WORKERS processes share one listening
+# socket; each is replaced after SERVER_MAX_REQUESTS requests (0 → never), give or take a random
+# SERVER_MAX_REQUESTS_JITTER so they don't all restart at once. On SIGTERM, in-flight requests get
+# SERVER_GRACEFUL_TIMEOUT_SECONDS to finish
+SERVER_HOST = os.getenv("SERVER_HOST", "0.0.0.0")
+SERVER_PORT = int(os.getenv("SERVER_PORT", 8000))
+SERVER_WORKERS = int(os.getenv("SERVER_WORKERS", os.cpu_count() or 1))
+SERVER_MAX_REQUESTS = int(os.getenv("SERVER_MAX_REQUESTS", 10000))
+SERVER_MAX_REQUESTS_JITTER = int(os.getenv("SERVER_MAX_REQUESTS_JITTER", 1000))
+SERVER_GRACEFUL_TIMEOUT_SECONDS = int(os.getenv("SERVER_GRACEFUL_TIMEOUT_SECONDS", 30))
+
+# Bulk audits (python -m src.audit) - see src/audit.py. AUDIT_WORKERS processes evaluate creatives, and the
+# checkpoint next to the output file is rewritten every AUDIT_CHECKPOINT_EVERY results
+AUDIT_WORKERS = int(os.getenv("AUDIT_WORKERS", os.cpu_count() or 1))
+AUDIT_CHECKPOINT_EVERY = int(os.getenv("AUDIT_CHECKPOINT_EVERY", 100))
@@ -0,0 +1,453 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable
+from fastapi import HTTPException
+from pydantic import ValidationError
+from .cache import RULES_VERSION
+from .checks import (
+    check_resolution,
+    check_aspect_ratio,
+    check_gif,
+    check_contrast,
+    check_filename,
+    check_metadata,
+    check_text
+)
+from .config import (
+    CONTRAST_MODE,
+    EVALUATION_DEADLINE_SECONDS,
+    FAST_REJECT,
+    OCR_ENGINE,
+    OCR_LANGUAGES,
+    OCR_TIMEOUT_SECONDS,
+    PHASH_MODE,
+    RULESETS_PATH,
+    RULESETS_RELOAD_SECONDS
+)
+from .constants import STATUS_APPROVED, STATUS_REJECTED, STATUS_REQUIRES_REVIEW
+from .executor import ENGINE
+from .matcher import TokenMatcher, compile_matcher, parse_term
+from .metrics import STAGE_DURATION, PIXELS_DECODED, NEAR_DUPLICATES, OCR_RUNS, DEADLINES_EXCEEDED
+from .models import CreativeApprovalResponse, ImageAnalysis, Metadata, NearDuplicate, StageTiming, TextRecognition, Thresholds
+from .ocr import OCR_CACHE, recognise_text, text_cache_key
+from .rules import MAX_WIDTH, MAX_HEIGHT
+from .phash import PHASH_INDEX, Match, PerceptualIndex
+from .reasons import Reason
+from .services import read_image_header, analyse_image, gif_timing, perceptual_hash
+from .upload import Contents
+from .terms_store import TERMS_STORE, TermsIndex, TermsStore
+
+logger = logging.getLogger(__name__)
+
+# Declarative rule engine. Rule sets are loaded per market from a local JSON (or YAML) file and
+# compiled once into an evaluation plan: the same checks as always, but run cheapest first -
+# header rules, then keyword rules (one shared matcher per distinct set of term lists), then
+# the pixel rules that need a decode, then (with OCR_ENGINE set) the text read from the image -
+# only if nothing cheaper has rejected the creative already. Outcomes are still combined in the original check order,
+# so a plan returns exactly the statuses and reasons the hand-written handler did.
+#
+# Each evaluation has EVALUATION_DEADLINE_SECONDS. Once it's spent no further rules run, and the creative
+# goes to review (unless a rule that did run rejected it) with the reasons found so far, marked partial.
+# Every response lists the stages that ran - rules, and the header/pixel/OCR loads they need - with their times.
+#
+# Rule set file:
+#   {
+#     "default": {"thresholds": {"min_contrast": 15}, "terms": {"restricted": ["lottery"]}},
+#     "markets": {
+#       "uk": {"thresholds": {"max_gif_fps": 5}, "exclude_terms": {"restricted": ["uber"]}},
+#       "us": {"short_circuit": true}
+#     }
+#   }
+# Markets inherit from "default", which inherits from rules.py and the terms store (terms.py unless
+# TERMS_PATH is set). "terms" adds to the inherited lists (with the same "term*"/"*term*" match
+# markers as terms.py), "exclude_terms" removes from them, and "short_circuit" stops at the first
+# REJECTED rule (the default for every market when FAST_REJECT is set).
+# Markets are matched case-insensitively against Metadata.market; anything else uses "default".
+
+STAGE_HEADER = "header"
+STAGE_KEYWORDS = "keywords"
+STAGE_PIXELS = "pixels"
+STAGE_TEXT = "text"
+
+# Cheapest first - the order a compiled plan runs its rules in
+STAGE_COST = {STAGE_HEADER: 0, STAGE_KEYWORDS: 1, STAGE_PIXELS: 2, STAGE_TEXT: 3}
+
+# Everything a rule can look at while one creative is evaluated
+class Evaluation:
+    def __init__(self, contents: Contents, filename: str | None, meta: Metadata, ruleset: "RuleSet"):
+        self.start = time.perf_counter()
+        self.deadline = self.start + ruleset.deadline if ruleset.deadline > 0 else float("inf")
+        self.stages: list[tuple[str, float]] = []
+        self.contents = contents
+        self.filename = filename
+        self.meta = meta
+        self.ruleset = ruleset
+        self.img_format = ""
+        self.width = 0
+        self.height = 0
+        self.analysis: ImageAnalysis | None = None
+        self.phash: int | None = None
+        self.near_duplicate: Match | None = None
+        # Pixel rule outcomes taken from a near-duplicate instead of analysing the pixels (fast path)
+        self.reused_outcomes: dict[str, tuple[str, list[Reason]]] | None = None
+        self.text: TextRecognition | None = None
+
+    # Time the enclosed stage, for the response and the stage latency histogram
+    @contextmanager
+    def stage(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            STAGE_DURATION.observe(elapsed, stage=name)
+            self.stages.append((name, elapsed))
+
+    # Run a load (pixels, OCR) within what's left of the deadline. False if the deadline ran out first
+    async def within_deadline(self, load) -> bool:
+        try:
+            await asyncio.wait_for(load, self.deadline - time.perf_counter() if self.deadline < float("inf") else None)
+            return True
+        except TimeoutError:
+            return False
+
+    # Pixels are only decoded for images within the maximum dimensions - oversized images and
+    # decompression bombs skip the pixel rules entirely
+    @property
+    def decodable(self) -> bool:
+        thresholds = self.ruleset.thresholds
+        return self.width <= thresholds.max_width and self.height <= thresholds.max_height
+
+class Rule:
+    def __init__(self, name: str, stage: str, check: Callable[[Evaluation], tuple[str, list[Reason]]]):
+        self.name = name
+        self.stage = stage
+        self.check = check
+
+# Every rule, in the order their outcomes are combined (the order reasons appear in responses) - GIF reasons
+# first, then resolution and aspect ratio, as the hand-written handler gave them
+RULES = [
+    Rule("gif_check", STAGE_PIXELS, lambda ev: check_gif(ev.analysis, ev.ruleset.thresholds) if ev.img_format == "GIF" else (STATUS_APPROVED, [])),
+    Rule("resolution_check", STAGE_HEADER, lambda ev: check_resolution(ev.width, ev.height, ev.ruleset.thresholds)),
+    Rule("aspect_ratio_check", STAGE_HEADER, lambda ev: check_aspect_ratio(ev.width, ev.height, ev.ruleset.thresholds)),
+    Rule("contrast_check", STAGE_PIXELS, lambda ev: check_contrast(ev.analysis, ev.ruleset.thresholds)),
+    Rule("filename_check", STAGE_KEYWORDS, lambda ev: check_filename(ev.filename or "", ev.ruleset.matcher)),
+    Rule("metadata_check", STAGE_KEYWORDS, lambda ev: check_metadata(ev.meta, ev.ruleset.matcher)),
+    Rule("text_check", STAGE_TEXT, lambda ev: check_text(ev.text.text, ev.ruleset.matcher)),
+]
+
+PIXEL_RULES = [rule.name for rule in RULES if rule.stage == STAGE_PIXELS]
+
+# A compiled rule set for one market
+class RuleSet:
+    def __init__(
+        self,
+        name: str,
+        thresholds: Thresholds,
+        matcher: TokenMatcher,
+        short_circuit: bool,
+        version: str,
+        phash_mode: str = PHASH_MODE,
+        phash_index: PerceptualIndex = PHASH_INDEX,
+        ocr_engine: str = OCR_ENGINE,
+        deadline: float = EVALUATION_DEADLINE_SECONDS
+    ):
+        self.name = name
+        self.thresholds = thresholds
+        self.matcher = matcher
+        self.short_circuit = short_circuit
+        self.version = version
+        self.phash_mode = phash_mode
+        self.phash_index = phash_index
+        self.ocr_engine = ocr_engine
+        self.deadline = deadline
+        self.plan = sorted(RULES, key=lambda rule: STAGE_COST[rule.stage])
+
+    # Fast path: hash the creative, and take the pixel rule outcomes of a near-duplicate evaluated
+    # under these rules. GIFs always get the full analysis - the hash only sees their first frame
+    async def _reuse_pixels(self, ev: Evaluation) -> bool:
+        if self.phash_mode != "fast_path" or ev.img_format == "GIF":
+            return False
+        with ev.stage("phash_lookup"):
+            ev.phash = await ENGINE.run_cpu(perceptual_hash, ev.contents)
+            ev.near_duplicate = await ENGINE.run_io(self.phash_index.lookup, ev.phash, self.version)
+        if ev.near_duplicate is None or set(PIXEL_RULES) - set(ev.near_duplicate.pixel_outcomes):
+            return False
+        ev.reused_outcomes = ev.near_duplicate.pixel_outcomes
+        NEAR_DUPLICATES.inc(mode="fast_path")
+        return True
+
+    # A GIF too large to decode only gets its frame timing, read from the block structure
+    async def _load_pixels(self, ev: Evaluation) -> None:
+        if not ev.decodable:
+            with ev.stage("gif_timing"):
+                ev.analysis = await ENGINE.run_cpu(gif_timing, ev.contents, self.thresholds.max_gif_frames)
+            return
+        if await self._reuse_pixels(ev):
+            return
+        with ev.stage("pixel_analysis"):
+            ev.analysis = await ENGINE.run_cpu(
+                analyse_image, ev.contents, CONTRAST_MODE, self.thresholds.min_contrast,
+                self.thresholds.max_gif_flashes_per_second, self.thresholds.max_gif_frames
+            )
+        PIXELS_DECODED.inc(ev.analysis.pixels_decoded)
+        ev.phash = ev.phash if ev.phash is not None else ev.analysis.phash
+
+    # Hint mode: look up the nearest earlier creative. Then record this one, if its pixel rules all ran.
+    # Recording is best effort - with the I/O threads saturated the creative just isn't indexed
+    async def _record_phash(self, ev: Evaluation, outcomes: dict[str, tuple[str, list[Reason]]]) -> None:
+        if ev.phash is None or self.phash_mode == "off":
+            return
+        if ev.near_duplicate is None and self.phash_mode == "hint":
+            with ev.stage("phash_lookup"):
+                ev.near_duplicate = await ENGINE.run_io(self.phash_index.lookup, ev.phash, self.version)
+            if ev.near_duplicate is not None:
+                NEAR_DUPLICATES.inc(mode="hint")
+        if ev.reused_outcomes is None and all(name in outcomes for name in PIXEL_RULES):
+            try:
+                await ENGINE.run_io(self.phash_index.add, ev.phash, self.version, {name: outcomes[name] for name in PIXEL_RULES})
+            except HTTPException:
+                logger.warning("I/O queue full - creative not added to the near-duplicate index")
+
+    # Read the text in the image - from the cache when the same image was read before
+    async def _load_text(self, ev: Evaluation) -> None:
+        key = text_cache_key(ev.contents, self.ocr_engine)
+        ev.text = OCR_CACHE.get(key)
+        if ev.text is not None:
+            OCR_RUNS.inc(outcome="cached")
+            return
+
+        with ev.stage("ocr"):
+            ev.text = await ENGINE.run_cpu(recognise_text, ev.contents, self.ocr_engine, OCR_LANGUAGES, OCR_TIMEOUT_SECONDS)
+        OCR_RUNS.inc(outcome="timed_out" if ev.text.timed_out else "recognised")
+        if not ev.text.timed_out:
+            OCR_CACHE.set(key, ev.text)
+
+    # Whether a rule applies to this creative at all - pixel rules need a decodable image (bar the GIF check,
+    # which an oversized GIF gets from its frame timing), and OCR (the most expensive stage, which can only
+    # add reasons) is skipped once anything has rejected
+    def _applies(self, rule: Rule, ev: Evaluation, outcomes: dict[str, tuple[str, list[Reason]]]) -> bool:
+        if rule.stage == STAGE_PIXELS:
+            return ev.decodable or (rule.name == "gif_check" and ev.img_format == "GIF")
+        if rule.stage == STAGE_TEXT:
+            if self.ocr_engine == "off" or not ev.decodable:
+                return False
+            return not any(status == STATUS_REJECTED for status, _ in outcomes.values())
+        return True
+
+    # Run the plan over one creative. Raises ImageRejected (→ 422) for unreadable or unsupported
+    # images, and HTTPException 503 when the worker pool is saturated
+    async def evaluate(self, contents: Contents, filename: str | None, meta: Metadata) -> CreativeApprovalResponse:
+        ev = Evaluation(contents, filename, meta, self)
+
+        # Read format and dimensions from the image header only (no pixel decoding)
+        with ev.stage("header"):
+            ev.img_format, ev.width, ev.height = read_image_header(contents)
+
+        outcomes: dict[str, tuple[str, list[Reason]]] = {}
+        not_run: list[str] = []
+        for position, rule in enumerate(self.plan):
+            if not self._applies(rule, ev, outcomes):
+                continue
+
+            loaded = time.perf_counter() < ev.deadline
+            if loaded and rule.stage == STAGE_PIXELS and ev.analysis is None and ev.reused_outcomes is None:
+                loaded = await ev.within_deadline(self._load_pixels(ev))
+            if loaded and rule.stage == STAGE_TEXT and ev.text is None:
+                loaded = await ev.within_deadline(self._load_text(ev))
+            if not loaded:
+                not_run = [pending.name for pending in self.plan[position:] if self._applies(pending, ev, outcomes)]
+                break
+
+            if rule.stage == STAGE_PIXELS and ev.reused_outcomes is not None:
+                outcomes[rule.name] = ev.reused_outcomes[rule.name]
+            else:
+                with ev.stage(rule.name):
+                    outcomes[rule.name] = rule.check(ev)
+
+            if self.short_circuit and outcomes[rule.name][0] == STATUS_REJECTED:
+                break
+
+        # Combine in the original check order - the last non-approved outcome sets the status
+        status, reasons = STATUS_APPROVED, []
+        for rule in RULES:
+            rule_status, rule_reasons = outcomes.get(rule.name, (STATUS_APPROVED, []))
+            if rule_status != STATUS_APPROVED:
+                status = rule_status
+                reasons.extend(rule_reasons)
+
+        # Out of time: whatever didn't run needs a human, unless something that did run already rejected
+        if not_run:
+            DEADLINES_EXCEEDED.inc()
+            if status != STATUS_REJECTED:
+                status = STATUS_REQUIRES_REVIEW
+            reasons.append(Reason("deadline_exceeded", self.deadline, ", ".join(not_run)))
+        else:
+            await self._record_phash(ev, outcomes)
+
+        # Every field is built here from values that are already the right type, so the response skips validation
+        near_duplicate = ev.near_duplicate
+        return CreativeApprovalResponse.model_construct(
+            status=status,
+            reasons=reasons,
+            img_format=ev.img_format,
+            img_width=ev.width,
+            img_height=ev.height,
+            img_size_mb=round(len(contents) / (1024 * 1024), 2),
+            near_duplicate=NearDuplicate.model_construct(
+                distance=near_duplicate.distance, status=near_duplicate.status, reasons=near_duplicate.reasons
+            ) if near_duplicate is not None else None,
+            stages=[StageTiming.model_construct(stage=name, ms=round(elapsed * 1000, 3)) for name, elapsed in ev.stages],
+            partial=bool(not_run)
+        )
+
+def load_ruleset_file(path: str) -> dict:
+    text = Path(path).read_text()
+    if path.endswith((".yaml", ".yml")):
+        try:
+            import yaml
+        except ImportError:
+            raise RuntimeError(f"PyYAML is required to load {path}; install it or use a JSON rule set file")
+        return yaml.safe_load(text) or {}
+    return json.loads(text)
+
+# Merge one rule set section onto the one it inherits from
+def merge_spec(base: dict, section: dict) -> dict:
+    unknown = set(section) - {"thresholds", "terms", "exclude_terms", "short_circuit"}
+    if unknown:
+        raise ValueError(f"Unknown rule set keys: {', '.join(sorted(unknown))}")
+
+    terms = {category: list(words) for category, words in base["terms"].items()}
+    for category, words in (section.get("terms") or {}).items():
+        if category not in terms:
+            raise ValueError(f"Unknown term category: {category}")
+        terms[category] += [word.lower() for word in words if word.lower() not in terms[category]]
+    for category, words in (section.get("exclude_terms") or {}).items():
+        if category not in terms:
+            raise ValueError(f"Unknown term category: {category}")
+        excluded = {parse_term(word.lower())[0] for word in words}
+        terms[category] = [word for word in terms[category] if parse_term(word)[0] not in excluded]
+
+    return {
+        "thresholds": {**base["thresholds"], **(section.get("thresholds") or {})},
+        "terms": terms,
+        "short_circuit": bool(section.get("short_circuit", base["short_circuit"]))
+    }
+
+# Compile every market in a parsed rule set file on top of a terms index.
+# Markets with identical term lists share one matcher, and reuse the index's own when unchanged
+def compile_rulesets(
+    spec: dict, terms: TermsIndex | None = None, phash_mode: str = PHASH_MODE
+) -> tuple[RuleSet, dict[str, RuleSet]]:
+    terms = terms or TERMS_STORE.index
+    base_terms = {name: list(words) for name, words in terms.categories.items()}
+    builtin = {"thresholds": {}, "terms": base_terms, "short_circuit": FAST_REJECT}
+    matchers: dict[str, TokenMatcher] = {json.dumps(base_terms, sort_keys=True): terms.matcher}
+
+    def compile_one(name: str, merged: dict) -> RuleSet:
+        try:
+            thresholds = Thresholds(**merged["thresholds"])
+        except ValidationError as e:
+            raise ValueError(f"Invalid thresholds for rule set '{name}': {e}")
+        if thresholds.max_width > MAX_WIDTH or thresholds.max_height > MAX_HEIGHT:
+            raise ValueError(f"Rule set '{name}' can't raise the maximum dimensions above {MAX_WIDTH}x{MAX_HEIGHT}px")
+
+        terms_key = json.dumps(merged["terms"], sort_keys=True)
+        if terms_key not in matchers:
+            matchers[terms_key] = compile_matcher(merged["terms"])
+
+        canonical = json.dumps({**merged, "thresholds": thresholds.model_dump()}, sort_keys=True)
+        # Text scanning can add reasons, so switching OCR on gives every rule set a new version
+        ocr = f":ocr={OCR_ENGINE}" if OCR_ENGINE != "off" else ""
+        version = hashlib.sha256(f"{RULES_VERSION}:{name}:{canonical}{ocr}".encode()).hexdigest()[:16]
+        return RuleSet(name, thresholds, matchers[terms_key], merged["short_circuit"], version, phash_mode)
+
+    default_spec = merge_spec(builtin, spec.get("default") or {})
+    default = compile_one("default", default_spec)
+    markets = {
+        market.strip().casefold(): compile_one(market, merge_spec(default_spec, section or {}))
+        for market, section in (spec.get("markets") or {}).items()
+    }
+    return default, markets
+
+# Holds the compiled rule sets and swaps them atomically when the rule set file or the terms
+# change, so in-flight requests keep the plan they started with. phash_mode="off" gives rule sets
+# that neither read nor write the near-duplicate index
+class RuleEngine:
+    def __init__(self, path: str | None = RULESETS_PATH, terms: TermsStore = TERMS_STORE, phash_mode: str = PHASH_MODE):
+        self.path = path or None
+        self.terms = terms
+        self.phash_mode = phash_mode
+        self._spec: dict = {}
+        self._compiled = compile_rulesets({}, terms.index, phash_mode)
+        self._stamp = None
+        self._stop = threading.Event()
+        terms.subscribe(self._terms_changed)
+        if self.path:
+            self.load()
+
+    def ruleset_for(self, market: str | None) -> RuleSet:
+        default, markets = self._compiled
+        if market:
+            return markets.get(market.strip().casefold(), default)
+        return default
+
+    @property
+    def markets(self) -> list[str]:
+        return sorted(self._compiled[1])
+
+    def _file_stamp(self) -> tuple[int, int]:
+        stat = os.stat(self.path)
+        return stat.st_mtime_ns, stat.st_size
+
+    def load(self) -> None:
+        stamp = self._file_stamp()
+        spec = load_ruleset_file(self.path)
+        compiled = compile_rulesets(spec, self.terms.index, self.phash_mode)
+        self._compiled, self._spec, self._stamp = compiled, spec, stamp
+        logger.info("Loaded rule sets from %s: %s", self.path, ", ".join(self.markets) or "default only")
+
+    # New terms → recompile the current rule sets on top of them. If they no longer compile (e.g. a
+    # market excludes a term the new lists dropped) the previous rule sets stay in place
+    def _terms_changed(self, index: TermsIndex) -> None:
+        try:
+            self._compiled = compile_rulesets(self._spec, index, self.phash_mode)
+        except Exception:
+            logger.exception("Failed to recompile rule sets for terms version %s - keeping the previous version", index.version)
+
+    # Recompile if the file changed. A broken file is logged and the previous rule sets stay in place
+    def reload_if_changed(self) -> bool:
+        if not self.path:
+            return False
+        try:
+            if self._file_stamp() == self._stamp:
+                return False
+            self.load()
+            return True
+        except Exception:
+            logger.exception("Failed to reload rule sets from %s - keeping the previous version", self.path)
+            return False
+
+    # Poll the file from a background thread, so reloads never run on the request path
+    def start_watching(self, interval: float = RULESETS_RELOAD_SECONDS) -> None:
+        if not self.path:
+            return
+        self._stop.clear()
+
+        def watch():
+            while not self._stop.wait(interval):
+                self.reload_if_changed()
+
+        threading.Thread(target=watch, name="ruleset-watcher", daemon=True).start()
+
+    def stop_watching(self) -> None:
+        self._stop.set()
+
+RULE_ENGINE = RuleEngine()
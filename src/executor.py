@@ -0,0 +1,156 @@
+import asyncio
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
+from typing import Any, Callable
+from fastapi import HTTPException
+from .config import (
+    EXECUTOR_MODE,
+    EXECUTOR_PROCESS_WORKERS,
+    EXECUTOR_THREAD_WORKERS,
+    EXECUTOR_MAX_QUEUE_DEPTH,
+    EXECUTOR_MAX_IO_QUEUE_DEPTH,
+    EXECUTOR_RETRY_AFTER_SECONDS
+)
+
+# Execution engine - keeps CPU-bound image work off the event loop so /health and cheap
+# requests stay responsive. Pools are created lazily on first use, and the number of
+# queued/running tasks is capped; once full, callers get a 503 with a Retry-After header.
+# CPU work and blocking I/O are capped separately (in_flight / io_in_flight), and in "thread"
+# mode CPU work gets a pool of its own, so a backlog of image analyses never holds up the
+# quick I/O (cache, job store) that cheap requests wait on.
+class ExecutionEngine:
+    def __init__(
+        self,
+        mode: str = EXECUTOR_MODE,
+        process_workers: int = EXECUTOR_PROCESS_WORKERS,
+        thread_workers: int = EXECUTOR_THREAD_WORKERS,
+        max_queue_depth: int = EXECUTOR_MAX_QUEUE_DEPTH,
+        max_io_queue_depth: int = EXECUTOR_MAX_IO_QUEUE_DEPTH,
+        retry_after: int = EXECUTOR_RETRY_AFTER_SECONDS
+    ):
+        if mode not in ("process", "thread", "inline"):
+            raise ValueError(f"Unknown executor mode: {mode}")
+
+        self.mode = mode
+        self.process_workers = process_workers
+        self.thread_workers = thread_workers
+        self.max_queue_depth = max_queue_depth
+        self.max_io_queue_depth = max_io_queue_depth
+        self.retry_after = retry_after
+        self.in_flight = 0
+        self.io_in_flight = 0
+        self._process_pool: ProcessPoolExecutor | None = None
+        self._cpu_thread_pool: ThreadPoolExecutor | None = None
+        self._thread_pool: ThreadPoolExecutor | None = None
+
+    def _get_process_pool(self) -> ProcessPoolExecutor:
+        if self._process_pool is None:
+            self._process_pool = ProcessPoolExecutor(max_workers=self.process_workers)
+        return self._process_pool
+
+    def _get_cpu_thread_pool(self) -> ThreadPoolExecutor:
+        if self._cpu_thread_pool is None:
+            self._cpu_thread_pool = ThreadPoolExecutor(
+                max_workers=self.thread_workers, thread_name_prefix="creative-cpu"
+            )
+        return self._cpu_thread_pool
+
+    def _get_thread_pool(self) -> ThreadPoolExecutor:
+        if self._thread_pool is None:
+            self._thread_pool = ThreadPoolExecutor(
+                max_workers=self.thread_workers, thread_name_prefix="creative-io"
+            )
+        return self._thread_pool
+
+    # Reserve a slot in the CPU or I/O queue, or fail fast with a 503 so the client backs off
+    def _admit(self, io: bool) -> None:
+        if io and self.io_in_flight >= self.max_io_queue_depth:
+            raise HTTPException(
+                status_code=503,
+                detail="Server busy: I/O queue is full. Please retry.",
+                headers={"Retry-After": str(self.retry_after)}
+            )
+        if not io and self.in_flight >= self.max_queue_depth:
+            raise HTTPException(
+                status_code=503,
+                detail="Server busy: image analysis queue is full. Please retry.",
+                headers={"Retry-After": str(self.retry_after)}
+            )
+        if io:
+            self.io_in_flight += 1
+        else:
+            self.in_flight += 1
+
+    def _release(self, io: bool) -> None:
+        if io:
+            self.io_in_flight -= 1
+        else:
+            self.in_flight -= 1
+
+    # The slot is held until the work itself finishes, not the caller: a caller cancelled by a deadline
+    # leaves its task running in the pool, and it still counts towards the queue depth until it's done
+    async def _run(self, pool, io: bool, fn: Callable[..., Any], *args) -> Any:
+        self._admit(io)
+        if pool is None:
+            try:
+                return fn(*args)
+            finally:
+                self._release(io)
+
+        loop = asyncio.get_running_loop()
+        try:
+            future = pool.submit(partial(fn, *args))
+        except BaseException:
+            self._release(io)
+            raise
+        future.add_done_callback(lambda _: self._release_from(loop, io))
+        return await asyncio.wrap_future(future)
+
+    # Done callbacks run on the pool's threads - release the slot on the event loop, unless it's gone
+    def _release_from(self, loop: asyncio.AbstractEventLoop, io: bool) -> None:
+        try:
+            loop.call_soon_threadsafe(self._release, io)
+        except RuntimeError:
+            pass
+
+    # Run CPU-bound work (decoding, image statistics). Arguments and results must be picklable
+    async def run_cpu(self, fn: Callable[..., Any], *args) -> Any:
+        if self.mode == "inline":
+            return await self._run(None, False, fn, *args)
+        if self.mode == "thread":
+            return await self._run(self._get_cpu_thread_pool(), False, fn, *args)
+
+        pool = self._get_process_pool()
+        try:
+            return await self._run(pool, False, fn, *args)
+        except BrokenProcessPool:
+            # A worker died (e.g. killed for memory) - replace the pool and let the client retry. Every task
+            # on the broken pool fails at once, so only the first to get here replaces it
+            if self._process_pool is pool:
+                pool.shutdown(wait=False)
+                self._process_pool = None
+            raise HTTPException(
+                status_code=503,
+                detail="Image analysis worker crashed. Please retry.",
+                headers={"Retry-After": str(self.retry_after)}
+            )
+
+    # Run blocking I/O (disk, sqlite) in the thread pool
+    async def run_io(self, fn: Callable[..., Any], *args) -> Any:
+        if self.mode == "inline":
+            return await self._run(None, True, fn, *args)
+        return await self._run(self._get_thread_pool(), True, fn, *args)
+
+    def shutdown(self, wait: bool = True) -> None:
+        if self._process_pool is not None:
+            self._process_pool.shutdown(wait=wait, cancel_futures=True)
+            self._process_pool = None
+        if self._cpu_thread_pool is not None:
+            self._cpu_thread_pool.shutdown(wait=wait, cancel_futures=True)
+            self._cpu_thread_pool = None
+        if self._thread_pool is not None:
+            self._thread_pool.shutdown(wait=wait, cancel_futures=True)
+            self._thread_pool = None
+
+ENGINE = ExecutionEngine()
@@ -0,0 +1,177 @@
+from .models import GifInfo
+
+# Walk the GIF block structure straight from the bytes - no LZW decoding, no pixels.
+# Each frame is an image descriptor, optionally preceded by a graphic control extension (GCE)
+# carrying its delay in 1/100 s. Image data and other extensions are skipped sub-block by sub-block.
+#
+# Delays match what PIL reports as frame.info["duration"]: the GCE delay in ms, or 0 for a frame without one.
+# With frame_limit, the walk stops as soon as the GIF has more frames than that and the result is marked truncated.
+#
+# iter_frames walks the same structure for the flash analysis, yielding each frame's position, colour table,
+# GCE fields and compressed image data, and frame_image decodes one of them on its own - in palette mode,
+# at the frame's own size, without compositing it onto the screen the way PIL's seek() does
+
+GIF_HEADERS = (b"GIF87a", b"GIF89a")
+EXTENSION = 0x21
+IMAGE_DESCRIPTOR = 0x2C
+TRAILER = 0x3B
+GRAPHIC_CONTROL_LABEL = 0xF9
+
+# GCE disposal methods: what happens to a frame's area before the next frame is drawn
+DISPOSE_BACKGROUND = 2
+DISPOSE_PREVIOUS = 3
+
+class GifFormatError(ValueError):
+    pass
+
+# One frame's descriptor and GCE fields, and where its colour table and LZW data sit in the file
+class GifFrame:
+    __slots__ = ("left", "top", "width", "height", "interlaced", "palette", "transparency", "disposal", "data")
+
+    def __init__(self, left, top, width, height, interlaced, palette, transparency, disposal, data):
+        self.left = left
+        self.top = top
+        self.width = width
+        self.height = height
+        self.interlaced = interlaced
+        # RGB triplets - the local colour table, else the global one, else b""
+        self.palette = palette
+        # Transparent colour index, or None
+        self.transparency = transparency
+        self.disposal = disposal
+        # LZW minimum code size and the image data sub-blocks, as stored
+        self.data = data
+
+# Skip a chain of data sub-blocks (length byte + data, ending with a zero length), returning the offset after it
+def _skip_sub_blocks(data: bytes, pos: int) -> int:
+    end = len(data)
+    while pos < end:
+        size = data[pos]
+        pos += 1
+        if size == 0:
+            return pos
+        pos += size
+    return end
+
+def _colour_table_size(packed: int) -> int:
+    return 3 * (2 << (packed & 0x07)) if packed & 0x80 else 0
+
+# Peak number of frames starting within any one-second window - the rate a viewer actually sees changes at
+def _peak_frames_per_second(delays: list[int]) -> int:
+    starts, elapsed = [], 0
+    for delay in delays:
+        starts.append(elapsed)
+        elapsed += delay
+
+    peak, first = 0, 0
+    for i, start in enumerate(starts):
+        while start - starts[first] >= 1000:
+            first += 1
+        peak = max(peak, i - first + 1)
+    return peak
+
+def _uint16(data: bytes, pos: int) -> int:
+    return int.from_bytes(data[pos:pos + 2], "little")
+
+def inspect_gif(data: bytes, frame_limit: int | None = None) -> GifInfo:
+    if data[:6] not in GIF_HEADERS or len(data) < 13:
+        raise GifFormatError("Not a GIF file")
+
+    # Logical screen descriptor, then the optional global colour table
+    pos = 13 + _colour_table_size(data[10])
+
+    delays: list[int] = []
+    pending_delay = None
+    truncated = False
+    end = len(data)
+
+    while pos < end:
+        block = data[pos]
+
+        if block == IMAGE_DESCRIPTOR:
+            if frame_limit is not None and len(delays) >= frame_limit:
+                truncated = True
+                break
+
+            delays.append(pending_delay or 0)
+            pending_delay = None
+
+            # 9-byte descriptor, optional local colour table, LZW minimum code size, then the image data
+            packed = data[pos + 9] if pos + 9 < end else 0
+            pos += 10 + _colour_table_size(packed) + 1
+            pos = _skip_sub_blocks(data, pos)
+
+        elif block == EXTENSION:
+            label = data[pos + 1] if pos + 1 < end else 0
+            if label == GRAPHIC_CONTROL_LABEL and pos + 6 < end:
+                # size (4), packed fields, delay (little-endian uint16), transparent colour index
+                pending_delay = int.from_bytes(data[pos + 4:pos + 6], "little") * 10
+            pos = _skip_sub_blocks(data, pos + 2)
+
+        elif block == TRAILER:
+            break
+
+        else:
+            # Stray byte between blocks - skipped, as PIL does
+            pos += 1
+
+    frame_count = len(delays)
+    avg_duration = sum(delays) / frame_count if frame_count else 0  # ms
+
+    return GifInfo(
+        frame_count=frame_count,
+        delays=delays,
+        fps=1000 / avg_duration if avg_duration > 0 else 0,
+        min_delay=min(delays) if delays else 0,
+        peak_frames_per_second=_peak_frames_per_second(delays),
+        truncated=truncated
+    )
+
+# Logical screen width, height, global colour table and background colour index
+def screen(data: bytes) -> tuple[int, int, bytes, int]:
+    if data[:6] not in GIF_HEADERS or len(data) < 13:
+        raise GifFormatError("Not a GIF file")
+    return _uint16(data, 6), _uint16(data, 8), bytes(data[13:13 + _colour_table_size(data[10])]), data[11]
+
+# Each frame in the file, in order - nothing is decoded
+def iter_frames(data: bytes):
+    global_palette = screen(data)[2]
+    pos = 13 + len(global_palette)
+    transparency, disposal = None, 0
+    end = len(data)
+
+    while pos < end:
+        block = data[pos]
+
+        if block == IMAGE_DESCRIPTOR:
+            if pos + 10 > end:
+                break
+            # 9-byte descriptor: left, top, width, height, packed fields
+            left, top, width, height = (_uint16(data, pos + offset) for offset in (1, 3, 5, 7))
+            packed = data[pos + 9]
+            table = pos + 10
+            start = table + _colour_table_size(packed)
+            pos = _skip_sub_blocks(data, start + 1)
+            yield GifFrame(
+                left, top, width, height,
+                interlaced=bool(packed & 0x40),
+                palette=bytes(data[table:start]) if packed & 0x80 else global_palette,
+                transparency=transparency,
+                disposal=disposal,
+                data=data[start:pos]
+            )
+            transparency, disposal = None, 0
+
+        elif block == EXTENSION:
+            label = data[pos + 1] if pos + 1 < end else 0
+            if label == GRAPHIC_CONTROL_LABEL and pos + 6 < end:
+                packed = data[pos + 3]
+                transparency = data[pos + 6] if packed & 0x01 else None
+                disposal = (packed >> 2) & 0x07
+            pos = _skip_sub_blocks(data, pos + 2)
+
+        elif block == TRAILER:
+            break
+
+        else:
+            pos += 1
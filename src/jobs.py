@@ -0,0 +1,327 @@
+import asyncio
+import ipaddress
+import logging
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Awaitable, Callable
+from urllib.parse import urlsplit, urlunsplit
+from fastapi import HTTPException
+from .config import (
+    JOBS_SQLITE_PATH,
+    JOBS_WORKERS,
+    JOBS_MAX_PENDING,
+    JOBS_RETENTION_SECONDS,
+    JOBS_WEBHOOK_TIMEOUT_SECONDS,
+    JOBS_CALLBACK_HOSTS,
+    EXECUTOR_RETRY_AFTER_SECONDS
+)
+from .models import BatchItemError, CreativeApprovalResponse, JobStatus, JobTimings, Metadata
+from .pipeline import evaluate_creative
+from .services import ImageRejected
+from .upload import Contents
+
+logger = logging.getLogger(__name__)
+
+# Asynchronous jobs: POST /jobs stores the creative and returns a job id straight away, a pool of
+# worker tasks evaluates queued jobs through the same pipeline as /creative-approval, and the client
+# polls GET /jobs/{id} or is called back at its webhook URL. Jobs live in a local SQLite file, so
+# queued jobs (and any left running by a crash or restart) are picked up again on the next start.
+# The upload bytes are only kept until the job finishes.
+
+# Job rows in a local SQLite file - the source of truth for status, the in-process queue only holds ids.
+# Every call is a blocking SQLite transaction: JobQueue runs them in a thread, off the event loop
+class JobStore:
+    def __init__(self, path: str = JOBS_SQLITE_PATH, retention: float = JOBS_RETENTION_SECONDS):
+        self.path = path
+        self.retention = retention
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            "id TEXT PRIMARY KEY, status TEXT NOT NULL, filename TEXT, metadata TEXT NOT NULL, "
+            "contents BLOB, callback_url TEXT, result TEXT, error TEXT, "
+            "submitted_at REAL NOT NULL, started_at REAL, finished_at REAL, "
+            "queued_ms REAL, run_ms REAL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, submitted_at)")
+
+    def add(self, contents: Contents, filename: str | None, meta: Metadata, callback_url: str | None) -> str:
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO jobs (id, status, filename, metadata, contents, callback_url, submitted_at) "
+                "VALUES (?, 'queued', ?, ?, ?, ?, ?)",
+                (job_id, filename, meta.model_dump_json(), bytes(contents), callback_url, now)
+            )
+            # Finished jobs are kept for polling until the retention period is up
+            self._conn.execute(
+                "DELETE FROM jobs WHERE status IN ('done', 'failed') AND finished_at < ?", (now - self.retention,)
+            )
+        return job_id
+
+    # Mark a queued job running and return its inputs - None if another worker already took it
+    def claim(self, job_id: str) -> tuple[bytes, str | None, Metadata, str | None] | None:
+        now = time.time()
+        with self._lock:
+            claimed = self._conn.execute(
+                "UPDATE jobs SET status = 'running', started_at = ?, queued_ms = (? - submitted_at) * 1000 "
+                "WHERE id = ? AND status = 'queued'",
+                (now, now, job_id)
+            ).rowcount
+            if not claimed:
+                return None
+            contents, filename, metadata, callback_url = self._conn.execute(
+                "SELECT contents, filename, metadata, callback_url FROM jobs WHERE id = ?", (job_id,)
+            ).fetchone()
+        return contents, filename, Metadata.model_validate_json(metadata), callback_url
+
+    def finish(self, job_id: str, result: CreativeApprovalResponse | None, error: BatchItemError | None) -> None:
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, result = ?, error = ?, contents = NULL, "
+                "finished_at = ?, run_ms = (? - started_at) * 1000 WHERE id = ?",
+                (
+                    "done" if error is None else "failed",
+                    result.model_dump_json(context={"reason_codes": True}) if result is not None else None,
+                    error.model_dump_json() if error is not None else None,
+                    now, now, job_id
+                )
+            )
+
+    def get(self, job_id: str) -> JobStatus | None:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT id, status, filename, result, error, submitted_at, started_at, finished_at, queued_ms, run_ms "
+                "FROM jobs WHERE id = ?", (job_id,)
+            ).fetchone()
+        if row is None:
+            return None
+
+        job_id, status, filename, result, error, submitted_at, started_at, finished_at, queued_ms, run_ms = row
+        return JobStatus(
+            job_id=job_id,
+            status=status,
+            filename=filename,
+            result=CreativeApprovalResponse.model_validate_json(result) if result else None,
+            error=BatchItemError.model_validate_json(error) if error else None,
+            submitted_at=submitted_at,
+            started_at=started_at,
+            finished_at=finished_at,
+            timings=JobTimings(
+                queued_ms=queued_ms,
+                run_ms=run_ms,
+                total_ms=(finished_at - submitted_at) * 1000 if finished_at else None
+            )
+        )
+
+    # Jobs left running when the process stopped go back to queued. Only safe while no other process is
+    # running jobs from the same file - the multi-worker server does this once, before forking its workers
+    def requeue_running(self) -> None:
+        with self._lock:
+            self._conn.execute("UPDATE jobs SET status = 'queued', started_at = NULL WHERE status = 'running'")
+
+    # Queued jobs in submission order. Claims are atomic, so any number of processes can queue the same ids
+    def queued(self) -> list[str]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id FROM jobs WHERE status = 'queued' ORDER BY submitted_at"
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def pending(self) -> int:
+        with self._lock:
+            return self._conn.execute(
+                "SELECT COUNT(*) FROM jobs WHERE status IN ('queued', 'running')"
+            ).fetchone()[0]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM jobs")
+
+    def close(self) -> None:
+        self._conn.close()
+
+# In-process queue and worker pool over a JobStore. Workers start on the first submission (or start()),
+# and submissions past max_pending get a 503 with a Retry-After header, like the executor's queue
+class JobQueue:
+    def __init__(
+        self,
+        store: JobStore | None = None,
+        workers: int = JOBS_WORKERS,
+        max_pending: int = JOBS_MAX_PENDING,
+        webhook_timeout: float = JOBS_WEBHOOK_TIMEOUT_SECONDS,
+        callback_hosts: tuple[str, ...] = JOBS_CALLBACK_HOSTS,
+        requeue_running: bool = True
+    ):
+        self._store = store
+        self.requeue_running = requeue_running
+        self.workers = workers
+        self.max_pending = max_pending
+        self.webhook_timeout = webhook_timeout
+        self.callback_hosts = callback_hosts
+        self._queue: asyncio.Queue[str] | None = None
+        self._tasks: list[asyncio.Task] = []
+        self._callbacks: list[Callable[[JobStatus], Awaitable[None] | None]] = []
+
+    # The SQLite file is only opened once jobs are used
+    @property
+    def store(self) -> JobStore:
+        if self._store is None:
+            self._store = JobStore()
+        return self._store
+
+    # Called with each job's final status once it finishes - in-process alternative to a webhook
+    def subscribe(self, callback: Callable[[JobStatus], Awaitable[None] | None]) -> None:
+        self._callbacks.append(callback)
+
+    # Start the workers and queue any jobs left over from a previous run
+    def start(self) -> None:
+        if self._tasks:
+            return
+        self._queue = asyncio.Queue()
+        if self.requeue_running:
+            self.store.requeue_running()
+        for job_id in self.store.queued():
+            self._queue.put_nowait(job_id)
+        self._tasks = [
+            asyncio.create_task(self._work(), name=f"creative-job-{i}") for i in range(self.workers)
+        ]
+
+    # Finish the queued jobs for up to drain_timeout seconds, then stop the workers.
+    # Jobs still queued stay in the store for the next start
+    async def stop(self, drain_timeout: float = 0) -> None:
+        if self._queue is not None and drain_timeout > 0:
+            try:
+                await asyncio.wait_for(self._queue.join(), drain_timeout)
+            except asyncio.TimeoutError:
+                logger.warning("Stopping with %d jobs still queued", self._queue.qsize())
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._queue = None
+
+    def _listed(self, host: str) -> bool:
+        return any(host == allowed or (allowed.startswith(".") and host.endswith(allowed)) for allowed in self.callback_hosts)
+
+    # Checked on submission, before the upload is read: an http(s) URL, to a listed host when there's a list
+    def check_callback_url(self, url: str) -> None:
+        parts = urlsplit(url)
+        if parts.scheme not in ("http", "https") or not parts.hostname:
+            raise HTTPException(status_code=422, detail="callback_url must be an http(s) URL")
+        if self.callback_hosts and not self._listed(parts.hostname):
+            raise HTTPException(status_code=422, detail=f"callback_url host is not allowed: {parts.hostname}")
+
+    async def submit(self, contents: Contents, filename: str | None, meta: Metadata, callback_url: str | None = None) -> str:
+        self.start()
+        if await asyncio.to_thread(self.store.pending) >= self.max_pending:
+            raise HTTPException(
+                status_code=503,
+                detail="Server busy: job queue is full. Please retry.",
+                headers={"Retry-After": str(EXECUTOR_RETRY_AFTER_SECONDS)}
+            )
+        job_id = await asyncio.to_thread(self.store.add, contents, filename, meta, callback_url)
+        self._queue.put_nowait(job_id)
+        return job_id
+
+    async def get(self, job_id: str) -> JobStatus | None:
+        return await asyncio.to_thread(self.store.get, job_id)
+
+    # Wait until every queued job has finished (tests and graceful shutdown)
+    async def join(self) -> None:
+        if self._queue is not None:
+            await self._queue.join()
+
+    async def _work(self) -> None:
+        while True:
+            job_id = await self._queue.get()
+            try:
+                await self._run(job_id)
+            except Exception:
+                logger.exception("Job %s failed unexpectedly", job_id)
+            finally:
+                self._queue.task_done()
+
+    async def _run(self, job_id: str) -> None:
+        claimed = await asyncio.to_thread(self.store.claim, job_id)
+        if claimed is None:
+            return
+        contents, filename, meta, callback_url = claimed
+
+        result, error = None, None
+        try:
+            result = await evaluate_creative(contents, filename, meta)
+        except HTTPException as e:
+            error = BatchItemError(status_code=e.status_code, detail=e.detail)
+        except ImageRejected as e:
+            error = BatchItemError(status_code=422, detail=e.detail)
+        except Exception:
+            logger.exception("Job %s failed", job_id)
+            error = BatchItemError(status_code=500, detail="Unexpected error evaluating creative")
+        await asyncio.to_thread(self.store.finish, job_id, result, error)
+
+        status = await self.get(job_id)
+        for callback in self._callbacks:
+            try:
+                outcome = callback(status)
+                if asyncio.iscoroutine(outcome):
+                    await outcome
+            except Exception:
+                logger.exception("Job callback failed for %s", job_id)
+        if callback_url:
+            await self._notify(callback_url, status)
+
+    # Addresses an unlisted callback host resolves to, or None when any of them isn't public - so a job
+    # can't make this service call its own loopback, the private network or a cloud metadata endpoint
+    async def _public_addresses(self, host: str, port: int) -> list[str] | None:
+        try:
+            infos = await asyncio.get_running_loop().getaddrinfo(host, port, type=socket.SOCK_STREAM)
+        except OSError:
+            return None
+        addresses = [info[4][0] for info in infos]
+        for address in addresses:
+            ip = ipaddress.ip_address(address.split("%")[0])
+            if not ip.is_global or ip.is_multicast:
+                return None
+        return addresses
+
+    # POST the final status to the job's webhook. Delivery is best effort - a failure is logged, and the
+    # result stays available through GET /jobs/{id}. httpx is only imported once a webhook is used.
+    # Redirects aren't followed, so a public host can't bounce the call to an internal one
+    async def _notify(self, url: str, status: JobStatus) -> None:
+        parts = urlsplit(url)
+        host = (parts.hostname or "").lower()
+        target, headers, extensions = url, {"Content-Type": "application/json"}, {}
+        if not self._listed(host):
+            port = parts.port or (443 if parts.scheme == "https" else 80)
+            addresses = await self._public_addresses(host, port) if host else None
+            if not addresses:
+                logger.warning("Webhook for job %s to %s refused: host is not public", status.job_id, url)
+                return
+            # Connect to the address just checked - letting httpx resolve the name again would let a rebinding
+            # host answer with an internal one. The URL's host still goes in the Host header and, over https,
+            # is the TLS server name the certificate is checked against
+            ip = ipaddress.ip_address(addresses[0].split("%")[0])
+            userinfo, _, netloc = parts.netloc.rpartition("@")
+            literal = f"[{ip}]" if ip.version == 6 else str(ip)
+            target = urlunsplit(parts._replace(netloc=f"{userinfo + '@' if userinfo else ''}{literal}:{port}"))
+            headers["Host"] = netloc
+            extensions["sni_hostname"] = host
+
+        import httpx
+        try:
+            async with httpx.AsyncClient(timeout=self.webhook_timeout) as client:
+                response = await client.post(
+                    target, content=status.model_dump_json(), headers=headers, extensions=extensions
+                )
+                response.raise_for_status()
+        except httpx.HTTPError as e:
+            logger.warning("Webhook for job %s to %s failed: %s", status.job_id, url, e)
+
+JOB_QUEUE = JobQueue()
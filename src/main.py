@@ -1,47 +1,74 @@
-import json
-from pydantic import ValidationError
+from contextlib import asynccontextmanager
 from typing import Optional
 from datetime import datetime
 from fastapi import (
     FastAPI, 
     File, 
     Form, 
+    Request,
+    Response,
     UploadFile, 
     HTTPException
 )
-from .models import CreativeApprovalResponse, Metadata
-from .services import (
-    open_file, 
-    validate_image, 
-    calculate_contrast, 
-    get_gif_info, 
-)
-from .checks import (
-    check_filename, 
-    check_metadata
-)
-from .rules import (
-    MIN_CONTRAST, 
-    MIN_WIDTH, 
-    MIN_HEIGHT, 
-    MAX_WIDTH, 
-    MAX_HEIGHT, 
-    MAX_ASPECT_RATIO, 
-    MIN_ASPECT_RATIO, 
-    MAX_FILE_BYTES
-)
-from .constants import (
-    STATUS_APPROVED, 
-    STATUS_REJECTED, 
-    STATUS_REQUIRES_REVIEW
-)
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from pydantic import BaseModel, TypeAdapter
+from .admission import AdmissionMiddleware
+from .models import BatchItemResult, CreativeApprovalResponse, JobStatus
+from .services import ImageRejected, read_body, read_file
+from .executor import ENGINE
+from .engine import RULE_ENGINE
+from .terms_store import TERMS_STORE
+from .pipeline import evaluate_creative, parse_metadata
+from .metrics import REGISTRY, STAGE_DURATION
+from .batch import collect_items, evaluate_batch, parse_batch_metadata
+from .jobs import JOB_QUEUE
+from .ocr import check_ocr_engine
+from .phash import PHASH_INDEX
+from .config import JOBS_DRAIN_SECONDS, PHASH_MODE
+
+# Check the OCR engine is usable (if OCR is on), start loading the near-duplicate index, watch the rule set and
+# terms files for changes while the server runs and resume any unfinished jobs; shut the job workers and worker
+# pools down cleanly when it stops
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    check_ocr_engine()
+    if PHASH_MODE != "off":
+        PHASH_INDEX.preload()
+    RULE_ENGINE.start_watching()
+    TERMS_STORE.start_watching()
+    JOB_QUEUE.start()
+    yield
+    await JOB_QUEUE.stop(drain_timeout=JOBS_DRAIN_SECONDS)
+    TERMS_STORE.stop_watching()
+    RULE_ENGINE.stop_watching()
+    ENGINE.shutdown()
 
 app = FastAPI(
     title="Creative Approval API", 
     version="0.1.0", 
-    description="An API to return a creative approval response based on some simple heuristics"
+    description="An API to return a creative approval response based on some simple heuristics",
+    lifespan=lifespan
 )
 
+# Per-client rate limits and per-worker admission control in front of every upload endpoint (see admission.py)
+app.add_middleware(AdmissionMiddleware)
+
+BATCH_RESULTS = TypeAdapter(list[BatchItemResult])
+
+# Serialise an endpoint's result straight to JSON, with each reason as its message or, with reason_codes, as
+# {code, args, message}. Returning the model instead would have FastAPI dump it to a dict and validate that
+# against the response model again before serialising it
+def json_response(content: BaseModel | list[BatchItemResult], reason_codes: bool = False) -> Response:
+    context = {"reason_codes": reason_codes}
+    if isinstance(content, list):
+        return Response(BATCH_RESULTS.dump_json(content, context=context), media_type="application/json")
+    return Response(content.model_dump_json(context=context), media_type="application/json")
+
+# Unreadable/unsupported images are reported from the worker pool → 422, same shape as HTTPException
+@app.exception_handler(ImageRejected)
+async def image_rejected_handler(request: Request, exc: ImageRejected):
+    return JSONResponse(status_code=422, content={"detail": exc.detail})
+
 # GET /health
 @app.get("/health")
 def get_health():
@@ -51,100 +78,93 @@ def get_health():
         "timestamp": datetime.utcnow().isoformat() + "Z"
     }
 
+# GET /metrics - per-stage latency, outcomes and volumes in Prometheus text format
+@app.get("/metrics", response_class=PlainTextResponse)
+def get_metrics():
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
 # POST /creative-approval
 @app.post("/creative-approval", response_model=CreativeApprovalResponse)
 async def creative_approval(
     file: UploadFile = File(...),
-    metadata: Optional[str] = Form(None)
+    metadata: Optional[str] = Form(None),
+    reason_codes: bool = False
 ):
-    # If there is metadata, load int into the Metadata Pydantic model.
-    # If there are forbidden keys, throw a 422 error.
-    try:
-        meta = Metadata.model_validate_json(metadata) if metadata else Metadata()
-    except (ValidationError, ValueError) as e:
-        detail = {
-            "message": "Invalid metadata. Valid keys include; market, placement, audience & category.",
-            "errors": e.errors() if isinstance(e, ValidationError) else str(e),
-        }
-        raise HTTPException(status_code=422, detail=detail)
-
-    # Open the file
-    img, size_bytes  = await open_file(file)
-    size_mb = round(size_bytes / (1024 * 1024), 2)
-
-    # Check file size is not over limit → if truthy, raise 422 error
-    limit_mb = round(MAX_FILE_BYTES / (1024 * 1024))
-    if size_bytes > MAX_FILE_BYTES: 
-        raise HTTPException(status_code=422, detail=f"File too large: {size_mb} MB (limit {limit_mb} MB)")
-
-    # 1. Check File Properties
-
-    # 1.1 Validate file format; returns a 422 error if invalid:
-    img_format, width, height = await validate_image(img)
-
-    # Default response, with file format, width, height, and size in mb
-    response = {
-        "status": STATUS_APPROVED,
-        "reasons": [],
-        "img_format": img_format,
-        "img_width": width,
-        "img_height": height,
-        "img_size_mb": size_mb
-    }
-
-    # 1.2 Check file format; handle GIF checks
-    if img_format == "GIF":
-        frame_count, fps = get_gif_info(img)
-
-        if frame_count > 100:
-            response["status"] = STATUS_REQUIRES_REVIEW
-            response["reasons"].append(f"GIF too complex: {frame_count} frames")
-
-        if fps > 10:
-            response["status"] = STATUS_REQUIRES_REVIEW
-            response["reasons"].append(f"GIF framerate too high: {fps:.1f} fps")
-
-
-    # 1.3 Check resolution
-    if width < MIN_WIDTH or height < MIN_HEIGHT:
-        response["status"] = STATUS_REQUIRES_REVIEW
-        response["reasons"].append(
-            f"Image resolution too low: {width}x{height}px"
-        )
-
-    if width > MAX_WIDTH or height > MAX_HEIGHT:
-        response["status"] = STATUS_REJECTED
-        response["reasons"].append(
-            f"Image resolution too high: {width}x{height}px"
-        )
-
-    # 1.4 Check aspect ratio
-    aspect_ratio = width / height
-    if aspect_ratio > MAX_ASPECT_RATIO or aspect_ratio < MIN_ASPECT_RATIO: # if ratio is greater than 2:1 or lower than 1:2
-        response["status"] = STATUS_REQUIRES_REVIEW
-        response["reasons"].append(
-            f"Aspect ratio out of bounds (0.5-2.0): {aspect_ratio:.2f}"
-        )   
-
-    # 1.5 Check contrast 
-    contrast = calculate_contrast(img)
-    if contrast < MIN_CONTRAST:
-        response["status"] = STATUS_REQUIRES_REVIEW
-        response["reasons"].append(
-            f"Image contrast too low (score {contrast:.2f})"
-    )
-        
-    # 2. Check filename for restricted/prohibited terms
-    status, reasons = check_filename(file.filename)
-    if status != STATUS_APPROVED:
-        response["status"] = status
-        response["reasons"].extend(reasons)
-
-    # 3. Metadata checks (if parsed)
-    if meta:
-        status, reasons = check_metadata(meta)
-        if status != STATUS_APPROVED:
-            response["status"] = status
-            response["reasons"].extend(reasons)
-
-    return CreativeApprovalResponse(**response)
+    # Parse the metadata; throws a 422 error for forbidden keys
+    meta = parse_metadata(metadata)
+
+    # Map the spooled file; raises a 422 error if it's over MAX_FILE_BYTES (a body too large to hold one
+    # within the limit was already cut off as it arrived)
+    with STAGE_DURATION.time(stage="upload_read"):
+        contents = await read_file(file)
+
+    return json_response(await evaluate_creative(contents, file.filename, meta), reason_codes)
+
+# POST /creative-approval/raw
+# The image itself as the request body, for high-volume clients - no multipart encoding to build or parse, and no
+# metadata JSON to decode. The filename is the `filename` query parameter (or an X-Filename header), and the
+# metadata is the market, placement, audience and category query parameters. Same response as /creative-approval
+@app.post("/creative-approval/raw", response_model=CreativeApprovalResponse)
+async def creative_approval_raw(request: Request, filename: Optional[str] = None, reason_codes: bool = False):
+    # Parse the metadata from the remaining query parameters; throws a 422 error for forbidden keys
+    meta = parse_metadata({
+        key: value for key, value in request.query_params.items() if key not in ("filename", "reason_codes")
+    })
+
+    # Read the body as it arrives; raises a 422 error as soon as it goes over MAX_FILE_BYTES
+    with STAGE_DURATION.time(stage="upload_read"):
+        contents = await read_body(request)
+
+    result = await evaluate_creative(contents, filename or request.headers.get("x-filename"), meta)
+    return json_response(result, reason_codes)
+
+# POST /creative-approval/batch
+# Many files (or zip archives of images) in one request, each with its own metadata.
+# Returns one result per creative in upload order, or with ?stream=true, NDJSON lines as each finishes
+@app.post("/creative-approval/batch", response_model=list[BatchItemResult])
+async def creative_approval_batch(
+    files: list[UploadFile] = File(...),
+    metadata: Optional[str] = Form(None),
+    stream: bool = False,
+    reason_codes: bool = False
+):
+    items = await collect_items(files)
+    item_metadata = parse_batch_metadata(metadata, items)
+    results = evaluate_batch(items, item_metadata)
+
+    if stream:
+        async def ndjson():
+            async for item in results:
+                yield item.model_dump_json(context={"reason_codes": reason_codes}) + "\n"
+        return StreamingResponse(ndjson(), media_type="application/x-ndjson")
+
+    return json_response(sorted([item async for item in results], key=lambda item: item.index), reason_codes)
+
+# POST /jobs
+# Same inputs as /creative-approval, plus an optional callback_url. Returns 202 with the job id straight away;
+# the result is fetched from GET /jobs/{job_id}, and POSTed to callback_url (if given) once the job finishes
+@app.post("/jobs", response_model=JobStatus, status_code=202)
+async def submit_job(
+    response: Response,
+    file: UploadFile = File(...),
+    metadata: Optional[str] = Form(None),
+    callback_url: Optional[str] = Form(None)
+):
+    meta = parse_metadata(metadata)
+    if callback_url:
+        JOB_QUEUE.check_callback_url(callback_url)
+
+    with STAGE_DURATION.time(stage="upload_read"):
+        contents = await read_file(file)
+
+    job_id = await JOB_QUEUE.submit(contents, file.filename, meta, callback_url)
+    response.headers["Location"] = f"/jobs/{job_id}"
+    return await JOB_QUEUE.get(job_id)
+
+# GET /jobs/{job_id}
+@app.get("/jobs/{job_id}", response_model=JobStatus)
+async def get_job(job_id: str, reason_codes: bool = False):
+    job = await JOB_QUEUE.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return json_response(job, reason_codes)
@@ -0,0 +1,353 @@
+import hashlib
+import json
+import logging
+import os
+import pickle
+import re
+import tempfile
+import unicodedata
+from collections import deque
+from functools import lru_cache
+from .config import MATCHER_CACHE_DIR
+from .terms import (
+    PROHIBITED_THEMES_KEYWORDS,
+    AGE_PROHIBITED_THEMES_KEYWORDS,
+    RESTRICTED_THEMES_KEYWORDS,
+    RESTRICTED_COUNTRY_KEYWORDS,
+    CHILD_AUDIENCE_KEYWORDS,
+    CHILD_PLACEMENT_KEYWORDS
+)
+
+logger = logging.getLogger(__name__)
+
+# Category tags attached to every term in the automaton
+PROHIBITED = "prohibited"
+AGE_PROHIBITED = "age_prohibited"
+RESTRICTED = "restricted"
+RESTRICTED_COUNTRY = "restricted_country"
+CHILD_AUDIENCE = "child_audience"
+CHILD_PLACEMENT = "child_placement"
+
+# Match modes, written into the term lists as markers:
+#   "term"   → exact: whole words only, so "green" doesn't match "evergreen"
+#   "term*"  → prefix: the last word may carry on, so "weapon*" matches "weapons" and "weaponry"
+#   "*term*" → substring: anywhere in the text, including inside other words
+EXACT = "exact"
+PREFIX = "prefix"
+SUBSTRING = "substring"
+
+# Text and terms are normalised the same way before matching: Unicode NFKC, casefolded, curly
+# apostrophes straightened, and runs of whitespace, "-" and "_" collapsed to one space
+SEPARATORS = re.compile(r"[\s\-_]+")
+
+# Leetspeak substitutions undone in a second pass over words that contain letters, e.g. "c0ca1ne" → "cocaine"
+LEET_TABLE = str.maketrans({"0": "o", "1": "i", "3": "e", "4": "a", "5": "s", "7": "t", "@": "a", "$": "s"})
+LEET_WORDS = re.compile(r"[\w@$]*[a-z][\w@$]*")
+LEET_CHARS = frozenset("013457@$")
+
+# Metadata values repeat constantly (markets, placements, audiences), so normalised forms are memoised
+@lru_cache(maxsize=4096)
+def normalise_text(text: str) -> str:
+    text = unicodedata.normalize("NFKC", text).casefold().replace("\u2019", "'")
+    return SEPARATORS.sub(" ", text)
+
+# Filenames and metadata are split into words on anything that isn't a letter or digit ("_", "-", ".",
+# spaces), on camelCase humps ("LapDance" → "Lap Dance") and between letters and digits ("kids2024")
+CAMEL_CASE = re.compile(r"(?<=[^\W\d_])(?<![A-Z])(?=[A-Z])|(?<=[A-Z])(?=[A-Z][a-z])")
+DIGIT_BOUNDARY = re.compile(r"(?<=[^\W\d_])(?=\d)|(?<=\d)(?=[^\W\d_])")
+WORDS = re.compile(r"(?:[^\W_]|[@$])+")
+TOKENS = re.compile(r"[^\W_]+")
+
+# Leetspeak reading of normalised text, or None if there's nothing to undo
+def leet_variant(text: str) -> str | None:
+    if LEET_CHARS.isdisjoint(text):
+        return None
+    variant = LEET_WORDS.sub(lambda word: word.group().translate(LEET_TABLE), text)
+    return variant if variant != text else None
+
+# Split a term marker off its word, e.g. "weapon*" → ("weapon", PREFIX)
+def parse_term(term: str) -> tuple[str, str]:
+    if len(term) > 2 and term.startswith("*") and term.endswith("*"):
+        return term[1:-1], SUBSTRING
+    if term.endswith("*"):
+        return term[:-1], PREFIX
+    return term, EXACT
+
+def split_tokens(word: str) -> list[str]:
+    return [token for part in TOKENS.findall(word) for token in DIGIT_BOUNDARY.sub(" ", part).split()]
+
+# Every word-by-word reading of a text: the plain one, plus a leetspeak one for words that are
+# mostly letters ("c0ca1ne" → "cocaine", but "300x250" is left alone). Memoised like normalise_text
+@lru_cache(maxsize=4096)
+def tokenise(text: str) -> tuple[tuple[str, ...], ...]:
+    text = CAMEL_CASE.sub(" ", unicodedata.normalize("NFKC", text))
+    words = WORDS.findall(normalise_text(text))
+    readings = [tuple(token for word in words for token in split_tokens(word))]
+
+    leet_words = []
+    for word in words:
+        letters = sum(char.isalpha() for char in word)
+        leet_chars = sum(char in LEET_CHARS for char in word)
+        leet_words.append(word.translate(LEET_TABLE) if leet_chars and letters >= leet_chars else word)
+    if leet_words != words:
+        readings.append(tuple(token for word in leet_words for token in split_tokens(word)))
+
+    return tuple(readings)
+
+# Every token sequence a term is matched under: its words, plus multi-word terms written as one word
+def term_token_variants(word: str) -> set[tuple[str, ...]]:
+    tokens = tuple(split_tokens(normalise_text(word)))
+    if not tokens:
+        return set()
+    variants = {tokens}
+    if len(tokens) > 1:
+        variants.add(("".join(tokens),))
+    return variants
+
+# Every spelling a term is matched under: normalised, plus multi-word terms written as one word,
+# so "lap-dancing", "lap dancing", "lap_dancing" and "lapdancing" all match the same term
+def term_variants(term: str) -> set[str]:
+    base = normalise_text(term).strip()
+    variants = {base}
+    if " " in base:
+        variants.add(base.replace(" ", ""))
+    return variants
+
+# Aho-Corasick automaton over keyword lists, tagged by category - plain substring matching.
+# A single pass over the text finds every term that occurs as a substring, so the cost
+# of a scan depends on the length of the text, not on how many terms the lists hold.
+class KeywordMatcher:
+    def __init__(self, categories: dict[str, list[str]]):
+        self.categories = {name: list(terms) for name, terms in categories.items()}
+
+        # Node 0 is the root. Each node has a goto table, a failure link and an output list
+        # of (category, index) pairs, where index is the term's position in its category list
+        self._goto: list[dict[str, int]] = [{}]
+        self._fail: list[int] = [0]
+        self._out: list[list[tuple[str, int]]] = [[]]
+
+        for name, terms in self.categories.items():
+            for index, term in enumerate(terms):
+                for variant in term_variants(term):
+                    self._add(variant, (name, index))
+
+        self._build_failure_links()
+
+        # The automaton never changes once built, so repeated texts reuse their scan
+        self.scan = lru_cache(maxsize=4096)(self._scan)
+
+    # Pickled without the scan cache (see compile_matcher), which is rebuilt empty on load
+    def __getstate__(self) -> dict:
+        return {name: value for name, value in self.__dict__.items() if name != "scan"}
+
+    def __setstate__(self, state: dict) -> None:
+        self.__dict__.update(state)
+        self.scan = lru_cache(maxsize=4096)(self._scan)
+
+    def _add(self, term: str, tag: tuple[str, int]) -> None:
+        node = 0
+        for char in term:
+            nxt = self._goto[node].get(char)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[node][char] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+            node = nxt
+        self._out[node].append(tag)
+
+    def _build_failure_links(self) -> None:
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, child in self._goto[node].items():
+                queue.append(child)
+                fallback = self._fail[node]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                target = self._goto[fallback].get(char, 0)
+                self._fail[child] = target if target != child else 0
+                # Inherit the outputs of the failure target so every suffix match is reported
+                self._out[child] = self._out[child] + self._out[self._fail[child]]
+
+    def _walk(self, text: str, hits: dict[str, set[int]]) -> None:
+        goto, fail, out = self._goto, self._fail, self._out
+        node = 0
+
+        for char in text:
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+            for name, index in out[node]:
+                hits.setdefault(name, set()).add(index)
+
+    # Return every matched term grouped by category, in the order of the category's term list.
+    # Results are memoised and shared between callers - treat them as read-only
+    def _scan(self, text: str) -> dict[str, list[str]]:
+        text = normalise_text(text)
+        hits: dict[str, set[int]] = {}
+        self._walk(text, hits)
+
+        leet = leet_variant(text)
+        if leet is not None:
+            self._walk(leet, hits)
+
+        return {
+            name: [self.categories[name][i] for i in sorted(indices)]
+            for name, indices in hits.items()
+        }
+
+# Word-boundary matcher over the keyword lists, honouring each term's match mode.
+# Exact and prefix terms are indexed by their first token (multi-word terms are checked token by
+# token from there) and single-word prefix terms by the prefix itself, so a scan is a few dict
+# lookups per word of text. Substring terms go through a KeywordMatcher automaton as before.
+class TokenMatcher:
+    def __init__(self, categories: dict[str, list[str]]):
+        self.categories = {name: list(terms) for name, terms in categories.items()}
+
+        # Terms as reported in reasons - without their mode markers
+        self._words = {name: [parse_term(term)[0] for term in terms] for name, terms in self.categories.items()}
+
+        # first token → (term tokens, last token is a prefix, category, index)
+        self._index: dict[str, list[tuple[tuple[str, ...], bool, str, int]]] = {}
+        # single-word prefix → (category, index)
+        self._prefixes: dict[str, list[tuple[str, int]]] = {}
+        # substring terms, and their position in each category list
+        substrings: dict[str, list[str]] = {}
+        self._substring_index: dict[str, dict[str, int]] = {}
+
+        for name, terms in self.categories.items():
+            for index, term in enumerate(terms):
+                word, mode = parse_term(term)
+                if mode == SUBSTRING:
+                    substrings.setdefault(name, []).append(word)
+                    self._substring_index.setdefault(name, {}).setdefault(normalise_text(word).strip(), index)
+                    continue
+
+                for tokens in term_token_variants(word):
+                    if mode == PREFIX and len(tokens) == 1:
+                        self._prefixes.setdefault(tokens[0], []).append((name, index))
+                    else:
+                        self._index.setdefault(tokens[0], []).append((tokens, mode == PREFIX, name, index))
+
+        self._substrings = KeywordMatcher(substrings) if substrings else None
+        self._longest_prefix = max(map(len, self._prefixes), default=0)
+
+        # The index never changes once built, so repeated texts reuse their scan
+        self.scan = lru_cache(maxsize=4096)(self._scan)
+
+    def __getstate__(self) -> dict:
+        return {name: value for name, value in self.__dict__.items() if name != "scan"}
+
+    def __setstate__(self, state: dict) -> None:
+        self.__dict__.update(state)
+        self.scan = lru_cache(maxsize=4096)(self._scan)
+
+    def _match(self, tokens: tuple[str, ...], hits: dict[str, set[int]]) -> None:
+        for i, token in enumerate(tokens):
+            for term_tokens, prefix, name, index in self._index.get(token, ()):
+                end = i + len(term_tokens)
+                if end > len(tokens) or tokens[i + 1:end - 1] != term_tokens[1:-1]:
+                    continue
+                last = tokens[end - 1]
+                if last == term_tokens[-1] or (prefix and last.startswith(term_tokens[-1])):
+                    hits.setdefault(name, set()).add(index)
+
+            for length in range(1, min(len(token), self._longest_prefix) + 1):
+                for name, index in self._prefixes.get(token[:length], ()):
+                    hits.setdefault(name, set()).add(index)
+
+    # Return every matched term grouped by category, in the order of the category's term list.
+    # Results are memoised and shared between callers - treat them as read-only
+    def _scan(self, text: str) -> dict[str, list[str]]:
+        hits: dict[str, set[int]] = {}
+        for tokens in tokenise(text):
+            self._match(tokens, hits)
+
+        if self._substrings is not None:
+            for name, words in self._substrings.scan(text).items():
+                for word in words:
+                    hits.setdefault(name, set()).add(self._substring_index[name][normalise_text(word).strip()])
+
+        return {
+            name: [self._words[name][i] for i in sorted(indices)]
+            for name, indices in hits.items()
+        }
+
+# Compiled matchers are cached as pickles in MATCHER_CACHE_DIR, named by a hash of the term lists and
+# of this file, so a restart - or a new worker - with the same lists and the same matcher code loads the
+# index instead of rebuilding it, and any change to the matcher leaves older artifacts unused. The cache
+# directory must only be writable by the service itself: artifacts are unpickled as trusted code
+with open(__file__, "rb") as source:
+    MATCHER_SOURCE_DIGEST = hashlib.sha256(source.read()).hexdigest()
+
+# Artifacts kept in the cache - every edit to a term list writes a new one, so older ones are pruned
+MATCHER_CACHE_MAX_ARTIFACTS = 16
+
+def matcher_artifact_path(categories: dict[str, list[str]], cache_dir: str) -> str:
+    canonical = json.dumps({name: list(terms) for name, terms in categories.items()}, sort_keys=True)
+    digest = hashlib.sha256(f"{MATCHER_SOURCE_DIGEST}:{canonical}".encode()).hexdigest()[:24]
+    return os.path.join(cache_dir, f"matcher-{digest}.pickle")
+
+# Drop all but the most recently written artifacts
+def prune_artifacts(cache_dir: str, keep: int = MATCHER_CACHE_MAX_ARTIFACTS) -> None:
+    artifacts = sorted(
+        (entry for entry in os.scandir(cache_dir) if entry.name.startswith("matcher-")),
+        key=lambda entry: entry.stat().st_mtime_ns,
+        reverse=True
+    )
+    for entry in artifacts[keep:]:
+        try:
+            os.unlink(entry.path)
+        except FileNotFoundError:
+            pass
+
+# A TokenMatcher for these lists - from the artifact cache when it has one, otherwise built and stored.
+# A missing, unreadable or unwritable cache only costs the build
+def compile_matcher(categories: dict[str, list[str]], cache_dir: str | None = MATCHER_CACHE_DIR) -> TokenMatcher:
+    if not cache_dir:
+        return TokenMatcher(categories)
+
+    path = matcher_artifact_path(categories, cache_dir)
+    try:
+        with open(path, "rb") as artifact:
+            return pickle.load(artifact)
+    except FileNotFoundError:
+        pass
+    except Exception:
+        logger.warning("Ignoring unreadable matcher artifact %s", path, exc_info=True)
+
+    matcher = TokenMatcher(categories)
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        # Written to a temporary file and renamed into place, so readers never see half an artifact
+        fd, tmp = tempfile.mkstemp(dir=cache_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as artifact:
+                pickle.dump(matcher, artifact, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp, path)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+        prune_artifacts(cache_dir)
+    except OSError:
+        logger.warning("Could not write matcher artifact to %s", cache_dir, exc_info=True)
+    return matcher
+
+# Compiled (or loaded) once at import time and shared by checks.py and services.py
+KEYWORD_MATCHER = compile_matcher({
+    PROHIBITED: PROHIBITED_THEMES_KEYWORDS,
+    AGE_PROHIBITED: AGE_PROHIBITED_THEMES_KEYWORDS,
+    RESTRICTED: RESTRICTED_THEMES_KEYWORDS,
+    RESTRICTED_COUNTRY: RESTRICTED_COUNTRY_KEYWORDS,
+    CHILD_AUDIENCE: CHILD_AUDIENCE_KEYWORDS,
+    CHILD_PLACEMENT: CHILD_PLACEMENT_KEYWORDS,
+})
+
+# Precompile the built-in matcher into MATCHER_CACHE_DIR, e.g. while building the container image:
+#   python -m src.matcher
+if __name__ == "__main__":
+    if not MATCHER_CACHE_DIR:
+        raise SystemExit("MATCHER_CACHE_DIR is not set")
+    print(matcher_artifact_path(KEYWORD_MATCHER.categories, MATCHER_CACHE_DIR))
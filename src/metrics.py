@@ -0,0 +1,169 @@
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Callable
+
+# Minimal in-process metrics, rendered in the Prometheus text exposition format on /metrics.
+# Recording is a dict lookup plus a bisect, cheap enough to leave on in production.
+# Each uvicorn worker keeps its own values - scrape every worker, or sum across them.
+
+# Latency buckets in seconds, from sub-millisecond keyword scans to multi-second decodes
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+def _format_labels(names: tuple[str, ...], values: tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{value}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(value)
+
+class Counter:
+    type = "counter"
+
+    def __init__(self, name: str, help: str, labels: tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self._values: dict[tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = tuple(str(labels.get(name, "")) for name in self.labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(tuple(str(labels.get(name, "")) for name in self.labels), 0)
+
+    def render(self) -> list[str]:
+        return [
+            f"{self.name}{_format_labels(self.labels, key)} {_format_value(value)}"
+            for key, value in sorted(self._values.items())
+        ]
+
+    def reset(self) -> None:
+        with self._lock:
+            self._values.clear()
+
+class Histogram:
+    type = "histogram"
+
+    def __init__(self, name: str, help: str, labels: tuple[str, ...] = (), buckets: tuple[float, ...] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = buckets
+        # Per label set: [per-bucket counts (+Inf last), sum, count]
+        self._values: dict[tuple[str, ...], list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels) -> None:
+        key = tuple(str(labels.get(name, "")) for name in self.labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._values.get(key)
+            if series is None:
+                series = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    # Time the enclosed block and record it in seconds
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def count(self, **labels) -> int:
+        series = self._values.get(tuple(str(labels.get(name, "")) for name in self.labels))
+        return series[2] if series else 0
+
+    def render(self) -> list[str]:
+        lines = []
+        for key, (counts, total, count) in sorted(self._values.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = 'le="+Inf"' if bound == float("inf") else f'le="{bound!r}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labels, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labels, key)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.labels, key)} {count}")
+        return lines
+
+    def reset(self) -> None:
+        with self._lock:
+            self._values.clear()
+
+# Value read at scrape time from somewhere else (e.g. the result cache's own counters)
+class CallbackMetric:
+    def __init__(self, name: str, help: str, type: str, read: Callable[[], float]):
+        self.name = name
+        self.help = help
+        self.type = type
+        self.read = read
+
+    def render(self) -> list[str]:
+        return [f"{self.name} {_format_value(self.read())}"]
+
+    def reset(self) -> None:
+        pass
+
+class Registry:
+    def __init__(self):
+        self.metrics: list = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self.metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+    def reset(self) -> None:
+        for metric in self.metrics:
+            metric.reset()
+
+REGISTRY = Registry()
+
+# Pipeline stages: admission_wait (queued for admission, see admission.py), upload_read, cache_lookup, header,
+# pixel_analysis (queue wait + decode + statistics), filename_check, metadata_check, phash_lookup,
+# ocr (queue wait + recognition), text_check
+STAGE_DURATION = REGISTRY.register(Histogram(
+    "creative_stage_duration_seconds", "Time spent in each approval pipeline stage", ("stage",)
+))
+REQUEST_DURATION = REGISTRY.register(Histogram(
+    "creative_approval_duration_seconds", "End-to-end evaluation time per creative", ("status", "format")
+))
+RESULTS = REGISTRY.register(Counter(
+    "creative_results_total", "Creatives evaluated, by outcome and image format", ("status", "format")
+))
+BYTES_PROCESSED = REGISTRY.register(Counter(
+    "creative_bytes_processed_total", "Bytes of creative uploads read"
+))
+PIXELS_DECODED = REGISTRY.register(Counter(
+    "creative_pixels_decoded_total", "Pixels decoded during image analysis"
+))
+NEAR_DUPLICATES = REGISTRY.register(Counter(
+    "creative_near_duplicates_total", "Creatives matched to a perceptually near-identical earlier creative", ("mode",)
+))
+OCR_RUNS = REGISTRY.register(Counter(
+    "creative_ocr_total", "Text recognition runs, by outcome (recognised, timed_out, cached)", ("outcome",)
+))
+DEADLINES_EXCEEDED = REGISTRY.register(Counter(
+    "creative_deadlines_exceeded_total", "Evaluations cut short by EVALUATION_DEADLINE_SECONDS"
+))
+ADMISSION_REJECTED = REGISTRY.register(Counter(
+    "creative_admission_rejected_total", "Upload requests turned away before being read, by reason (rate_limited, busy)",
+    ("reason",)
+))
@@ -1,5 +1,19 @@
 from pydantic import BaseModel, ConfigDict
-from typing import Optional
+from typing import Literal, Optional
+from .reasons import Reason
+from .rules import (
+    MIN_CONTRAST,
+    MIN_WIDTH,
+    MIN_HEIGHT,
+    MAX_WIDTH,
+    MAX_HEIGHT,
+    MAX_ASPECT_RATIO,
+    MIN_ASPECT_RATIO,
+    MAX_GIF_FRAMES,
+    MAX_GIF_FPS,
+    MAX_GIF_FLASHES_PER_SECOND,
+    MIN_LUMINANCE_RATIO
+)
 
 class Metadata(BaseModel):
     model_config = ConfigDict(extra='forbid') # Forbid unknown fields in metadata payloads
@@ -8,10 +22,118 @@ class Metadata(BaseModel):
     audience: Optional[str] = None
     category: Optional[str] = None
 
+# Thresholds for the file checks - defaults from rules.py, overridable per market in a rule set file
+class Thresholds(BaseModel):
+    model_config = ConfigDict(extra='forbid', frozen=True)
+    min_contrast: float = MIN_CONTRAST
+    min_width: int = MIN_WIDTH
+    min_height: int = MIN_HEIGHT
+    max_width: int = MAX_WIDTH
+    max_height: int = MAX_HEIGHT
+    max_aspect_ratio: float = MAX_ASPECT_RATIO
+    min_aspect_ratio: float = MIN_ASPECT_RATIO
+    max_gif_frames: int = MAX_GIF_FRAMES
+    max_gif_fps: float = MAX_GIF_FPS
+    max_gif_flashes_per_second: int = MAX_GIF_FLASHES_PER_SECOND
+    min_luminance_ratio: float = MIN_LUMINANCE_RATIO
+
+# What the pixel checks found for an earlier, perceptually near-identical creative (see phash.py) - its
+# filename, metadata and text checks aren't included. distance is the number of differing hash bits, 0-PHASH_MAX_DISTANCE
+class NearDuplicate(BaseModel):
+    distance: int
+    status: str
+    reasons: list[Reason]
+
+# How long one stage of an evaluation took: a rule, or a load the rules need (header, pixel_analysis, ocr, ...)
+class StageTiming(BaseModel):
+    stage: str
+    ms: float
+
+# reasons are serialised as their messages (or {code, args, message} with the reason_codes context, see reasons.py);
+# stages lists what ran for this response, in order; partial is set when the evaluation deadline cut it short
 class CreativeApprovalResponse(BaseModel):
     status: str
-    reasons: list[str]
+    reasons: list[Reason]
     img_format: str
     img_width: int
     img_height: int
     img_size_mb: float
+    near_duplicate: Optional[NearDuplicate] = None
+    stages: list[StageTiming] = []
+    partial: bool = False
+
+# Result of decoding an image's pixels in a worker - the statistics the file checks need, without the pixels.
+# Luminance is WCAG relative luminance (0-1); luminance_ratio is the WCAG contrast ratio between the image's
+# darkest and lightest tones, and the flash fields describe GIF frame-to-frame changes (see analyser.py) -
+# left at 0 when a GIF's frame timing alone rules out flashing too often, and its frames aren't decoded.
+# phash is the first frame's perceptual hash, for near-duplicate lookups (see phash.py)
+class ImageAnalysis(BaseModel):
+    contrast: float
+    pixels_decoded: int = 0
+    mean_luminance: float = 0
+    luminance_ratio: float = 1
+    frame_count: int = 1
+    fps: float = 0
+    frames_truncated: bool = False
+    flashes_per_second: int = 0
+    max_luminance_delta: float = 0
+    phash: Optional[int] = None
+
+# Text recognised in a creative (see ocr.py): regions is how many text-like regions were read, and
+# timed_out is set when OCR_TIMEOUT_SECONDS ran out before all of them were
+class TextRecognition(BaseModel):
+    text: str
+    regions: int = 0
+    timed_out: bool = False
+
+# Frame timing of a GIF, read from its block structure without decoding any frames.
+# Delays are in ms; peak_frames_per_second is the most frames shown in any one-second window
+class GifInfo(BaseModel):
+    frame_count: int
+    delays: list[int]
+    fps: float
+    min_delay: int
+    peak_frames_per_second: int
+    truncated: bool = False
+
+class BatchItemError(BaseModel):
+    status_code: int
+    detail: str | dict
+
+# One creative's outcome in a batch - either a result or the error that item alone failed with
+class BatchItemResult(BaseModel):
+    index: int
+    filename: Optional[str] = None
+    result: Optional[CreativeApprovalResponse] = None
+    error: Optional[BatchItemError] = None
+
+# Per-job timing in ms: waiting in the queue, evaluating, and from submission to result
+class JobTimings(BaseModel):
+    queued_ms: Optional[float] = None
+    run_ms: Optional[float] = None
+    total_ms: Optional[float] = None
+
+# State of an asynchronous job - result once done, error once failed. Times are Unix timestamps
+class JobStatus(BaseModel):
+    job_id: str
+    status: Literal["queued", "running", "done", "failed"]
+    filename: Optional[str] = None
+    result: Optional[CreativeApprovalResponse] = None
+    error: Optional[BatchItemError] = None
+    submitted_at: float
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    timings: JobTimings = JobTimings()
+
+# One creative's outcome in a bulk audit (python -m src.audit), keyed by its path under the audited directory
+# or as listed in the manifest. With --diff, previous_status/previous_reasons are what the earlier run decided
+# (previous_status is None for a creative it didn't have) and changed says whether the decision differs
+class AuditRecord(BaseModel):
+    path: str
+    sha256: Optional[str] = None
+    rules_version: Optional[str] = None
+    result: Optional[CreativeApprovalResponse] = None
+    error: Optional[BatchItemError] = None
+    previous_status: Optional[str] = None
+    previous_reasons: Optional[list[str]] = None
+    changed: Optional[bool] = None
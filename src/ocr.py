@@ -0,0 +1,149 @@
+import time
+from typing import Callable
+from PIL import Image, ImageFilter
+from .cache import MemoryCache
+from .config import (
+    CACHE_TTL_SECONDS,
+    OCR_ENGINE,
+    OCR_LANGUAGES,
+    OCR_MAX_SIDE,
+    OCR_MAX_REGIONS,
+    OCR_TIMEOUT_SECONDS,
+    OCR_CACHE_MAX_ENTRIES
+)
+from .models import TextRecognition
+from .services import decode_image
+from .upload import Contents, as_upload
+
+# Text-in-image recognition, so words baked into a creative's pixels go through the same keyword matching
+# as its metadata (check_text in checks.py). Runs in the executor's worker pool, on the first frame:
+# downscaled to OCR_MAX_SIDE px, then cut into the text-like regions - horizontal bands dense in edges,
+# which is what lines of text look like - so the engine never reads the flat or photographic rest of the
+# image. Regions are read largest first until OCR_TIMEOUT_SECONDS run out.
+#
+# Engines are local only. Tesseract is installed separately (pytesseract plus the tesseract binary),
+# so the app only imports it once OCR is switched on.
+
+# A pixel is on an edge when FIND_EDGES gives it at least this value (0-255)
+EDGE_THRESHOLD = 48
+# A row belongs to a text band when at least this share of its pixels are on an edge
+ROW_EDGE_DENSITY = 0.02
+# Text rows this close together are one band (the gaps between lines and inside letters)
+BAND_GAP = 4
+MIN_BAND_HEIGHT = 6
+REGION_MARGIN = 4
+
+# Tesseract on one region. Raises TimeoutError when it runs past timeout seconds
+def tesseract_text(image: Image.Image, languages: str, timeout: float) -> str:
+    try:
+        import pytesseract
+    except ImportError:
+        raise RuntimeError("pytesseract is required for OCR_ENGINE=tesseract; install it and the tesseract binary")
+
+    try:
+        return pytesseract.image_to_string(image, lang=languages, config="--psm 6", timeout=timeout)
+    except RuntimeError as e:
+        if "timeout" in str(e).lower():
+            raise TimeoutError(str(e))
+        raise
+
+# OCR engines by OCR_ENGINE name: (region image, languages, seconds left) → text
+OCR_ENGINES: dict[str, Callable[[Image.Image, str, float], str]] = {
+    "tesseract": tesseract_text,
+}
+
+# Fail at startup, not on the first creative, when OCR is switched on without a usable engine
+def check_ocr_engine(engine: str = OCR_ENGINE) -> None:
+    if engine == "off":
+        return
+    if engine not in OCR_ENGINES:
+        raise ValueError(f"Unknown OCR engine: {engine}")
+    if engine == "tesseract":
+        try:
+            import pytesseract
+            pytesseract.get_tesseract_version()
+        except ImportError:
+            raise RuntimeError("pytesseract is required for OCR_ENGINE=tesseract; install it and the tesseract binary")
+        except pytesseract.TesseractNotFoundError:
+            raise RuntimeError("The tesseract binary is required for OCR_ENGINE=tesseract but isn't on PATH")
+
+# Bounding boxes (left, top, right, bottom) of the largest text-like regions of a greyscale image, largest first
+def text_regions(img: Image.Image, max_regions: int = OCR_MAX_REGIONS) -> list[tuple[int, int, int, int]]:
+    import numpy as np
+
+    edges = np.asarray(img.filter(ImageFilter.FIND_EDGES)) >= EDGE_THRESHOLD
+    # The filter leaves the outermost pixels as they were - they're not edges
+    edges[[0, -1], :] = False
+    edges[:, [0, -1]] = False
+
+    bands, start, end = [], None, None
+    for row in np.flatnonzero(edges.mean(axis=1) >= ROW_EDGE_DENSITY):
+        if start is not None and row - end <= BAND_GAP:
+            end = row
+            continue
+        if start is not None:
+            bands.append((start, end))
+        start = end = row
+    if start is not None:
+        bands.append((start, end))
+
+    regions = []
+    for top, bottom in bands:
+        if bottom - top + 1 < MIN_BAND_HEIGHT:
+            continue
+        columns = np.flatnonzero(edges[top:bottom + 1].any(axis=0))
+        # Ascenders and descenders are too sparse to make a row count on their own - grow the band over them
+        span = edges[:, columns[0]:columns[-1] + 1].any(axis=1)
+        while top > 0 and span[top - 1]:
+            top -= 1
+        while bottom < len(span) - 1 and span[bottom + 1]:
+            bottom += 1
+        regions.append((
+            max(0, int(columns[0]) - REGION_MARGIN),
+            max(0, int(top) - REGION_MARGIN),
+            min(img.width, int(columns[-1]) + 1 + REGION_MARGIN),
+            min(img.height, int(bottom) + 1 + REGION_MARGIN)
+        ))
+
+    return sorted(regions, key=lambda box: (box[2] - box[0]) * (box[3] - box[1]), reverse=True)[:max_regions]
+
+# Recognise the text in a creative's first frame within `budget` seconds.
+# CPU-bound - runs in the executor's worker pool, like analyse_image
+def recognise_text(
+    contents: Contents,
+    engine: str = OCR_ENGINE,
+    languages: str = OCR_LANGUAGES,
+    budget: float = OCR_TIMEOUT_SECONDS
+) -> TextRecognition:
+    deadline = time.monotonic() + budget
+    recognise = OCR_ENGINES[engine]
+
+    img = decode_image(contents, draft_size=OCR_MAX_SIDE).convert("L")
+    scale = max(img.size) / OCR_MAX_SIDE
+    if scale > 1:
+        size = (max(1, round(img.width / scale)), max(1, round(img.height / scale)))
+        img = img.resize(size, Image.Resampling.LANCZOS, reducing_gap=2.0)
+
+    texts, regions, timed_out = [], 0, False
+    for box in text_regions(img):
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            timed_out = True
+            break
+        try:
+            texts.append((box[1], recognise(img.crop(box), languages, remaining).strip()))
+        except TimeoutError:
+            timed_out = True
+            break
+        regions += 1
+
+    # Reported in reading order, whatever order the regions were read in
+    text = "\n".join(text for _, text in sorted(texts) if text)
+    return TextRecognition(text=text, regions=regions, timed_out=timed_out)
+
+# Recognised text per image content, so a re-submitted creative (even with a new filename or metadata)
+# isn't read again. Results cut short by the time budget aren't cached
+OCR_CACHE = MemoryCache(OCR_CACHE_MAX_ENTRIES, CACHE_TTL_SECONDS)
+
+def text_cache_key(contents: Contents, engine: str = OCR_ENGINE, languages: str = OCR_LANGUAGES) -> str:
+    return f"{as_upload(contents).digest}:{engine}:{languages}:{OCR_MAX_SIDE}:{OCR_MAX_REGIONS}"
@@ -0,0 +1,294 @@
+import json
+import sqlite3
+import threading
+import time
+from itertools import combinations
+from PIL import Image
+from .config import PHASH_SQLITE_PATH, PHASH_MAX_DISTANCE
+from .constants import STATUS_APPROVED
+from .reasons import Reason
+
+# Perceptual hashing for near-duplicate creatives. Re-crops, re-encodes and small colour tweaks change
+# every byte (so the result cache misses them) but barely change a dHash: the image shrunk to a 9x8
+# greyscale thumbnail, one bit per pair of horizontally adjacent pixels - is the right one brighter?
+# Two creatives whose hashes differ in at most PHASH_MAX_DISTANCE of the 64 bits look the same.
+#
+# PerceptualIndex keeps every hash seen, with its pixel rule outcomes, in a local SQLite file, and looks
+# them up by Hamming distance with multi-index hashing: the 64 bits are split into len(CHUNK_WIDTHS)
+# chunks. Two hashes within distance r must agree to within r // len(CHUNK_WIDTHS) bits on at least one
+# chunk (pigeonhole), so a lookup probes each chunk's index with every value that close to the query's
+# chunk and only compares the few hashes found there - the cost barely grows with the index.
+#
+# In memory the index is NumPy arrays, about 30 bytes per creative: the hashes, and per chunk the chunk
+# values sorted, probed with searchsorted. Rows added since the last merge sit in a small buffer that's
+# compared by brute force, and are merged into the sorted arrays once it fills up. Merges - including the
+# first one, of every row in the file - build the new arrays on a background thread and swap them in when
+# they're ready; lookups meanwhile keep using the old arrays and the buffer. The engine calls lookup and
+# add through the executor's I/O threads, so none of this runs on the event loop.
+#
+# Only the pixel rules' outcomes are kept, and a match's status and reasons are worked out from them: two
+# creatives that look the same can still have different filenames, metadata or text, so the rest of an
+# earlier decision says nothing about this one (and shouldn't be shown to whoever uploads a look-alike).
+
+HASH_BITS = 64
+CHUNK_WIDTHS = (22, 21, 21)
+CHUNK_SHIFTS = (0, 22, 43)
+
+# Rows buffered before a merge: at least this many, or 1/32 of the index
+MIN_PENDING = 4096
+
+# dHash of an image (any mode, any size): 64 bits, row by row. Shrunk before the greyscale conversion,
+# so a large image is only read once, by the resize
+def dhash(img: Image.Image) -> int:
+    if img.mode not in ("L", "RGB", "RGBA"):
+        img = img.convert("RGB")
+    thumbnail = img.resize((9, 8), Image.Resampling.BOX, reducing_gap=2.0).convert("L")
+    pixels = thumbnail.tobytes()
+    value = 0
+    for row in range(8):
+        for col in range(8):
+            value = (value << 1) | (pixels[row * 9 + col + 1] > pixels[row * 9 + col])
+    return value
+
+def hamming(a: int, b: int) -> int:
+    return (a ^ b).bit_count()
+
+def chunk(value: int, index: int) -> int:
+    return (value >> CHUNK_SHIFTS[index]) & ((1 << CHUNK_WIDTHS[index]) - 1)
+
+# XOR masks flipping every combination of up to `radius` of a chunk's bits, starting with no flips
+def flip_masks(width: int, radius: int) -> list[int]:
+    masks = [0]
+    for flips in range(1, radius + 1):
+        for bits in combinations(range(width), flips):
+            masks.append(sum(1 << bit for bit in bits))
+    return masks
+
+# SQLite stores signed 64-bit integers
+def to_signed(value: int) -> int:
+    return value - (1 << 64) if value >= 1 << 63 else value
+
+def to_unsigned(value: int) -> int:
+    return value + (1 << 64) if value < 0 else value
+
+# Status and reasons of a set of rule outcomes, combined as the engine does: the last one that isn't
+# approved sets the status, and the reasons are listed in order
+def combine(outcomes: dict[str, tuple[str, list[Reason]]]) -> tuple[str, list[Reason]]:
+    status, reasons = STATUS_APPROVED, []
+    for outcome, found in outcomes.values():
+        if outcome != STATUS_APPROVED:
+            status = outcome
+            reasons.extend(found)
+    return status, reasons
+
+# A previously evaluated creative close to the one being looked up, with the outcome of its pixel rules
+class Match:
+    __slots__ = ("distance", "status", "reasons", "pixel_outcomes")
+
+    def __init__(self, distance: int, pixel_outcomes: dict[str, tuple[str, list[Reason]]]):
+        self.distance = distance
+        self.status, self.reasons = combine(pixel_outcomes)
+        self.pixel_outcomes = pixel_outcomes
+
+# Hashes and decisions of evaluated creatives, persisted in SQLite and indexed in memory.
+# The file is opened and loaded on first use (NumPy with it); rows added by other workers sharing
+# the file are picked up incrementally before each lookup
+class PerceptualIndex:
+    def __init__(self, path: str = PHASH_SQLITE_PATH, max_distance: int = PHASH_MAX_DISTANCE):
+        self.path = path
+        self.max_distance = max_distance
+        self._lock = threading.Lock()
+        self._conn: sqlite3.Connection | None = None
+        self._merging: threading.Thread | None = None
+        self._generation = 0
+        self._reset_memory()
+
+    def _reset_memory(self) -> None:
+        # A merge still running for the old contents is discarded when it finishes
+        self._generation += 1
+        self._last_rowid = 0
+        self._version_ids: dict[str, int] = {}
+        # Merged rows: hash, version id and rowid by position, and per chunk (sorted values, positions)
+        self._hashes = self._versions = self._rowids = None
+        self._chunks: list[tuple] = []
+        self._masks: list = []
+        # (hash, version id, rowid) of rows since the last merge
+        self._pending: list[tuple[int, int, int]] = []
+        self._pending_hashes = None
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS phashes ("
+                "hash INTEGER NOT NULL, version TEXT NOT NULL, status TEXT NOT NULL, reasons TEXT NOT NULL, "
+                "pixel_outcomes TEXT NOT NULL, created_at REAL NOT NULL)"
+            )
+        return self._conn
+
+    def _merged(self) -> int:
+        return 0 if self._hashes is None else len(self._hashes)
+
+    # Start folding the buffered rows into the sorted arrays, on a background thread
+    def _start_merge(self) -> None:
+        self._merging = threading.Thread(
+            target=self._merge,
+            args=(self._pending[:], self._hashes, self._versions, self._rowids, self._generation),
+            name="phash-merge",
+            daemon=True
+        )
+        self._merging.start()
+
+    # Build the merged arrays without the lock, then swap them in and drop the rows they cover from the buffer
+    def _merge(self, rows: list[tuple[int, int, int]], hashes, versions, rowids, generation: int) -> None:
+        import numpy as np
+
+        try:
+            new_hashes = np.array([row[0] for row in rows], np.uint64)
+            new_versions = np.array([row[1] for row in rows], np.uint16)
+            new_rowids = np.array([row[2] for row in rows], np.int64)
+            if hashes is not None:
+                new_hashes = np.concatenate([hashes, new_hashes])
+                new_versions = np.concatenate([versions, new_versions])
+                new_rowids = np.concatenate([rowids, new_rowids])
+
+            chunks = []
+            for width, shift in zip(CHUNK_WIDTHS, CHUNK_SHIFTS):
+                values = ((new_hashes >> np.uint64(shift)) & np.uint64((1 << width) - 1)).astype(np.uint32)
+                order = np.argsort(values, kind="stable").astype(np.uint32)
+                chunks.append((values[order], order))
+        except BaseException:
+            with self._lock:
+                self._merging = None
+            raise
+
+        with self._lock:
+            self._merging = None
+            if generation != self._generation:
+                return
+            self._chunks = chunks
+            self._hashes, self._versions, self._rowids = new_hashes, new_versions, new_rowids
+            del self._pending[:len(rows)]
+            self._pending_hashes = None
+
+    # Read the file and start the first merge in the background, so the first lookup doesn't wait for it
+    def preload(self) -> None:
+        def load():
+            with self._lock:
+                self._sync()
+        threading.Thread(target=load, name="phash-load", daemon=True).start()
+
+    # Wait for a merge in progress, if any (for tests and benchmarks)
+    def wait_for_merge(self, timeout: float | None = None) -> None:
+        merging = self._merging
+        if merging is not None:
+            merging.join(timeout)
+
+    # Load rows written since the last sync - everything, the first time
+    def _sync(self) -> None:
+        rows = self._connect().execute(
+            "SELECT rowid, hash, version FROM phashes WHERE rowid > ? ORDER BY rowid", (self._last_rowid,)
+        ).fetchall()
+        if rows:
+            version_ids = self._version_ids
+            self._pending.extend(
+                (to_unsigned(value), version_ids.setdefault(version, len(version_ids)), rowid) for rowid, value, version in rows
+            )
+            self._pending_hashes = None
+            self._last_rowid = rows[-1][0]
+        if self._merging is None and len(self._pending) > max(MIN_PENDING, self._merged() // 32):
+            self._start_merge()
+
+    # (distance, rowid) of the nearest indexed hash within max_distance under this rule set version
+    def _nearest(self, value: int, version: str) -> tuple[int, int] | None:
+        version_id = self._version_ids.get(version)
+        if version_id is None:
+            return None
+        import numpy as np
+
+        if not self._masks:
+            radius = self.max_distance // len(CHUNK_WIDTHS)
+            self._masks = [np.array(flip_masks(width, radius), np.uint32) for width in CHUNK_WIDTHS]
+
+        query = np.uint64(value)
+        best = None
+        if self._hashes is not None:
+            found = []
+            for index, (values, order) in enumerate(self._chunks):
+                probes = np.uint32(chunk(value, index)) ^ self._masks[index]
+                starts = np.searchsorted(values, probes, "left")
+                ends = np.searchsorted(values, probes, "right")
+                hit = ends > starts
+                found.extend(order[start:end] for start, end in zip(starts[hit], ends[hit]))
+            if found:
+                positions = np.unique(np.concatenate(found))
+                distances = np.bitwise_count(self._hashes[positions] ^ query)
+                matching = (distances <= self.max_distance) & (self._versions[positions] == version_id)
+                if matching.any():
+                    nearest = np.flatnonzero(matching)[np.argmin(distances[matching])]
+                    best = (int(distances[nearest]), int(self._rowids[positions[nearest]]))
+
+        if self._pending:
+            if self._pending_hashes is None:
+                self._pending_hashes = np.array([row[0] for row in self._pending], np.uint64)
+            distances = np.bitwise_count(self._pending_hashes ^ query)
+            for position in np.flatnonzero(distances <= self.max_distance):
+                _, pending_version, rowid = self._pending[position]
+                if pending_version == version_id and (best is None or distances[position] < best[0]):
+                    best = (int(distances[position]), rowid)
+        return best
+
+    # The nearest earlier creative within max_distance that was evaluated under the same rules, if any
+    def lookup(self, value: int, version: str) -> Match | None:
+        with self._lock:
+            self._sync()
+            nearest = self._nearest(value, version)
+            if nearest is None:
+                return None
+            distance, rowid = nearest
+            # The stored status and reasons columns are ignored - rows written before only pixel outcomes
+            # were kept hold the whole decision there
+            (pixel_outcomes,) = self._conn.execute("SELECT pixel_outcomes FROM phashes WHERE rowid = ?", (rowid,)).fetchone()
+
+        outcomes = {
+            name: (outcome[0], [Reason.parse(reason) for reason in outcome[1]])
+            for name, outcome in json.loads(pixel_outcomes).items()
+        }
+        return Match(distance, outcomes)
+
+    # Record a creative's pixel rule outcomes, with reasons as codes. Exact repeats (same hash and rules) are only stored once
+    def add(self, value: int, version: str, pixel_outcomes: dict[str, tuple[str, list[Reason]]]) -> None:
+        with self._lock:
+            self._sync()
+            nearest = self._nearest(value, version)
+            if nearest is not None and nearest[0] == 0:
+                return
+            status, reasons = combine(pixel_outcomes)
+            outcomes = {name: (outcome, [reason.dump() for reason in found]) for name, (outcome, found) in pixel_outcomes.items()}
+            self._connect().execute(
+                "INSERT INTO phashes VALUES (?, ?, ?, ?, ?, ?)",
+                (to_signed(value), version, status, json.dumps([reason.dump() for reason in reasons]), json.dumps(outcomes), time.time())
+            )
+            self._sync()
+
+    def __len__(self) -> int:
+        with self._lock:
+            self._sync()
+            return self._merged() + len(self._pending)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._connect().execute("DELETE FROM phashes")
+            self._reset_memory()
+
+    # Drop the connection and the in-memory index; the next use reopens self.path
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+            self._reset_memory()
+
+PHASH_INDEX = PerceptualIndex()
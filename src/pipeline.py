@@ -0,0 +1,62 @@
+import time
+from pydantic import ValidationError
+from fastapi import HTTPException
+from .models import CreativeApprovalResponse, Metadata, StageTiming
+from .cache import RESULT_CACHE, cache_key
+from .engine import RULE_ENGINE
+from .upload import Contents
+from .metrics import (
+    STAGE_DURATION,
+    REQUEST_DURATION,
+    RESULTS,
+    BYTES_PROCESSED
+)
+
+# If there is metadata, load it into the Metadata Pydantic model.
+# If there are forbidden keys, throw a 422 error.
+def parse_metadata(metadata: str | dict | None) -> Metadata:
+    try:
+        if isinstance(metadata, dict):
+            return Metadata.model_validate(metadata)
+        return Metadata.model_validate_json(metadata) if metadata else Metadata()
+    except (ValidationError, ValueError) as e:
+        detail = {
+            "message": "Invalid metadata. Valid keys include; market, placement, audience & category.",
+            "errors": e.errors() if isinstance(e, ValidationError) else str(e),
+        }
+        raise HTTPException(status_code=422, detail=detail)
+
+# Record the outcome and end-to-end time of one evaluation, by status and image format
+def record_result(result: CreativeApprovalResponse, start: float) -> None:
+    REQUEST_DURATION.observe(time.perf_counter() - start, status=result.status, format=result.img_format)
+    RESULTS.inc(status=result.status, format=result.img_format)
+
+# Evaluate one creative's bytes, filename and metadata against its market's rules.
+# Shared by the single, raw and batch endpoints. Raises ImageRejected (→ 422) for unreadable or
+# unsupported images, and HTTPException 503 when the worker pool is saturated
+async def evaluate_creative(contents: Contents, filename: str | None, meta: Metadata) -> CreativeApprovalResponse:
+    start = time.perf_counter()
+    BYTES_PROCESSED.inc(len(contents))
+
+    # Rules for the creative's market; the cache key includes their version, so a rule change is never served stale
+    ruleset = RULE_ENGINE.ruleset_for(meta.market)
+
+    # Same bytes, filename and metadata already evaluated under the current rules → return the stored result,
+    # reporting the lookup as the only stage that ran
+    lookup_start = time.perf_counter()
+    key = cache_key(contents, filename, meta, ruleset.version)
+    cached = await RESULT_CACHE.get(key)
+    lookup = time.perf_counter() - lookup_start
+    STAGE_DURATION.observe(lookup, stage="cache_lookup")
+    if cached is not None:
+        cached = cached.model_copy(update={"stages": [StageTiming(stage="cache_lookup", ms=round(lookup * 1000, 3))]})
+        record_result(cached, start)
+        return cached
+
+    # Run the market's compiled rule plan: header, keyword and pixel checks. A result cut short by the
+    # deadline isn't cached, so the next submission gets a full evaluation
+    result = await ruleset.evaluate(contents, filename, meta)
+    if not result.partial:
+        await RESULT_CACHE.set(key, result)
+    record_result(result, start)
+    return result
@@ -0,0 +1,96 @@
+from pydantic_core import core_schema
+
+# Why a creative wasn't approved, as a code and the values it was found with - e.g.
+# Reason("restricted_term_filename", "lottery"). Checks record these instead of formatting messages,
+# and the message is only rendered when a response is serialised: as a plain string by default, or as
+# {code, args, message} with the reason_codes serialisation context (?reason_codes=true on the API,
+# and how the SQLite stores keep them, so codes survive a round trip).
+
+# Message templates by code, filled in with the reason's args in order
+REASON_MESSAGES = {
+    "resolution_too_low": "Image resolution too low: {}x{}px",
+    "resolution_too_high": "Image resolution too high: {}x{}px",
+    "aspect_ratio_out_of_bounds": "Aspect ratio out of bounds ({:.1f}-{:.1f}): {:.2f}",
+    "gif_too_complex": "GIF too complex: {} frames",
+    "gif_too_complex_truncated": "GIF too complex: over {} frames",
+    "gif_framerate_too_high": "GIF framerate too high: {:.1f} fps",
+    "gif_flashing": "GIF flashes too often: {} flashes in one second",
+    "contrast_too_low": "Image contrast too low (score {:.2f})",
+    "luminance_range_too_narrow": "Luminance range too narrow (ratio {:.2f}:1)",
+    "prohibited_term_filename": "Prohibited term in filename: {}",
+    "restricted_term_filename": "Restricted term in filename: {}",
+    "restricted_country_filename": "Restricted country name in filename: {}",
+    "child_audience": "Child-related audience found: {}",
+    "child_audience_category": "Child-related audience found: {}. Category not allowed.",
+    "child_placement": "Child-related placement found: {}",
+    "child_placement_category": "Child-related placement found: {}. Category not allowed.",
+    "prohibited_term_metadata": "Prohibited term found in metadata: {}",
+    "age_restricted_term_metadata": "Age restricted term found in metadata: {}",
+    "restricted_term_metadata": "Restricted term found in metadata: {}",
+    "restricted_country_metadata": "Restricted country found in metadata: {}",
+    "prohibited_term_text": "Prohibited term found in image text: {}",
+    "age_restricted_term_text": "Age restricted term found in image text: {}",
+    "restricted_term_text": "Restricted term found in image text: {}",
+    "deadline_exceeded": "Evaluation deadline of {:g}s exceeded; not checked: {}",
+    # A reason stored as its message only, before reasons had codes
+    "message": "{}",
+}
+
+class Reason:
+    __slots__ = ("code", "args")
+
+    def __init__(self, code: str, *args):
+        self.code = code
+        self.args = args
+
+    def __str__(self) -> str:
+        return REASON_MESSAGES[self.code].format(*self.args)
+
+    def __repr__(self) -> str:
+        return f"Reason({', '.join(map(repr, (self.code, *self.args)))})"
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, Reason) and (self.code, self.args) == (other.code, other.args)
+
+    def __hash__(self) -> int:
+        return hash((self.code, self.args))
+
+    # {code, args} for JSON - what parse reads back
+    def dump(self) -> dict:
+        return {"code": self.code, "args": list(self.args)}
+
+    # A reason from its JSON form, or from a message stored without a code
+    @classmethod
+    def parse(cls, value: "str | dict | Reason") -> "Reason":
+        if isinstance(value, Reason):
+            return value
+        if isinstance(value, str):
+            return cls("message", value)
+        if value["code"] not in REASON_MESSAGES:
+            raise ValueError(f"Unknown reason code: {value['code']}")
+        return cls(value["code"], *value.get("args", ()))
+
+    # The message, or with the reason_codes context the code and args as well
+    def serialise(self, info) -> str | dict:
+        if info.context and info.context.get("reason_codes"):
+            return {**self.dump(), "message": str(self)}
+        return str(self)
+
+    # Lets pydantic models hold reasons: validated from a message or {code, args}, serialised by serialise
+    @classmethod
+    def __get_pydantic_core_schema__(cls, source, handler) -> core_schema.CoreSchema:
+        coded = core_schema.typed_dict_schema({
+            "code": core_schema.typed_dict_field(core_schema.str_schema()),
+            "args": core_schema.typed_dict_field(core_schema.list_schema(), required=False),
+            "message": core_schema.typed_dict_field(core_schema.str_schema(), required=False),
+        })
+        from_json = core_schema.no_info_after_validator_function(
+            cls.parse, core_schema.union_schema([core_schema.str_schema(), coded])
+        )
+        return core_schema.json_or_python_schema(
+            json_schema=from_json,
+            python_schema=core_schema.union_schema([core_schema.is_instance_schema(cls), from_json]),
+            serialization=core_schema.plain_serializer_function_ser_schema(
+                cls.serialise, info_arg=True, return_schema=core_schema.union_schema([core_schema.str_schema(), coded])
+            )
+        )
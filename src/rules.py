@@ -4,4 +4,8 @@ MIN_WIDTH, MIN_HEIGHT = 300, 250
 MAX_WIDTH, MAX_HEIGHT = 10000, 10000
 MAX_ASPECT_RATIO = 2
 MIN_ASPECT_RATIO = 0.5
-MAX_FILE_BYTES = 10 * 1024 * 1024
\ No newline at end of file
+MAX_FILE_BYTES = 10 * 1024 * 1024
+MAX_GIF_FRAMES = 100
+MAX_GIF_FPS = 10
+MAX_GIF_FLASHES_PER_SECOND = 3
+MIN_LUMINANCE_RATIO = 1
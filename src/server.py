@@ -0,0 +1,238 @@
+import gc
+import logging
+import os
+import random
+import signal
+import socket
+import time
+import uvicorn
+from .config import (
+    SERVER_HOST,
+    SERVER_PORT,
+    SERVER_WORKERS,
+    SERVER_MAX_REQUESTS,
+    SERVER_MAX_REQUESTS_JITTER,
+    SERVER_GRACEFUL_TIMEOUT_SECONDS,
+    JOBS_DRAIN_SECONDS
+)
+
+logger = logging.getLogger("src.server")
+
+# Production entry point: python -m src.server
+#
+# A pre-fork supervisor around uvicorn. The parent imports the app - rule sets, terms index and keyword
+# matchers all compiled - binds the listening socket, then forks SERVER_WORKERS workers that share both:
+# the compiled tables are inherited copy-on-write instead of being rebuilt per worker, and the kernel
+# spreads connections over the workers. The parent never serves requests; it only replaces workers that
+# exit (after SERVER_MAX_REQUESTS, or a crash) and, on SIGTERM/SIGINT, tells every worker to drain.
+#
+# Each worker runs uvicorn's own graceful shutdown: stop accepting, let in-flight requests finish for up to
+# SERVER_GRACEFUL_TIMEOUT_SECONDS, then run the app's shutdown (job drain, worker pools). Workers still
+# running after that - plus the job drain - are killed.
+#
+# A worker recycled after SERVER_MAX_REQUESTS can't just shut down the way uvicorn's own request limit does:
+# it may already have accepted connections from the shared socket whose requests it hasn't read yet, and
+# closing them would drop those requests. Instead it answers its last requests with "Connection: close",
+# stops accepting, serves every connection it already holds until the client closes it, and only then exits.
+#
+# Metrics live in each worker's memory: /metrics reports whichever worker answered the scrape, and a
+# recycled worker's counters start again from zero in its replacement.
+
+POLL_SECONDS = 0.1
+
+# Import the app and build everything the workers will share, before the first fork
+def preload():
+    from PIL import Image
+    from . import analyser
+    from .jobs import JOB_QUEUE, JobStore
+    from .main import app
+
+    # The app itself defers NumPy (the analyser) and PIL's format plugins to first use, for a fast cold
+    # start; here they're loaded up front instead, so every worker shares them
+    Image.preinit()
+
+    # Jobs left running by the last server are re-queued once, here - a worker doing it on start
+    # would re-queue the jobs its siblings are running
+    store = JobStore()
+    store.requeue_running()
+    store.close()
+    JOB_QUEUE.requeue_running = False
+
+    # Move everything allocated so far out of the collector's reach, so collections in the workers don't
+    # write to (and copy) the shared pages
+    gc.collect()
+    gc.freeze()
+    return app
+
+# Per-worker setup after fork: nothing that holds a file descriptor or a thread is carried across
+def init_worker(workers: int) -> None:
+    from . import admission
+    from .cache import RESULT_CACHE, SQLiteCache
+    from .executor import ENGINE
+
+    if isinstance(RESULT_CACHE.backend, SQLiteCache):
+        backend = RESULT_CACHE.backend
+        RESULT_CACHE.backend = SQLiteCache(backend.path, backend.max_entries, backend.ttl, backend.busy_timeout)
+    if isinstance(admission.RATE_LIMITER, admission.SQLiteRateLimiter):
+        limiter = admission.RATE_LIMITER
+        admission.RATE_LIMITER = admission.SQLiteRateLimiter(
+            limiter.path, limiter.rate, limiter.burst, limiter.busy_timeout, limiter.prune_interval
+        )
+
+    # The CPU cores are shared between the server workers, so each gets its share of the analysis pool
+    ENGINE.process_workers = max(1, ENGINE.process_workers // workers)
+
+# ASGI middleware counting a worker's HTTP requests. Once max_requests have started, every response
+# asks the client to close the connection, so none stays open to a worker that's about to exit
+class RequestLimit:
+    def __init__(self, app, max_requests: int):
+        self.app = app
+        self.max_requests = max_requests
+        self.started = 0
+
+    @property
+    def reached(self) -> bool:
+        return bool(self.max_requests) and self.started >= self.max_requests
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        self.started += 1
+        if not self.reached:
+            await self.app(scope, receive, send)
+            return
+
+        async def send_closing(message):
+            if message["type"] == "http.response.start":
+                message = {**message, "headers": [*message.get("headers", []), (b"connection", b"close")]}
+            await send(message)
+
+        await self.app(scope, receive, send_closing)
+
+# uvicorn server that recycles at its RequestLimit: stop accepting, then exit once every connection it
+# accepted has closed - or SERVER_GRACEFUL_TIMEOUT_SECONDS on, when shutdown closes what's left
+class RecyclingServer(uvicorn.Server):
+    def __init__(self, config: uvicorn.Config, limit: RequestLimit, graceful_timeout: float):
+        super().__init__(config)
+        self.limit = limit
+        self.graceful_timeout = graceful_timeout
+        self.recycle_deadline: float | None = None
+
+    async def on_tick(self, counter: int) -> bool:
+        if await super().on_tick(counter):
+            return True
+        if not self.limit.reached:
+            return False
+
+        if self.recycle_deadline is None:
+            logger.info("Request limit of %d reached, recycling worker %d", self.limit.max_requests, os.getpid())
+            self.recycle_deadline = time.monotonic() + self.graceful_timeout
+            for server in self.servers:
+                server.close()
+        return not self.server_state.connections or time.monotonic() > self.recycle_deadline
+
+def bind_socket(host: str, port: int) -> socket.socket:
+    sock = socket.socket(socket.AF_INET6 if ":" in host else socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+class Supervisor:
+    def __init__(
+        self,
+        app,
+        host: str = SERVER_HOST,
+        port: int = SERVER_PORT,
+        workers: int = SERVER_WORKERS,
+        max_requests: int = SERVER_MAX_REQUESTS,
+        max_requests_jitter: int = SERVER_MAX_REQUESTS_JITTER,
+        graceful_timeout: int = SERVER_GRACEFUL_TIMEOUT_SECONDS,
+        drain_timeout: float = JOBS_DRAIN_SECONDS
+    ):
+        self.app = app
+        self.host = host
+        self.port = port
+        self.workers = max(1, workers)
+        self.max_requests = max_requests
+        self.max_requests_jitter = max_requests_jitter
+        self.graceful_timeout = graceful_timeout
+        self.kill_timeout = graceful_timeout + drain_timeout + 5
+        self.children: dict[int, int] = {}
+        self.stopping = False
+        self.sock: socket.socket | None = None
+
+    def spawn(self, index: int) -> None:
+        pid = os.fork()
+        if pid:
+            self.children[pid] = index
+            return
+
+        # Worker: default signal handling (uvicorn installs its own), then serve until told to stop
+        code = 0
+        try:
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            signal.signal(signal.SIGINT, signal.SIG_DFL)
+            init_worker(self.workers)
+            jitter = random.randint(0, self.max_requests_jitter) if self.max_requests else 0
+            limit = RequestLimit(self.app, self.max_requests + jitter if self.max_requests else 0)
+            config = uvicorn.Config(limit, timeout_graceful_shutdown=self.graceful_timeout, lifespan="on")
+            RecyclingServer(config, limit, self.graceful_timeout).run(sockets=[self.sock])
+        except BaseException:
+            logger.exception("Worker %d failed", os.getpid())
+            code = 1
+        finally:
+            os._exit(code)
+
+    def stop(self, signum, frame) -> None:
+        if self.stopping:
+            return
+        self.stopping = True
+        logger.info("Draining %d workers", len(self.children))
+        for pid in self.children:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    # Reap exited workers; replace them while serving, kill stragglers once the drain times out
+    def supervise(self) -> None:
+        deadline = None
+        while self.children:
+            pid, status = os.waitpid(-1, os.WNOHANG)
+            if pid == 0:
+                if self.stopping:
+                    deadline = deadline or time.monotonic() + self.kill_timeout
+                    if time.monotonic() > deadline:
+                        for child in self.children:
+                            os.kill(child, signal.SIGKILL)
+                time.sleep(POLL_SECONDS)
+                continue
+
+            index = self.children.pop(pid, None)
+            if index is None or self.stopping:
+                continue
+            logger.info("Worker %d exited (status %d), starting a replacement", pid, os.waitstatus_to_exitcode(status))
+            self.spawn(index)
+
+    def run(self) -> None:
+        self.sock = bind_socket(self.host, self.port)
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+        logger.info("Serving on %s:%d with %d workers", self.host, self.port, self.workers)
+
+        for index in range(self.workers):
+            self.spawn(index)
+        try:
+            self.supervise()
+        finally:
+            self.sock.close()
+
+def main() -> None:
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s:     %(message)s")
+    Supervisor(preload()).run()
+
+if __name__ == "__main__":
+    main()
@@ -1,68 +1,297 @@
+import hashlib
 import io
-from PIL import Image, ImageStat, ImageSequence
-from fastapi import HTTPException, UploadFile
-from .terms import CHILD_AUDIENCE_KEYWORDS, CHILD_PLACEMENT_KEYWORDS
-
-# Open file - return the Image object, as well as the size in bytes for consumption in main.py
-async def open_file(file: UploadFile) -> tuple[Image.Image, int]:
-    contents = await file.read()
-    
+import mmap
+import os
+from PIL import Image, UnidentifiedImageError
+from fastapi import HTTPException, Request, UploadFile
+from .matcher import TokenMatcher, KEYWORD_MATCHER, CHILD_AUDIENCE, CHILD_PLACEMENT
+from .models import ImageAnalysis, GifInfo
+from .gif import inspect_gif, GifFormatError
+from .phash import dhash
+from .executor import ENGINE
+from .upload import Contents, UploadBuffer, as_upload
+from .rules import MAX_FILE_BYTES, MAX_WIDTH, MAX_HEIGHT, MIN_CONTRAST, MAX_GIF_FRAMES, MAX_GIF_FLASHES_PER_SECOND
+from .config import (
+    UPLOAD_CHUNK_BYTES,
+    CONTRAST_MODE,
+    CONTRAST_SAMPLE_SIZE,
+    CONTRAST_ESTIMATE_MARGIN,
+    GIF_FLASH_FRAME_LIMIT,
+    PHASH_MODE
+)
+
+# PIL's decompression bomb guard, set to the largest image the checks ever decode. It covers every image
+# the process opens - headers, GIF frames, OCR - and Image.open refuses anything over twice this outright.
+# Between the two the header is still read, so a merely oversized image gets a "resolution too high"
+# result from its dimensions, and decode_image refuses to decode it
+MAX_IMAGE_PIXELS = MAX_WIDTH * MAX_HEIGHT
+Image.MAX_IMAGE_PIXELS = MAX_IMAGE_PIXELS
+
+# The formats creatives may be in. Image.open only tries these plugins, so PIL never runs Image.init()
+# - importing every plugin it ships - on the request path
+IMAGE_FORMATS = ("PNG", "JPEG", "GIF")
+
+# Signatures of formats PIL could read but the checks don't accept, so they're reported as
+# unsupported rather than unreadable without loading their plugins
+UNSUPPORTED_SIGNATURES = (
+    (0, b"BM", "BMP"),
+    (0, b"II*\0", "TIFF"),
+    (0, b"MM\0*", "TIFF"),
+    (8, b"WEBP", "WEBP"),
+    (0, b"\0\0\1\0", "ICO"),
+    (0, b"8BPS", "PSD"),
+    (4, b"ftypheic", "HEIC"),
+    (4, b"ftypavif", "AVIF"),
+)
+
+# Raised when an upload can't be processed as a supported image → returned as a 422.
+# Image work runs in worker processes, and unlike HTTPException this pickles cleanly back to the event loop
+class ImageRejected(Exception):
+    def __init__(self, detail: str):
+        super().__init__(detail)
+        self.detail = detail
+
+# File descriptor of an upload that's backed by a real file, or None if it lives in memory.
+# A SpooledTemporaryFile that hasn't rolled over would be forced to disk by fileno(), so it's left alone
+def upload_fileno(file: UploadFile) -> int | None:
+    if getattr(file.file, "_rolled", True) is False:
+        return None
+    try:
+        return file.file.fileno()
+    except (AttributeError, OSError, io.UnsupportedOperation):
+        return None
+
+# Map an upload already spooled to disk, and hash it - one pass over the pages, no copies in memory
+def map_upload(fileno: int, size: int) -> UploadBuffer:
+    if size == 0:
+        return UploadBuffer(b"")
+    upload = UploadBuffer(mmap.mmap(fileno, size, access=mmap.ACCESS_READ))
+    upload.digest
+    return upload
+
+# Read the uploaded file for decoding in a worker, hashing it on the way.
+# By the time an endpoint gets a multipart upload, FastAPI has already parsed the whole body and spooled
+# the file to disk - the limit on what a client can send is enforced before that, while the body arrives
+# (BODY_LIMITS in src/admission.py). Here a spooled upload over max_bytes is refused from its size, and
+# one within it is memory-mapped rather than copied into memory. An upload not backed by a file (one built
+# in memory) is read in chunks, aborting with a 422 as soon as it crosses max_bytes
+async def read_file(file: UploadFile, max_bytes: int = MAX_FILE_BYTES) -> UploadBuffer:
+    limit_mb = round(max_bytes / (1024 * 1024))
+
+    # Multipart uploads usually declare their size up front → reject without reading anything
+    if file.size is not None and file.size > max_bytes:
+        size_mb = round(file.size / (1024 * 1024), 2)
+        raise HTTPException(status_code=422, detail=f"File too large: {size_mb} MB (limit {limit_mb} MB)")
+
+    fileno = upload_fileno(file)
+    if fileno is not None:
+        size = os.fstat(fileno).st_size
+        if size > max_bytes:
+            size_mb = round(size / (1024 * 1024), 2)
+            raise HTTPException(status_code=422, detail=f"File too large: {size_mb} MB (limit {limit_mb} MB)")
+        return await ENGINE.run_io(map_upload, fileno, size)
+
+    contents = bytearray()
+    digest = hashlib.sha256()
+    while chunk := await file.read(UPLOAD_CHUNK_BYTES):
+        contents += chunk
+        digest.update(chunk)
+        if len(contents) > max_bytes:
+            raise HTTPException(status_code=422, detail=f"File too large: over {limit_mb} MB limit")
+
+    return UploadBuffer(contents, digest.hexdigest())
+
+# Read a raw request body (POST /creative-approval/raw) as it arrives, hashing it on the way. There's no
+# multipart encoding to parse and nothing is spooled to disk; a declared Content-Length over max_bytes is
+# rejected before reading anything, and an undeclared or understated one as soon as the body crosses max_bytes
+async def read_body(request: Request, max_bytes: int = MAX_FILE_BYTES) -> UploadBuffer:
+    limit_mb = round(max_bytes / (1024 * 1024))
+
+    declared = request.headers.get("content-length", "")
+    if declared.isdigit() and int(declared) > max_bytes:
+        size_mb = round(int(declared) / (1024 * 1024), 2)
+        raise HTTPException(status_code=422, detail=f"File too large: {size_mb} MB (limit {limit_mb} MB)")
+
+    contents = bytearray()
+    digest = hashlib.sha256()
+    async for chunk in request.stream():
+        contents += chunk
+        digest.update(chunk)
+        if len(contents) > max_bytes:
+            raise HTTPException(status_code=422, detail=f"File too large: over {limit_mb} MB limit")
+
+    return UploadBuffer(contents, digest.hexdigest())
+
+def unsupported_format(format: str | None) -> ImageRejected:
+    return ImageRejected(f"Unsupported image format: {format}. Please upload a PNG, JPEG or GIF.")
+
+# Open the raw bytes as an Image object. PIL only parses the header here - pixels are decoded lazily
+def open_image(contents: Contents) -> Image.Image:
+    try:
+        return Image.open(as_upload(contents).open(), formats=IMAGE_FORMATS)
+    except Image.DecompressionBombError:
+        raise ImageRejected(f"Image too large to decode: over {2 * MAX_IMAGE_PIXELS} pixels")
+    except UnidentifiedImageError:
+        prefix = bytes(as_upload(contents)[:16])
+        for offset, signature, format in UNSUPPORTED_SIGNATURES:
+            if prefix[offset:offset + len(signature)] == signature:
+                raise unsupported_format(format)
+        raise ImageRejected("Invalid or unreadable image file")
+    except Exception:
+        raise ImageRejected("Invalid or unreadable image file")
+
+# Fully decode the image's pixels - never for images over the maximum dimensions.
+# With draft_size, JPEGs are decoded straight to greyscale at a reduced scale (no larger than needed
+# to cover draft_size); other formats ignore it
+def decode_image(contents: Contents, draft_size: int | None = None) -> Image.Image:
+    img = open_image(contents)
+    width, height = img.size
+    if width > MAX_WIDTH or height > MAX_HEIGHT or width * height > MAX_IMAGE_PIXELS:
+        raise ImageRejected(f"Image too large to decode: {width}x{height}px")
+
     try:
-        img = Image.open(io.BytesIO(contents))
-        img.load()  
+        if draft_size:
+            img.draft("L", (draft_size, draft_size))
+        img.load()
     except Exception:
-        raise HTTPException(status_code=422, detail="Invalid or unreadable image file")
-    
-    size_bytes = len(contents)
+        raise ImageRejected("Invalid or unreadable image file")
 
-    return img, size_bytes
+    return img
 
 # validate image format, width, height and size
-async def validate_image(img) -> tuple[str, int, int]:
+def validate_image(img) -> tuple[str, int, int]:
     format = img.format
     width, height = img.size
 
-    if format not in ["PNG", "JPEG", "GIF"]:
-        raise HTTPException(
-            status_code=422,
-            detail=f"Unsupported image format: {format}. Please upload a PNG, JPEG or GIF."
-        )
+    if format not in IMAGE_FORMATS:
+        raise unsupported_format(format)
 
     return format, width, height
 
-# Calculate contrast
+# Calculate contrast - the standard deviation of the greyscale levels
 def calculate_contrast(img: Image.Image) -> float:
-    grayscale = img.convert("L")
-    stat = ImageStat.Stat(grayscale)
-    return stat.stddev[0]
+    from .analyser import FrameAnalyser
+    return FrameAnalyser().contrast(img)
+
+# Nearest-neighbour thumbnail no larger than sample_size px on its longest side (the image itself if smaller)
+def sample_image(img: Image.Image, sample_size: int = CONTRAST_SAMPLE_SIZE) -> Image.Image:
+    width, height = img.size
+    scale = max(width, height) / sample_size
+    if scale > 1:
+        size = (max(1, round(width / scale)), max(1, round(height / scale)))
+        img = img.resize(size, Image.Resampling.NEAREST)
+    return img
+
+# Estimate contrast from a thumbnail no larger than sample_size px on its longest side.
+# Nearest-neighbour (strided) sampling keeps the pixel distribution, so the result is an unbiased
+# estimate of the exact score. JPEG draft decoding averages pixel blocks, which only removes detail, so it errs low.
+# On a synthetic corpus (flat blocks, gradients, noise, text, fractals; 300-4000px PNG and JPEG)
+# the estimate never exceeded the exact score by more than 0.4, while drafted JPEGs of pure noise
+# came out up to 30 lower - hence low estimates are always re-checked exactly (see analyse_image)
+def estimate_contrast(img: Image.Image, sample_size: int = CONTRAST_SAMPLE_SIZE) -> float:
+    return calculate_contrast(sample_image(img, sample_size))
+
+# Count frames and work out the average frame rate from the GIF's block structure - no frames are decoded.
+# The walk stops once there are more than max_frames: the GIF goes to review whatever the rest holds, so a
+# hostile GIF with 100k frames costs no more to inspect than one just over the limit
+def get_gif_info(contents: Contents, max_frames: int = MAX_GIF_FRAMES) -> GifInfo:
+    try:
+        return inspect_gif(contents, frame_limit=max_frames)
+    except GifFormatError:
+        raise ImageRejected("Invalid or unreadable image file")
+
+# Frame count and frame rate alone, from the block structure - for GIFs too large to decode, which still get
+# their GIF reasons. Nothing is decoded, so contrast and flashing aren't measured
+def gif_timing(contents: Contents, max_frames: int = MAX_GIF_FRAMES) -> ImageAnalysis:
+    gif = get_gif_info(contents, max_frames)
+    return ImageAnalysis(contrast=0, frame_count=gif.frame_count, fps=gif.fps, frames_truncated=gif.truncated)
+
+# Perceptual hash of the first frame, from a thumbnail (JPEGs decoded in draft mode) - the same hash
+# analyse_image reports, for looking up near-duplicates before analysing the pixels
+def perceptual_hash(contents: Contents) -> int:
+    return dhash(sample_image(decode_image(contents, draft_size=CONTRAST_SAMPLE_SIZE)))
 
-def get_gif_info(img: Image.Image) -> tuple[int, float]:
-    frame_count = 0
-    durations = []  # each frame's duration in ms
+# Stage one: sniff the format and dimensions from the header alone.
+# Cheap enough to run on the event loop, so unsupported and oversized images are rejected
+# without ever decoding their pixels (which also keeps decompression bombs away from the decoder)
+def read_image_header(contents: Contents) -> tuple[str, int, int]:
+    return validate_image(open_image(contents))
 
-    for frame in ImageSequence.Iterator(img):
-        frame_count += 1
-        durations.append(frame.info.get("duration", 0))
+# Stage two: decode the pixels and compute the image statistics the checks need.
+# CPU-bound - runs in the executor's worker pool, so it takes the upload (sent as bytes) and returns a small picklable result
+def analyse_image(
+    contents: Contents,
+    contrast_mode: str = CONTRAST_MODE,
+    min_contrast: float = MIN_CONTRAST,
+    max_flashes: int = MAX_GIF_FLASHES_PER_SECOND,
+    max_frames: int = MAX_GIF_FRAMES
+) -> ImageAnalysis:
+    # NumPy is only imported where pixels are analysed (the worker processes), not by the app at startup
+    from .analyser import FrameAnalyser, analyse_flashes, luminance_ratio
 
-    if durations:
-        avg_duration = sum(durations) / len(durations)  # ms
-        fps = 1000 / avg_duration if avg_duration > 0 else 0
-    else:
-        fps = 0
+    estimate = contrast_mode == "estimate"
+    img = decode_image(contents, draft_size=CONTRAST_SAMPLE_SIZE if estimate else None)
 
-    return frame_count, fps
+    gif = get_gif_info(contents, max_frames) if img.format == "GIF" else None
+
+    pixels_decoded = img.width * img.height
+    analyser = FrameAnalyser()
+
+    # Contrast and luminance in one pass over the pixels - of a thumbnail when estimating.
+    # The perceptual hash always comes from the thumbnail
+    sample = sample_image(img) if estimate or PHASH_MODE != "off" else img
+    contrast, mean_luminance, darkest, lightest = analyser.measure(sample if estimate else img)
+    phash = dhash(sample) if PHASH_MODE != "off" else None
+
+    # Only clear passes keep the estimate - anything near or under MIN_CONTRAST gets the exact score,
+    # so estimation can't change which creatives are flagged for low contrast
+    if estimate and contrast < min_contrast + CONTRAST_ESTIMATE_MARGIN:
+        if img.format == "JPEG":
+            img = decode_image(contents)
+            pixels_decoded += img.width * img.height
+        contrast = analyser.contrast(img)
+
+    analysis = ImageAnalysis(
+        contrast=contrast,
+        pixels_decoded=pixels_decoded,
+        mean_luminance=mean_luminance,
+        luminance_ratio=luminance_ratio(darkest, lightest),
+        phash=phash
+    )
+    if gif is None:
+        return analysis
+
+    analysis = analysis.model_copy(update={
+        "frame_count": gif.frame_count,
+        "fps": gif.fps,
+        "frames_truncated": gif.truncated
+    })
+
+    # Contrast and luminance are scored on the first frame; every frame is checked for flashing - unless the
+    # frame timing alone rules out more than max_flashes. A flash is a pair of changes at frame boundaries,
+    # so n flashes in a second take 2n - 1 frames starting in it, and the raw delays never start fewer frames
+    # per second than the clamped ones flashes are timed with
+    if (gif.peak_frames_per_second + 1) // 2 <= max_flashes:
+        return analysis
+
+    try:
+        flashes, max_delta, frame_pixels = analyse_flashes(contents, gif.delays, GIF_FLASH_FRAME_LIMIT)
+    except Exception:
+        raise ImageRejected("Invalid or unreadable image file")
+    return analysis.model_copy(update={
+        "pixels_decoded": pixels_decoded + frame_pixels,
+        "flashes_per_second": flashes,
+        "max_luminance_delta": max_delta
+    })
 
 # Use CHILD_AUDIENCE_KEYWORDS to confirm if audience is related to children, 'u18', 'kids', etc.
-def is_child_audience(audience: str | None) -> bool:
+def is_child_audience(audience: str | None, matcher: TokenMatcher = KEYWORD_MATCHER) -> bool:
     if not audience:
         return False
-    text = audience.lower()
-    return any(term in text for term in CHILD_AUDIENCE_KEYWORDS)
+    return CHILD_AUDIENCE in matcher.scan(audience)
 
 # Use CHILD_PLACEMENT_KEYWORDS to confirm if placement is related to children, 'school', 'nursery'
-def is_child_placement(placement: str | None) -> bool:
+def is_child_placement(placement: str | None, matcher: TokenMatcher = KEYWORD_MATCHER) -> bool:
     if not placement:
         return False
-    text = placement.lower()
-    return any(term in text for term in CHILD_PLACEMENT_KEYWORDS)
-
+    return CHILD_PLACEMENT in matcher.scan(placement)
@@ -1,142 +1,157 @@
+# Terms match whole words unless marked (see src/matcher.py):
+#   "term*" also matches words it starts ("weapon*" → "weapons"), "*term*" matches inside any word.
+#   Short stems that start everyday words are listed with their inflections instead ("gun*" would flag "Gundam")
 PROHIBITED_THEMES_KEYWORDS = [
-    "tobacco", 
-    "cigarette", 
+    "tobacco*", 
+    "cigarette*", 
     "cigar", 
+    "cigars", 
+    "cigarillo*", 
     "smoking",
     "gun", 
-    "weapon", 
-    "firearm", 
-    "rifle",
-    "prostitute", 
-    "escort", 
+    "guns", 
+    "gunfire", 
+    "gunman", 
+    "gunmen", 
+    "gunpoint", 
+    "gunshot*", 
+    "weapon*", 
+    "firearm*", 
+    "rifle*",
+    "prostitute*", 
+    "escort*", 
     "lapdancing",
-    "lap dance",
+    "lap dance*",
     "lap-dancing", 
     "gentlemen's club",
-    "sexual massage", 
+    "sexual massage*", 
     "sex",
-    "porn", 
+    "sexy",
+    "sexual*",
+    "porn*", 
     "nudity", 
-    "nude",
+    "nude*",
     "naked",
-    "erotic",
+    "erotic*",
     "violence", 
-    "violent",
-    "blood", 
+    "violent*",
+    "blood*", 
     "drugs", 
     "cocaine", 
     "heroin", 
     "meth",
     "weed",
     "cannabis",
-    "fuck", 
-    "shit", 
-    "bitch", 
-    "cunt", 
-    "asshole",  
-    "prescription", 
+    "fuck*", 
+    "shit*", 
+    "bitch*", 
+    "cunt*", 
+    "asshole*",  
+    "prescription*", 
     "pharmacy",
     "pharmacy only medicine",
-    "medicine",
+    "medicine*",
     "infant formula", 
     "baby formula",
-    "pyramid scheme", 
+    "pyramid scheme*", 
     "mlm", 
     "multi-level marketing",
-    "extremist", 
-    "terrorist",
+    "extremist*", 
+    "terrorist*",
     "hate", 
-    "racist", 
+    "racist*", 
     "nazi", 
+    "nazis", 
+    "nazism", 
     "white power",
-    "illegal", 
-    "counterfeit", 
+    "illegal*", 
+    "counterfeit*", 
     "pirated",
     "piracy"
 ]
 
 AGE_PROHIBITED_THEMES_KEYWORDS = [
-    "alcohol", 
-    "beer", 
-    "vodka", 
-    "whiskey", 
-    "wine",  
+    "alcohol*", 
+    "beer*", 
+    "vodka*", 
+    "whiskey*", 
+    "wine*",  
     "gambling", 
-    "casino", 
+    "casino*", 
     "betting", 
-    "poker", 
+    "poker*", 
     "slots",  
     "hfss", 
     "junk food", 
-    "soda", 
-    "energy drink",
+    "soda*", 
+    "energy drink*",
     "slimming", 
-    "diet pill", 
+    "diet pill*", 
     "weight loss"
 ]
 
 RESTRICTED_THEMES_KEYWORDS = [
-    "supplement", 
-    "protein", 
-    "vitamin", 
-    "cosmetic", 
+    "supplement*", 
+    "protein*", 
+    "vitamin*", 
+    "cosmetic*", 
     "surgery",
     "hair restoration", 
     "botox", 
     "skincare", 
     "cream",
     "slimming", 
-    "diet pill", 
+    "diet pill*", 
     "weight loss", 
-    "fat burner",
+    "fat burner*",
     "fast food", 
-    "burger", 
+    "burger*", 
     "fried chicken", 
-    "pizza", 
-    "soda",
-    "vape", 
-    "e-cig", 
-    "ecigarette",
+    "pizza*", 
+    "soda*",
+    "vape*", 
+    "e-cig*", 
+    "ecigarette*",
     "cbd", 
     "cannabidiol", 
     "hemp oil",
-    "crypto",
-    "bitcoin", 
+    "crypto*",
+    "bitcoin*", 
     "ethereum", 
     "token", 
-    "nft",
+    "nft*",
     "political", 
-    "vote", 
-    "election", 
-    "referendum",
-    "religion", 
-    "church", 
-    "mosque", 
-    "temple", 
-    "crucifix", 
+    "vote*", 
+    "election*", 
+    "referendum*",
+    "religion*", 
+    "church*", 
+    "mosque*", 
+    "temple*", 
+    "crucifix*", 
     "allah",
-    "swastika",
-    "explosion", 
+    "swastika*",
+    "explosion*", 
     "fire", 
     "broken glass", 
     "graffiti", 
     "underwear", 
     "swimwear",
-    "sexual position", 
-    "breast", 
+    "sexual position*", 
+    "breast*", 
     "bottom", 
-    "sex object",
+    "sex object*",
     "tfl", 
     "uber", 
-    "taxi", 
+    "taxi*", 
     "private hire",
-    "payday loan", 
+    "payday loan*", 
     "short term lending",
     "petroleum", 
     "oil company", 
-    "fossil fuel",
+    "fossil fuel*",
     "qrcode", 
-    "qr code",
+    "qr code*",
     "eco", 
     "carbon neutral", 
     "sustainable", 
@@ -147,13 +162,13 @@ RESTRICTED_COUNTRY_KEYWORDS = [
     "afghanistan", 
     "afghan",
     "armenia", 
-    "armenian",
+    "armenian*",
     "azerbaijan", 
     "azerbaijani", 
     "azeris",
     "brunei",
     "iran", 
-    "iranian", 
+    "iranian*", 
     "persia", 
     "persian",
     "karabakh", 
@@ -162,48 +177,48 @@ RESTRICTED_COUNTRY_KEYWORDS = [
     "mauritania", 
     "mauritanian",
     "nigeria", 
-    "nigerian", 
+    "nigerian*", 
     "naija",
     "pakistan", 
-    "pakistani",
+    "pakistani*",
     "qatar", 
-    "qatari", 
+    "qatari*", 
     "doha",
     "saudi", 
     "saudi arabia", 
     "ksa", 
     "kingdom of saudi arabia",
     "somalia", 
-    "somali",
+    "somali*",
     "sudan", 
     "sudanese",
     "uae", 
     "united arab emirates", 
     "dubai", 
     "abu dhabi", 
-    "emirati",
+    "emirati*",
     "yemen", 
-    "yemeni"
+    "yemeni*"
 ]
 
 CHILD_AUDIENCE_KEYWORDS = [
-    "child",
+    "child*",
     "children", 
     "kid", 
     "kids", 
     "toddler",
-    "teen", 
-    "teenager", 
+    "teen*", 
+    "teenager*", 
     "under 18", 
     "u18", 
-    "school",
+    "school*",
     "nursery", 
     "youth", 
     "young people"
 ]
 
 CHILD_PLACEMENT_KEYWORDS = [
-    "school", 
+    "school*", 
     "nursery", 
     "kindergarten", 
     "daycare",
@@ -212,7 +227,7 @@ CHILD_PLACEMENT_KEYWORDS = [
     "college", 
     "university", 
     "campus",
-    "playground", 
+    "playground*", 
     "play area", 
     "sports ground", 
     "youth club",
@@ -0,0 +1,160 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+from pathlib import Path
+from types import MappingProxyType
+from typing import Callable, Mapping
+from .config import TERMS_PATH, TERMS_RELOAD_SECONDS
+from .matcher import TokenMatcher, KEYWORD_MATCHER, compile_matcher
+
+logger = logging.getLogger(__name__)
+
+# Hot-reloadable keyword lists. The terms in terms.py are the built-in defaults; TERMS_PATH can
+# point at a file or a directory that replaces any of the lists without a redeploy:
+#   file      → JSON (or YAML) mapping of category → list of terms, e.g. {"restricted": ["lottery", ...]}
+#   directory → one file per category: <category>.txt (one term per line, "#" comments) or <category>.json
+# Categories the source doesn't mention keep their built-in list. Every load compiles a new
+# TermsIndex off the request path and swaps it in with a single assignment, so a request sees
+# either the old lists or the new ones, never a mix.
+
+TERM_FILE_SUFFIXES = (".txt", ".json", ".yaml", ".yml")
+
+# One compiled, read-only snapshot of the keyword lists: the lists themselves, the matcher built
+# over their normalised variants, and a version that changes whenever any list does
+class TermsIndex:
+    __slots__ = ("categories", "matcher", "version")
+
+    def __init__(self, categories: Mapping[str, list[str]], matcher: TokenMatcher | None = None):
+        frozen = {name: tuple(terms) for name, terms in categories.items()}
+        object.__setattr__(self, "categories", MappingProxyType(frozen))
+        object.__setattr__(self, "matcher", matcher or compile_matcher(frozen))
+        canonical = json.dumps(frozen, sort_keys=True)
+        object.__setattr__(self, "version", hashlib.sha256(canonical.encode()).hexdigest()[:16])
+
+    def __setattr__(self, name, value):
+        raise AttributeError("TermsIndex is immutable")
+
+# Built-in lists, compiled at import time alongside KEYWORD_MATCHER
+BUILTIN_INDEX = TermsIndex(KEYWORD_MATCHER.categories, KEYWORD_MATCHER)
+
+# Strip, lowercase and de-duplicate a list of terms, keeping its order
+def clean_terms(terms: list[str]) -> list[str]:
+    cleaned = []
+    for term in terms:
+        if not isinstance(term, str):
+            raise ValueError(f"Terms must be strings, got {term!r}")
+        term = term.strip().lower()
+        if term and term not in cleaned:
+            cleaned.append(term)
+    return cleaned
+
+def load_terms_file(path: Path) -> dict | list:
+    text = path.read_text()
+    if path.suffix in (".yaml", ".yml"):
+        try:
+            import yaml
+        except ImportError:
+            raise RuntimeError(f"PyYAML is required to load {path}; install it or use a JSON terms file")
+        return yaml.safe_load(text) or {}
+    if path.suffix == ".txt":
+        return [line.split("#", 1)[0] for line in text.splitlines()]
+    return json.loads(text)
+
+# Read every category a terms file or directory defines
+def load_terms(path: str) -> dict[str, list[str]]:
+    source = Path(path)
+    if source.is_dir():
+        loaded = {
+            entry.stem: load_terms_file(entry)
+            for entry in sorted(source.iterdir())
+            if entry.suffix in TERM_FILE_SUFFIXES
+        }
+    else:
+        loaded = load_terms_file(source)
+
+    if not isinstance(loaded, dict):
+        raise ValueError(f"{path} must map each category to a list of terms")
+
+    unknown = set(loaded) - set(BUILTIN_INDEX.categories)
+    if unknown:
+        raise ValueError(f"Unknown term categories in {path}: {', '.join(sorted(unknown))}")
+
+    categories = {}
+    for name, terms in loaded.items():
+        if not isinstance(terms, list):
+            raise ValueError(f"Category '{name}' in {path} must be a list of terms")
+        categories[name] = clean_terms(terms)
+    return categories
+
+# Holds the current TermsIndex and swaps it atomically when the source changes.
+# Subscribers (the rule engine) are called with each new index after the swap
+class TermsStore:
+    def __init__(self, path: str | None = TERMS_PATH):
+        self.path = path or None
+        self.index = BUILTIN_INDEX
+        self._stamp = None
+        self._stop = threading.Event()
+        self._subscribers: list[Callable[[TermsIndex], None]] = []
+        if self.path:
+            self.load()
+
+    def subscribe(self, callback: Callable[[TermsIndex], None]) -> None:
+        self._subscribers.append(callback)
+
+    # mtime and size of the file, or of every terms file in the directory
+    def _source_stamp(self) -> tuple:
+        source = Path(self.path)
+        if source.is_dir():
+            entries = [entry for entry in sorted(source.iterdir()) if entry.suffix in TERM_FILE_SUFFIXES]
+        else:
+            entries = [source]
+        return tuple((entry.name, *self._file_stamp(entry)) for entry in entries)
+
+    @staticmethod
+    def _file_stamp(path: Path) -> tuple[int, int]:
+        stat = os.stat(path)
+        return stat.st_mtime_ns, stat.st_size
+
+    def load(self) -> None:
+        stamp = self._source_stamp()
+        index = TermsIndex({**BUILTIN_INDEX.categories, **load_terms(self.path)})
+        self.index, self._stamp = index, stamp
+        logger.info("Loaded terms from %s (version %s)", self.path, index.version)
+
+        for callback in self._subscribers:
+            try:
+                callback(index)
+            except Exception:
+                logger.exception("Terms subscriber failed for version %s", index.version)
+
+    # Reload if the source changed. A broken source is logged and the previous index stays in place
+    def reload_if_changed(self) -> bool:
+        if not self.path:
+            return False
+        try:
+            if self._source_stamp() == self._stamp:
+                return False
+            self.load()
+            return True
+        except Exception:
+            logger.exception("Failed to reload terms from %s - keeping the previous version", self.path)
+            return False
+
+    # Poll the source from a background thread, so reloads never run on the request path
+    def start_watching(self, interval: float = TERMS_RELOAD_SECONDS) -> None:
+        if not self.path:
+            return
+        self._stop.clear()
+
+        def watch():
+            while not self._stop.wait(interval):
+                self.reload_if_changed()
+
+        threading.Thread(target=watch, name="terms-watcher", daemon=True).start()
+
+    def stop_watching(self) -> None:
+        self._stop.set()
+
+TERMS_STORE = TermsStore()
@@ -0,0 +1,73 @@
+import hashlib
+import io
+
+# An upload's bytes without the copies. Large multipart uploads have already been spooled to a temporary
+# file by the time the endpoint runs, so read_file memory-maps that file instead of reading it into memory
+# (see services.py); small ones are read as before. Either way the SHA-256 is taken from the buffer the
+# checks use, so the result cache and audit logs never hash the bytes a second time.
+#
+# PIL, the GIF walker and zipfile read straight from the buffer through independent cursors (open()).
+# Pickling - handing the upload to a worker process - is the one place the bytes are copied.
+
+class MemoryReader(io.RawIOBase):
+    def __init__(self, view: memoryview):
+        self._view = view
+        self._pos = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        size = min(len(buffer), max(0, len(self._view) - self._pos))
+        buffer[:size] = self._view[self._pos:self._pos + size]
+        self._pos += size
+        return size
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        base = {io.SEEK_SET: 0, io.SEEK_CUR: self._pos, io.SEEK_END: len(self._view)}[whence]
+        self._pos = max(0, base + offset)
+        return self._pos
+
+    def tell(self) -> int:
+        return self._pos
+
+# Read-only view over bytes, a bytearray or an mmap, with its SHA-256 (computed on first use if not given)
+class UploadBuffer:
+    def __init__(self, data, digest: str | None = None):
+        self.data = data
+        self.view = memoryview(data)
+        self._digest = digest
+
+    @property
+    def digest(self) -> str:
+        if self._digest is None:
+            self._digest = hashlib.sha256(self.view).hexdigest()
+        return self._digest
+
+    def __len__(self) -> int:
+        return self.view.nbytes
+
+    def __getitem__(self, key):
+        return self.view[key]
+
+    def __bytes__(self) -> bytes:
+        return self.view.tobytes()
+
+    # A fresh file object over the buffer - no copy, and its own read position
+    def open(self) -> io.RawIOBase | io.BytesIO:
+        if isinstance(self.data, bytes):
+            return io.BytesIO(self.data)
+        return MemoryReader(self.view)
+
+    # Worker processes get plain bytes (mmaps and memoryviews don't pickle) and the digest already taken
+    def __reduce__(self):
+        return UploadBuffer, (bytes(self), self._digest)
+
+# Everything the pipeline accepts as a creative's contents
+Contents = UploadBuffer | bytes
+
+def as_upload(contents: Contents) -> UploadBuffer:
+    return contents if isinstance(contents, UploadBuffer) else UploadBuffer(contents)
@@ -0,0 +1,35 @@
+import pytest
+from tests.benchmarks.harness import TOLERANCE, MIN_DELTA_MS, UPDATE_BASELINE, load_baseline, save_baseline, summarise
+
+class BenchmarkRecorder:
+    def __init__(self):
+        self.baseline = load_baseline()
+        self.results: dict[str, dict] = {}
+
+    # Summarise one benchmark's samples, print them, and fail if p50 regressed past the tolerance
+    def record(self, name: str, samples: list[float]) -> dict:
+        result = summarise(samples)
+        self.results[name] = result
+        print(
+            f"\n{name}: p50 {result['p50_ms']:.3f} ms, p99 {result['p99_ms']:.3f} ms, "
+            f"{result['throughput_per_s']}/s, peak RSS {result['peak_rss_mb']} MB"
+        )
+
+        expected = self.baseline.get(name)
+        regressed = expected and (
+            result["p50_ms"] > expected["p50_ms"] * TOLERANCE
+            and result["p50_ms"] - expected["p50_ms"] > MIN_DELTA_MS
+        )
+        if regressed and not UPDATE_BASELINE:
+            pytest.fail(
+                f"{name} regressed: p50 {result['p50_ms']:.3f} ms vs baseline {expected['p50_ms']:.3f} ms "
+                f"(tolerance x{TOLERANCE})"
+            )
+        return result
+
+@pytest.fixture(scope="session")
+def recorder():
+    recorder = BenchmarkRecorder()
+    yield recorder
+    if UPDATE_BASELINE:
+        save_baseline(recorder.results)
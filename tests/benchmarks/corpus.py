@@ -0,0 +1,62 @@
+import io
+import random
+from PIL import Image, ImageDraw
+from src.models import Metadata
+from src.rules import MIN_WIDTH, MIN_HEIGHT, MAX_WIDTH
+from src.terms import RESTRICTED_THEMES_KEYWORDS, RESTRICTED_COUNTRY_KEYWORDS
+
+# Synthetic creatives for the benchmark suite. Everything is seeded, so every run
+# measures exactly the same bytes
+
+# Widths from the smallest to the largest creative the rules accept (4:3, never below MIN_HEIGHT)
+SIZES = (MIN_WIDTH, 1000, 3000, MAX_WIDTH)
+FRAME_COUNTS = (1, 10, 100)
+TERM_DENSITIES = (0, 1, 5)
+
+FILLER_WORDS = ["summer", "campaign", "city", "launch", "brand", "new", "offer", "banner", "retail", "week"]
+
+def size_for(width: int) -> tuple[int, int]:
+    return width, max(MIN_HEIGHT, width * 3 // 4)
+
+# A creative-like image: high-contrast halves with seeded coloured blocks on top
+def make_image(width: int, height: int, seed: int = 0) -> Image.Image:
+    rng = random.Random(seed)
+    img = Image.new("RGB", (width, height), "white")
+    draw = ImageDraw.Draw(img)
+    draw.rectangle([0, 0, width // 2, height], fill="black")
+    for _ in range(20):
+        x0, y0 = rng.randrange(width), rng.randrange(height)
+        x1, y1 = min(width, x0 + rng.randrange(1, width // 4 + 2)), min(height, y0 + rng.randrange(1, height // 4 + 2))
+        draw.rectangle([x0, y0, x1, y1], fill=tuple(rng.randrange(256) for _ in range(3)))
+    return img
+
+def make_creative(width: int, height: int, format: str) -> bytes:
+    buf = io.BytesIO()
+    make_image(width, height).save(buf, format=format)
+    return buf.getvalue()
+
+def make_gif(width: int, height: int, frames: int) -> bytes:
+    base = make_image(width, height).convert("P")
+    images = [base.rotate(180) if i % 2 else base for i in range(frames)]
+    buf = io.BytesIO()
+    images[0].save(buf, format="GIF", save_all=True, append_images=images[1:], duration=80, loop=0)
+    return buf.getvalue()
+
+# Filler text with `density` restricted terms mixed in
+def make_text(density: int, words: int = 12, seed: int = 0) -> str:
+    rng = random.Random(seed)
+    tokens = [rng.choice(FILLER_WORDS) for _ in range(words)]
+    for i in range(density):
+        tokens.insert(rng.randrange(len(tokens) + 1), RESTRICTED_THEMES_KEYWORDS[i * 7 % len(RESTRICTED_THEMES_KEYWORDS)])
+    return " ".join(tokens)
+
+def make_filename(density: int) -> str:
+    return make_text(density, words=6).replace(" ", "_") + ".png"
+
+def make_metadata(density: int) -> Metadata:
+    return Metadata(
+        market=RESTRICTED_COUNTRY_KEYWORDS[0] if density else "uk",
+        placement="roadside billboard",
+        audience="adults",
+        category=make_text(density)
+    )
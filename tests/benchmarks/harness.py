@@ -0,0 +1,69 @@
+import json
+import os
+import resource
+import time
+from pathlib import Path
+
+# Measurement helpers for the benchmark suite.
+# Each benchmark is timed over enough iterations to fill BENCHMARK_BUDGET_SECONDS (at least
+# MIN_ITERATIONS), then its p50 is compared against the stored baseline
+
+BASELINE_PATH = Path(__file__).with_name("baseline.json")
+BUDGET_SECONDS = float(os.getenv("BENCHMARK_BUDGET_SECONDS", 0.5))
+MIN_ITERATIONS, MAX_ITERATIONS = 5, 500
+
+# A benchmark fails when its p50 is more than TOLERANCE times the baseline p50, and slower by
+# at least MIN_DELTA_MS (so timer noise on microsecond-scale checks doesn't fail the run)
+TOLERANCE = float(os.getenv("BENCHMARK_TOLERANCE", 2.0))
+MIN_DELTA_MS = float(os.getenv("BENCHMARK_MIN_DELTA_MS", 0.5))
+UPDATE_BASELINE = os.getenv("BENCHMARK_UPDATE_BASELINE") == "1"
+
+def percentile(samples: list[float], pct: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, round(pct / 100 * (len(ordered) - 1)))]
+
+# Peak resident set size of the whole test process so far (ru_maxrss is in KiB on Linux)
+def peak_rss_mb() -> float:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def iterations_for(first_run: float) -> int:
+    return max(MIN_ITERATIONS, min(MAX_ITERATIONS, int(BUDGET_SECONDS / max(first_run, 1e-9))))
+
+def run_sync(fn, *args) -> list[float]:
+    samples = []
+    start = time.perf_counter()
+    fn(*args)
+    for _ in range(iterations_for(time.perf_counter() - start)):
+        start = time.perf_counter()
+        fn(*args)
+        samples.append(time.perf_counter() - start)
+    return samples
+
+async def run_async(fn, *args) -> list[float]:
+    samples = []
+    start = time.perf_counter()
+    await fn(*args)
+    for _ in range(iterations_for(time.perf_counter() - start)):
+        start = time.perf_counter()
+        await fn(*args)
+        samples.append(time.perf_counter() - start)
+    return samples
+
+def summarise(samples: list[float]) -> dict:
+    return {
+        "p50_ms": round(percentile(samples, 50) * 1000, 4),
+        "p99_ms": round(percentile(samples, 99) * 1000, 4),
+        "throughput_per_s": round(len(samples) / sum(samples), 1),
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+        "iterations": len(samples)
+    }
+
+def load_baseline() -> dict:
+    if BASELINE_PATH.exists():
+        return json.loads(BASELINE_PATH.read_text())
+    return {}
+
+def save_baseline(results: dict) -> None:
+    baseline = load_baseline()
+    baseline.update({name: {"p50_ms": result["p50_ms"], "p99_ms": result["p99_ms"]} for name, result in results.items()})
+    BASELINE_PATH.write_text(json.dumps(dict(sorted(baseline.items())), indent=2) + "\n")
@@ -0,0 +1,164 @@
+import os
+import random
+import pytest
+from src.cache import RESULT_CACHE
+from src.checks import check_filename, check_metadata
+from src.phash import PerceptualIndex, to_signed
+from src.services import (
+    read_image_header,
+    decode_image,
+    analyse_image,
+    calculate_contrast,
+    estimate_contrast,
+    get_gif_info
+)
+from tests.benchmarks.corpus import (
+    SIZES,
+    FRAME_COUNTS,
+    TERM_DENSITIES,
+    size_for,
+    make_creative,
+    make_gif,
+    make_filename,
+    make_metadata
+)
+from tests.benchmarks.harness import run_sync, run_async
+
+# Performance benchmarks for the approval pipeline - excluded from the default run.
+#   pytest -m benchmark -s                                  → run, print p50/p99/throughput/RSS, fail on regression
+#   BENCHMARK_UPDATE_BASELINE=1 pytest -m benchmark         → re-record tests/benchmarks/baseline.json
+
+pytestmark = pytest.mark.benchmark
+
+FORMATS = ("PNG", "JPEG")
+
+PHASH_BENCH_SIZE = int(os.getenv("PHASH_BENCH_SIZE", 1_000_000))
+
+@pytest.fixture(scope="module")
+def creatives():
+    return {(format, width): make_creative(*size_for(width), format) for format in FORMATS for width in SIZES}
+
+@pytest.fixture(scope="module")
+def gifs():
+    return {(width, frames): make_gif(*size_for(width), frames) for width in SIZES[:2] for frames in FRAME_COUNTS}
+
+@pytest.mark.parametrize("format", FORMATS)
+@pytest.mark.parametrize("width", SIZES)
+def test_bench_open_file(recorder, creatives, format, width):
+    contents = creatives[format, width]
+    recorder.record(f"read_image_header[{format}-{width}]", run_sync(read_image_header, contents))
+    recorder.record(f"decode_image[{format}-{width}]", run_sync(decode_image, contents))
+
+@pytest.mark.parametrize("format", FORMATS)
+@pytest.mark.parametrize("width", SIZES)
+def test_bench_contrast(recorder, creatives, format, width):
+    img = decode_image(creatives[format, width])
+    recorder.record(f"calculate_contrast[{format}-{width}]", run_sync(calculate_contrast, img))
+    recorder.record(f"estimate_contrast[{format}-{width}]", run_sync(estimate_contrast, img))
+    recorder.record(f"analyse_image[{format}-{width}]", run_sync(analyse_image, creatives[format, width]))
+
+@pytest.mark.parametrize("frames", FRAME_COUNTS)
+@pytest.mark.parametrize("width", SIZES[:2])
+def test_bench_gif_info(recorder, gifs, width, frames):
+    contents = gifs[width, frames]
+    recorder.record(f"get_gif_info[{width}-{frames}f]", run_sync(get_gif_info, contents))
+    recorder.record(f"analyse_image[GIF-{width}-{frames}f]", run_sync(analyse_image, contents))
+
+@pytest.mark.parametrize("density", TERM_DENSITIES)
+def test_bench_keyword_checks(recorder, density):
+    recorder.record(f"check_filename[{density}-terms]", run_sync(check_filename, make_filename(density)))
+    recorder.record(f"check_metadata[{density}-terms]", run_sync(check_metadata, make_metadata(density)))
+
+# End-to-end through the ASGI app, with the result cache cleared so every request is fully evaluated
+@pytest.mark.parametrize("format", FORMATS)
+@pytest.mark.parametrize("width", SIZES)
+async def test_bench_endpoint(recorder, client, creatives, format, width):
+    contents = creatives[format, width]
+    data = {"metadata": make_metadata(1).model_dump_json()}
+
+    async def post():
+        RESULT_CACHE.clear()
+        response = await client.post(
+            "/creative-approval",
+            files={"file": (make_filename(1), contents, f"image/{format.lower()}")},
+            data=data
+        )
+        assert response.status_code == 200
+
+    recorder.record(f"endpoint[{format}-{width}]", await run_async(post))
+
+# The same creatives through the raw-body endpoint - no multipart encoding, metadata as query parameters
+@pytest.mark.parametrize("format", FORMATS)
+@pytest.mark.parametrize("width", SIZES)
+async def test_bench_endpoint_raw(recorder, client, creatives, format, width):
+    contents = creatives[format, width]
+    params = {"filename": make_filename(1), **make_metadata(1).model_dump(exclude_none=True)}
+
+    async def post():
+        RESULT_CACHE.clear()
+        response = await client.post(
+            "/creative-approval/raw",
+            params=params,
+            content=contents,
+            headers={"Content-Type": f"image/{format.lower()}"}
+        )
+        assert response.status_code == 200
+
+    recorder.record(f"endpoint_raw[{format}-{width}]", await run_async(post))
+
+# Upload overhead alone: multipart vs raw body for the largest creative, served from the result cache
+@pytest.mark.parametrize("format", FORMATS)
+async def test_bench_endpoint_upload_overhead(recorder, client, creatives, format):
+    contents = creatives[format, SIZES[-1]]
+    metadata = make_metadata(1)
+    content_type = f"image/{format.lower()}"
+
+    async def post_multipart():
+        response = await client.post(
+            "/creative-approval",
+            files={"file": (make_filename(1), contents, content_type)},
+            data={"metadata": metadata.model_dump_json()}
+        )
+        assert response.status_code == 200
+
+    async def post_raw():
+        response = await client.post(
+            "/creative-approval/raw",
+            params={"filename": make_filename(1), **metadata.model_dump(exclude_none=True)},
+            content=contents,
+            headers={"Content-Type": content_type}
+        )
+        assert response.status_code == 200
+
+    RESULT_CACHE.clear()
+    recorder.record(f"endpoint_cached[{format}-{SIZES[-1]}]", await run_async(post_multipart))
+    recorder.record(f"endpoint_raw_cached[{format}-{SIZES[-1]}]", await run_async(post_raw))
+
+async def test_bench_endpoint_gif(recorder, client, gifs):
+    contents = gifs[SIZES[1], FRAME_COUNTS[1]]
+
+    async def post():
+        RESULT_CACHE.clear()
+        response = await client.post("/creative-approval", files={"file": ("anim.gif", contents, "image/gif")})
+        assert response.status_code == 200
+
+    recorder.record(f"endpoint[GIF-{SIZES[1]}-{FRAME_COUNTS[1]}f]", await run_async(post))
+
+# Near-duplicate lookup against an index of PHASH_BENCH_SIZE creatives, written straight to SQLite
+@pytest.fixture(scope="module")
+def phash_index(tmp_path_factory):
+    index = PerceptualIndex(str(tmp_path_factory.mktemp("phash") / "phash.sqlite3"))
+    rng = random.Random(0)
+    rows = ((to_signed(rng.getrandbits(64)), "v1", "APPROVED", "[]", "{}", 0.0) for _ in range(PHASH_BENCH_SIZE))
+    index._connect().executemany("INSERT INTO phashes VALUES (?, ?, ?, ?, ?, ?)", rows)
+    len(index)
+    index.wait_for_merge()
+    yield index
+    index.close()
+
+def test_bench_phash_lookup(recorder, phash_index):
+    rng = random.Random(1)
+    queries = [rng.getrandbits(64) for _ in range(1000)]
+    samples = run_sync(lambda: phash_index.lookup(queries[rng.randrange(1000)], "v1"))
+    result = recorder.record(f"phash_lookup[{PHASH_BENCH_SIZE}]", samples)
+    assert result["p50_ms"] < 1
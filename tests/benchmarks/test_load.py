@@ -0,0 +1,54 @@
+import asyncio
+import os
+import time
+import httpx
+import pytest
+from tests.benchmarks.corpus import make_creative, size_for
+from tests.test_server import serve
+
+# Load test for the multi-worker server: the same PNG posted by concurrent clients for LOAD_SECONDS against
+# python -m src.server with 1 and with LOAD_WORKERS workers. Image analysis runs inline in each worker and
+# the result cache is off, so the server workers are the only parallelism. Throughput should scale close
+# to linearly - at least LOAD_MIN_SCALING of the worker count. Needs at least LOAD_WORKERS cores
+#   pytest -m benchmark -s tests/benchmarks/test_load.py
+
+pytestmark = pytest.mark.benchmark
+
+LOAD_WORKERS = int(os.getenv("LOAD_WORKERS", min(4, os.cpu_count() or 1)))
+LOAD_SECONDS = float(os.getenv("LOAD_SECONDS", 5))
+LOAD_CLIENTS_PER_WORKER = 4
+LOAD_MIN_SCALING = float(os.getenv("LOAD_MIN_SCALING", 0.7))
+
+SERVER_ENV = {"EXECUTOR_MODE": "inline", "CACHE_BACKEND": "none", "SERVER_MAX_REQUESTS": 0}
+
+# Requests per second completed by `clients` concurrent clients over LOAD_SECONDS
+async def measure_throughput(url: str, contents: bytes, clients: int) -> float:
+    completed = 0
+    deadline = time.perf_counter() + LOAD_SECONDS
+
+    async def client():
+        nonlocal completed
+        async with httpx.AsyncClient(base_url=url, timeout=30) as http:
+            while time.perf_counter() < deadline:
+                response = await http.post("/creative-approval", files={"file": ("creative.png", contents, "image/png")})
+                assert response.status_code == 200
+                completed += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(clients)))
+    return completed / (time.perf_counter() - start)
+
+@pytest.mark.skipif(LOAD_WORKERS < 2, reason="needs at least 2 CPU cores to measure scaling")
+async def test_load_scaling(tmp_path):
+    contents = make_creative(*size_for(1000), "PNG")
+    throughput = {}
+    for workers in (1, LOAD_WORKERS):
+        with serve(tmp_path, workers, **SERVER_ENV) as (url, process):
+            throughput[workers] = await measure_throughput(url, contents, workers * LOAD_CLIENTS_PER_WORKER)
+
+    scaling = throughput[LOAD_WORKERS] / throughput[1]
+    print(
+        f"\nload: 1 worker {throughput[1]:.1f}/s, {LOAD_WORKERS} workers {throughput[LOAD_WORKERS]:.1f}/s "
+        f"(x{scaling:.2f})"
+    )
+    assert scaling >= LOAD_MIN_SCALING * LOAD_WORKERS
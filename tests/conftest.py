@@ -1,9 +1,25 @@
+import pytest
 import pytest_asyncio
 from httpx import AsyncClient, ASGITransport
 from src.main import app
+from src.cache import RESULT_CACHE
+from src.phash import PHASH_INDEX
 
 @pytest_asyncio.fixture
 async def client():
     transport = ASGITransport(app=app)
     async with AsyncClient(transport=transport, base_url="http://test") as ac:
-        yield ac
\ No newline at end of file
+        yield ac
+
+# Start every test with an empty result cache, so results never leak between tests
+@pytest.fixture(autouse=True)
+def clear_result_cache():
+    RESULT_CACHE.clear()
+
+# Every test gets its own empty near-duplicate index, instead of the one in the working directory
+@pytest.fixture(autouse=True)
+def isolate_phash_index(tmp_path, monkeypatch):
+    PHASH_INDEX.close()
+    monkeypatch.setattr(PHASH_INDEX, "path", str(tmp_path / "phash.sqlite3"))
+    yield
+    PHASH_INDEX.close()
@@ -0,0 +1,101 @@
+import asyncio
+import os
+import sqlite3
+import time
+import pytest
+from src.admission import AdmissionController, Busy, MemoryRateLimiter, SQLiteRateLimiter
+from src.metrics import ADMISSION_REJECTED, STAGE_DURATION
+from tests.test_img_gen import make_high_contrast_png
+
+# L.1: Token buckets allow a burst, then refill at the rate - per client, and shared through SQLite
+@pytest.mark.parametrize("backend", ["memory", "sqlite"])
+def test_token_buckets(tmp_path, backend):
+    def limiter():
+        if backend == "memory":
+            return MemoryRateLimiter(rate=2, burst=2)
+        return SQLiteRateLimiter(str(tmp_path / "limits.sqlite3"), rate=2, burst=2)
+
+    buckets = limiter()
+    assert [buckets.take("a", now=100), buckets.take("a", now=100)] == [0, 0]
+    assert buckets.take("a", now=100) == pytest.approx(0.5)
+    assert buckets.take("b", now=100) == 0
+    assert buckets.take("a", now=100.25) == pytest.approx(0.25)
+    assert buckets.take("a", now=100.5) == 0
+
+    if backend == "sqlite":
+        assert limiter().take("a", now=100.5) == pytest.approx(0.5)
+
+# L.2: A client over its rate gets a 429 before its upload is read; other clients and /health are unaffected
+async def test_rate_limited_client(client, monkeypatch):
+    monkeypatch.setattr("src.admission.RATE_LIMITER", MemoryRateLimiter(rate=0.01, burst=1))
+    rejected = ADMISSION_REJECTED.value(reason="rate_limited")
+    img = make_high_contrast_png(400, 400).getvalue()
+
+    def post(key):
+        return client.post("/creative-approval", files={"file": ("a.png", img, "image/png")}, headers={"X-API-Key": key})
+
+    assert (await post("one")).status_code == 200
+    response = await post("one")
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == "100"
+    assert (await post("two")).status_code == 200
+    assert (await client.get("/health")).status_code == 200
+    assert ADMISSION_REJECTED.value(reason="rate_limited") == rejected + 1
+
+# L.3: Requests wait, oldest first, for a slot and for room in the byte budget; past the queue or its timeout they're busy
+async def test_admission_controller():
+    admission = AdmissionController(max_requests=2, max_bytes=100, max_queued=1, queue_timeout=0.5)
+    assert await admission.acquire(60) == 0
+
+    waiting = asyncio.create_task(admission.acquire(60))
+    await asyncio.sleep(0.05)
+    assert (admission.in_flight, admission.queued) == (1, 1)
+    with pytest.raises(Busy):
+        await admission.acquire(10)
+
+    admission.release(60)
+    assert await waiting > 0.04
+    assert (admission.in_flight, admission.in_flight_bytes) == (1, 60)
+
+    # An upload larger than the whole budget still goes through on its own
+    admission.release(60)
+    assert await admission.acquire(500) == 0
+    with pytest.raises(Busy):
+        await admission.acquire(1)
+    assert (admission.in_flight, admission.queued) == (1, 0)
+
+# L.4: A worker with no room answers 503 straight away; admitted requests record their queue wait
+async def test_busy_worker(client, monkeypatch):
+    img = make_high_contrast_png(400, 400).getvalue()
+    admitted = STAGE_DURATION.count(stage="admission_wait")
+    response = await client.post("/creative-approval", files={"file": ("a.png", img, "image/png")})
+    assert response.status_code == 200
+    assert STAGE_DURATION.count(stage="admission_wait") == admitted + 1
+
+    monkeypatch.setattr("src.admission.ADMISSION", AdmissionController(max_requests=0, queue_timeout=0, retry_after=3))
+    response = await client.post("/creative-approval", files={"file": ("a.png", img, "image/png")})
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "3"
+    assert response.json()["detail"].startswith("Server busy")
+
+# L.5: The shared buckets' file is opened on first use, refilled buckets are pruned, and a request isn't held up when another worker holds the lock
+def test_sqlite_limiter_prunes_and_fails_open(tmp_path):
+    path = str(tmp_path / "limits.sqlite3")
+    buckets = SQLiteRateLimiter(path, rate=1, burst=2, busy_timeout=0.05, prune_interval=60)
+    # Nothing is opened until the first take() - a limiter created before a fork holds no connection
+    assert buckets._conn is None and not os.path.exists(path)
+    for client in ("a", "b", "c"):
+        buckets.take(client, now=100)
+    assert buckets.take("a", now=159.5) == 0
+    assert buckets.take("d", now=160) == 0
+    assert sorted(row[0] for row in buckets._conn.execute("SELECT client FROM buckets")) == ["a", "d"]
+
+    other = sqlite3.connect(path, isolation_level=None)
+    other.execute("BEGIN IMMEDIATE")
+    start = time.perf_counter()
+    for _ in range(3):
+        assert buckets.take("a", now=160) == 0
+    assert time.perf_counter() - start < 1
+    other.execute("ROLLBACK")
+    assert buckets.take("a", now=160) == 0
+    assert buckets.take("a", now=160) == pytest.approx(0.5)
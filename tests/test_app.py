@@ -199,3 +199,159 @@ async def test_missing_file(client):
     response = await client.post("/creative-approval", data={})
     assert response.status_code == 422  
 
+
+# T.17: Test unreadable file decoded in the worker pool → 422 error thrown
+async def test_unreadable_file(client):
+    response = await client.post(
+        "/creative-approval",
+        files={"file": ("img.png", b"not an image", "image/png")}
+    )
+    assert response.status_code == 422
+    assert response.json()["detail"] == "Invalid or unreadable image file"
+
+# T.18: Test image analysis queue full → 503 with Retry-After
+async def test_executor_queue_full(client, monkeypatch):
+    from src.executor import ENGINE
+    monkeypatch.setattr(ENGINE, "max_queue_depth", 0)
+    img = make_high_contrast_png(400, 400)
+    response = await client.post(
+        "/creative-approval",
+        files={"file": ("test.png", img, "image/png")}
+    )
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == str(ENGINE.retry_after)
+
+# T.19: Test file over MAX_FILE_BYTES → 422 error thrown before decoding
+async def test_file_too_large(client):
+    from src.rules import MAX_FILE_BYTES
+    response = await client.post(
+        "/creative-approval",
+        files={"file": ("big.png", b"\0" * (MAX_FILE_BYTES + 1), "image/png")}
+    )
+    assert response.status_code == 422
+    assert response.json()["detail"].startswith("File too large")
+
+# T.20: Test unsupported format rejected from the header → 422 error thrown
+async def test_unsupported_format(client):
+    img = generate_test_image(400, 400, format="BMP")
+    response = await client.post(
+        "/creative-approval",
+        files={"file": ("img.bmp", img, "image/bmp")}
+    )
+    assert response.status_code == 422
+    assert response.json()["detail"].startswith("Unsupported image format: BMP")
+
+# T.21: Test GIF with too many frames at a high frame rate → REQUIRES_REVIEW (frames aren't counted past the limit)
+async def test_complex_gif_requires_review(client):
+    from tests.test_img_gen import make_test_gif
+    img = make_test_gif(400, 400, 120, duration=50)
+    response = await client.post(
+        "/creative-approval",
+        files={"file": ("anim.gif", img, "image/gif")}
+    )
+    assert response.status_code == 200
+    body = response.json()
+    assert body["status"] == "REQUIRES_REVIEW"
+    assert body["img_format"] == "GIF"
+    assert "GIF too complex: over 100 frames" in body["reasons"]
+    assert "GIF framerate too high: 20.0 fps" in body["reasons"]
+
+# T.22: GIF flashing black/white at an allowed frame rate → REQUIRES_REVIEW for flashing
+async def test_flashing_gif_requires_review(client):
+    from tests.test_img_gen import make_test_gif
+    img = make_test_gif(400, 400, 12, duration=100)
+    response = await client.post(
+        "/creative-approval",
+        files={"file": ("anim.gif", img, "image/gif")}
+    )
+    assert response.status_code == 200
+    body = response.json()
+    assert body["status"] == "REQUIRES_REVIEW"
+    assert not any(reason.startswith("GIF framerate") for reason in body["reasons"])
+    assert "GIF flashes too often: 5 flashes in one second" in body["reasons"]
+
+# T.23: Test the raw-body endpoint: image as the body, filename and metadata as query parameters → APPROVED
+async def test_raw_body_png(client):
+    img = make_high_contrast_png(400, 400)
+    response = await client.post(
+        "/creative-approval/raw",
+        params={"filename": "test.png", "market": "UK"},
+        content=img.getvalue(),
+        headers={"Content-Type": "image/png"}
+    )
+    assert response.status_code == 200
+    body = response.json()
+    assert body["status"] == "APPROVED"
+    assert body["img_format"] == "PNG"
+
+# T.24: Test the raw-body endpoint checks the X-Filename header and metadata like the multipart one → REJECTED
+async def test_raw_body_flagged(client):
+    img = make_high_contrast_png(400, 400)
+    response = await client.post(
+        "/creative-approval/raw",
+        params={"category": "gambling", "audience": "kids"},
+        content=img.getvalue(),
+        headers={"Content-Type": "image/png", "X-Filename": "tobacco_banner.png"}
+    )
+    assert response.status_code == 200
+    body = response.json()
+    assert body["status"] == "REJECTED"
+    assert any("tobacco" in reason for reason in body["reasons"])
+
+# T.25: Test raw-body errors: unknown query parameters and bodies over MAX_FILE_BYTES → 422 error thrown
+async def test_raw_body_errors(client):
+    from src.rules import MAX_FILE_BYTES
+    img = make_high_contrast_png(400, 400)
+    response = await client.post("/creative-approval/raw", params={"colour": "red"}, content=img.getvalue())
+    assert response.status_code == 422
+    assert response.json()["detail"]["message"].startswith("Invalid metadata")
+
+    response = await client.post("/creative-approval/raw", content=b"\0" * (MAX_FILE_BYTES + 1))
+    assert response.status_code == 422
+    assert response.json()["detail"].startswith("File too large")
+
+    # A streamed body without a Content-Length is cut off once it passes the limit
+    async def chunks():
+        for _ in range(MAX_FILE_BYTES // (1024 * 1024) + 1):
+            yield b"\0" * (1024 * 1024)
+    response = await client.post("/creative-approval/raw", content=chunks())
+    assert response.status_code == 422
+    assert response.json()["detail"] == f"File too large: over {MAX_FILE_BYTES // (1024 * 1024)} MB limit"
+
+# T.26: Oversized multipart uploads are stopped as they arrive, before FastAPI parses and spools the body:
+# a declared size is refused unread, and a streamed body is read no further than the limit plus one chunk,
+# with peak traced memory far below the upload's size
+async def test_oversized_upload_bounded(client):
+    import tracemalloc
+    from src.admission import MULTIPART_OVERHEAD_BYTES
+    from src.rules import MAX_FILE_BYTES
+    chunk_size = 256 * 1024
+    total = 4 * MAX_FILE_BYTES
+    head = b'--b\r\nContent-Disposition: form-data; name="file"; filename="big.png"\r\nContent-Type: image/png\r\n\r\n'
+    sent = 0
+
+    async def body():
+        nonlocal sent
+        yield head
+        chunk = b"\0" * chunk_size
+        while sent < total:
+            sent += chunk_size
+            yield chunk
+        yield b"\r\n--b--\r\n"
+
+    headers = {"Content-Type": "multipart/form-data; boundary=b"}
+    response = await client.post("/creative-approval", content=body(), headers={**headers, "Content-Length": str(total)})
+    assert response.status_code == 422
+    assert response.json()["detail"].startswith("File too large: 40.0 MB")
+    assert sent == 0
+
+    tracemalloc.start()
+    try:
+        response = await client.post("/creative-approval", content=body(), headers=headers)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    assert response.status_code == 422
+    assert response.json()["detail"] == f"File too large: over {MAX_FILE_BYTES // (1024 * 1024)} MB limit"
+    assert sent <= MAX_FILE_BYTES + MULTIPART_OVERHEAD_BYTES + chunk_size
+    assert peak < MAX_FILE_BYTES // 4
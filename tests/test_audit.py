@@ -0,0 +1,92 @@
+import csv
+import json
+import os
+import pytest
+from src import audit
+from src.audit import main, run_audit
+from src.phash import PHASH_INDEX
+from tests.test_img_gen import generate_test_image, make_high_contrast_png
+
+@pytest.fixture
+def creatives(tmp_path):
+    root = tmp_path / "creatives"
+    (root / "uk").mkdir(parents=True)
+    (root / ".trash").mkdir()
+    (root / "ok.png").write_bytes(make_high_contrast_png(400, 400).getvalue())
+    (root / "uk" / "tobacco_ad.png").write_bytes(generate_test_image(400, 400).getvalue())
+    (root / "uk" / "broken.jpg").write_bytes(b"not an image")
+    (root / "notes.txt").write_text("not a creative")
+    (root / ".trash" / "old.png").write_bytes(make_high_contrast_png(400, 400).getvalue())
+    return root
+
+def read_ndjson(path) -> dict:
+    return {record["path"]: record for record in map(json.loads, path.read_text().splitlines())}
+
+# A.1: A directory is audited recursively in walk order; only images are read, and failures are recorded per creative
+def test_audit_directory(creatives, tmp_path):
+    output = tmp_path / "audit.ndjson"
+    summary = run_audit(str(creatives), str(output), workers=0)
+
+    records = read_ndjson(output)
+    assert list(records) == ["ok.png", "uk/broken.jpg", "uk/tobacco_ad.png"]
+    assert records["ok.png"]["result"]["status"] == "APPROVED"
+    assert records["ok.png"]["sha256"] and records["ok.png"]["rules_version"]
+    assert records["uk/tobacco_ad.png"]["result"]["status"] == "REJECTED"
+    assert records["uk/broken.jpg"]["error"] == {"status_code": 422, "detail": "Invalid or unreadable image file"}
+    assert (summary.audited, summary.statuses["ERROR"]) == (3, 1)
+    assert not os.path.exists(f"{output}.checkpoint")
+    # Audits leave the near-duplicate index untouched
+    assert len(PHASH_INDEX) == 0
+
+# A.2: An interrupted run resumes from its checkpoint without repeating or losing creatives
+def test_audit_resume(creatives, tmp_path, monkeypatch):
+    output = tmp_path / "audit.csv"
+    real_audit = audit.audit_creative
+    calls = []
+
+    def interrupt_after_two(*args):
+        if len(calls) == 2:
+            raise KeyboardInterrupt
+        calls.append(args[0])
+        return real_audit(*args)
+
+    monkeypatch.setattr(audit, "audit_creative", interrupt_after_two)
+    with pytest.raises(KeyboardInterrupt):
+        run_audit(str(creatives), str(output), workers=0, checkpoint_every=1)
+    assert json.loads((tmp_path / "audit.csv.checkpoint").read_text())["completed"] == 2
+
+    monkeypatch.setattr(audit, "audit_creative", real_audit)
+    summary = run_audit(str(creatives), str(output), workers=0, resume=True)
+    assert (summary.audited, summary.skipped) == (1, 2)
+
+    with open(output, newline="") as rows:
+        statuses = {row["path"]: row["status"] for row in csv.DictReader(rows)}
+    assert statuses == {"ok.png": "APPROVED", "uk/broken.jpg": "ERROR", "uk/tobacco_ad.png": "REJECTED"}
+
+# A.3: A manifest run through the worker pool, diffed against an earlier run's output
+def test_audit_manifest_diff(creatives, tmp_path, capsys):
+    previous = tmp_path / "previous.ndjson"
+    run_audit(str(creatives), str(previous), workers=0)
+    lines = [json.loads(line) for line in previous.read_text().splitlines()]
+    lines[0]["result"]["status"] = "REQUIRES_REVIEW"
+    for line in lines:
+        line["path"] = f"creatives/{line['path']}"
+    previous.write_text("".join(json.dumps(line) + "\n" for line in lines if not line["path"].endswith("broken.jpg")))
+
+    manifest = tmp_path / "manifest.txt"
+    manifest.write_text(
+        "creatives/ok.png\n"
+        '{"path": "creatives/uk/broken.jpg"}\n'
+        "\n"
+        '{"path": "creatives/uk/tobacco_ad.png", "metadata": {"market": "UK"}}\n'
+    )
+
+    output = tmp_path / "audit.ndjson"
+    assert main([str(manifest), "-o", str(output), "--workers", "2", "--diff", str(previous)]) == 0
+
+    records = read_ndjson(output)
+    assert records["creatives/ok.png"]["changed"] is True
+    assert records["creatives/ok.png"]["previous_status"] == "REQUIRES_REVIEW"
+    assert records["creatives/uk/tobacco_ad.png"]["changed"] is False
+    assert records["creatives/uk/broken.jpg"]["previous_status"] is None
+    assert "Changed decisions: 2 (REQUIRES_REVIEW → APPROVED 1, new → ERROR 1)" in capsys.readouterr().err
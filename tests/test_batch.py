@@ -0,0 +1,50 @@
+import io
+import json
+import zipfile
+from tests.test_img_gen import generate_test_image, make_high_contrast_png
+
+# B.1: Batch of files with per-file metadata; an unreadable file fails only its own item
+async def test_batch_files(client):
+    response = await client.post(
+        "/creative-approval/batch",
+        files=[
+            ("files", ("test.png", make_high_contrast_png(400, 400), "image/png")),
+            ("files", ("broken.png", b"not an image", "image/png")),
+            ("files", ("tobacco_ad.png", generate_test_image(400, 400), "image/png")),
+        ],
+        data={"metadata": json.dumps([{"market": "UK"}, None, {}])}
+    )
+    assert response.status_code == 200
+    items = response.json()
+    assert [item["index"] for item in items] == [0, 1, 2]
+    assert items[0]["result"]["status"] == "APPROVED"
+    assert items[1]["error"] == {"status_code": 422, "detail": "Invalid or unreadable image file"}
+    assert items[2]["result"]["status"] == "REJECTED"
+
+# B.2: Zip archive expands to one creative per image, metadata keyed by filename, streamed as NDJSON
+async def test_batch_zip_stream(client):
+    archive = io.BytesIO()
+    with zipfile.ZipFile(archive, "w") as zf:
+        zf.writestr("ads/test.png", make_high_contrast_png(400, 400).getvalue())
+        zf.writestr("ads/other.png", make_high_contrast_png(400, 400).getvalue())
+        zf.writestr("ads/", b"")
+
+    response = await client.post(
+        "/creative-approval/batch?stream=true",
+        files=[("files", ("campaign.zip", archive.getvalue(), "application/zip"))],
+        data={"metadata": json.dumps({"other.png": {"market": "iran"}})}
+    )
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    items = {item["filename"]: item for item in map(json.loads, response.text.splitlines())}
+    assert items["test.png"]["result"]["status"] == "APPROVED"
+    assert items["other.png"]["result"]["status"] == "REQUIRES_REVIEW"
+
+# B.3: Metadata list that doesn't line up with the files → 422 error thrown
+async def test_batch_metadata_mismatch(client):
+    response = await client.post(
+        "/creative-approval/batch",
+        files=[("files", ("test.png", make_high_contrast_png(400, 400), "image/png"))],
+        data={"metadata": json.dumps([{}, {}])}
+    )
+    assert response.status_code == 422
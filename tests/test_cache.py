@@ -0,0 +1,85 @@
+import json
+import sqlite3
+import time
+from src.cache import MemoryCache, SQLiteCache, RESULT_CACHE, cache_key
+from src.models import CreativeApprovalResponse, Metadata
+from src.reasons import Reason
+from tests.test_img_gen import make_high_contrast_png
+
+RESULT = CreativeApprovalResponse(
+    status="APPROVED", reasons=[], img_format="PNG", img_width=400, img_height=400, img_size_mb=0.01
+)
+
+# C.1: Repeat submission is served from the cache without decoding the image; only the lookup is reported as a stage
+async def test_repeat_submission_hits_cache(client, monkeypatch):
+    img = make_high_contrast_png(400, 400).getvalue()
+    request = dict(files={"file": ("test.png", img, "image/png")}, data={"metadata": json.dumps({"market": "UK"})})
+
+    first = await client.post("/creative-approval", **request)
+    monkeypatch.setattr("src.engine.read_image_header", lambda contents: 1 / 0)
+    second = await client.post("/creative-approval", **request)
+
+    assert second.status_code == 200
+    assert {**second.json(), "stages": None} == {**first.json(), "stages": None}
+    assert [stage["stage"] for stage in second.json()["stages"]] == ["cache_lookup"]
+    assert (RESULT_CACHE.hits, RESULT_CACHE.misses) == (1, 1)
+
+# C.2: Key changes with the bytes, the filename and the metadata
+def test_cache_key_inputs():
+    key = cache_key(b"img", "a.png", Metadata(market="UK"))
+    assert key == cache_key(b"img", "a.png", Metadata(market="UK"))
+    assert key != cache_key(b"img2", "a.png", Metadata(market="UK"))
+    assert key != cache_key(b"img", "b.png", Metadata(market="UK"))
+    assert key != cache_key(b"img", "a.png", Metadata(market="US"))
+
+# C.3: LRU evicts the least recently used entry, and entries expire after the TTL
+def test_memory_cache_lru_and_ttl():
+    cache = MemoryCache(max_entries=2, ttl=60)
+    cache.set("a", RESULT)
+    cache.set("b", RESULT)
+    cache.get("a")
+    cache.set("c", RESULT)
+    assert cache.get("b") is None and cache.get("a") == RESULT
+
+    expired = MemoryCache(max_entries=2, ttl=-1)
+    expired.set("a", RESULT)
+    assert expired.get("a") is None
+
+# C.4: SQLite backend round-trips responses and is bounded
+def test_sqlite_cache(tmp_path):
+    cache = SQLiteCache(str(tmp_path / "cache.sqlite3"), max_entries=2, ttl=60)
+    for key in "abc":
+        cache.set(key, RESULT)
+    assert len(cache) == 2
+    assert cache.get("c") == RESULT
+    assert SQLiteCache(str(tmp_path / "cache.sqlite3")).get("c") == RESULT
+
+# C.5: SQLite keeps reason codes; entries stored with messages only still load
+def test_sqlite_cache_reason_codes(tmp_path):
+    cache = SQLiteCache(str(tmp_path / "cache.sqlite3"))
+    flagged = RESULT.model_copy(update={"status": "REQUIRES_REVIEW", "reasons": [Reason("contrast_too_low", 12.5)]})
+    cache.set("a", flagged)
+    assert cache.get("a").reasons == [Reason("contrast_too_low", 12.5)]
+
+    cache._conn.execute("UPDATE results SET response = ?", (flagged.model_dump_json(),))
+    assert cache.get("a").reasons == [Reason("message", "Image contrast too low (score 12.50)")]
+
+# C.6: SQLite entries over the limit are pruned every max_entries / 10 writes, and a file locked by another
+# worker is a miss straight away rather than a wait
+def test_sqlite_cache_prune_and_busy(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    cache = SQLiteCache(path, max_entries=20, ttl=60, busy_timeout=0.05)
+    for i in range(21):
+        cache.set(f"k{i}", RESULT)
+    assert len(cache) == 21
+    cache.set("k21", RESULT)
+    assert len(cache) == 20
+
+    other = sqlite3.connect(path, isolation_level=None)
+    other.execute("BEGIN IMMEDIATE")
+    start = time.perf_counter()
+    assert cache.get("k21") is None
+    cache.set("new", RESULT)
+    assert time.perf_counter() - start < 1
+    other.execute("ROLLBACK")
+    assert cache.get("k21") == RESULT and cache.get("new") is None
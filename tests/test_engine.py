@@ -0,0 +1,130 @@
+import json
+import os
+import time
+from src.cache import RESULT_CACHE
+from src.engine import RULE_ENGINE, RuleEngine
+from src.executor import ENGINE
+from src.models import Metadata
+from tests.test_img_gen import generate_test_image, make_high_contrast_png, make_test_gif
+
+RULESETS = {
+    "default": {"terms": {"restricted": ["lottery"]}},
+    "markets": {
+        "UK": {"thresholds": {"min_contrast": 200}, "exclude_terms": {"restricted": ["taxi"]}},
+        "us": {"short_circuit": True}
+    }
+}
+
+# The reasons as they're rendered in responses
+def messages(result) -> list[str]:
+    return [str(reason) for reason in result.reasons]
+
+def write_rulesets(path, spec):
+    path.write_text(json.dumps(spec))
+    return str(path)
+
+# E.1: Markets inherit the defaults, override thresholds and add/remove terms
+async def test_market_rulesets(tmp_path):
+    engine = RuleEngine(write_rulesets(tmp_path / "rules.json", RULESETS))
+    img = make_high_contrast_png(400, 400).getvalue()
+
+    uk = await engine.ruleset_for(" uk ").evaluate(img, "taxi_lottery.png", Metadata(market="uk"))
+    assert messages(uk) == ["Image contrast too low (score 127.50)", "Restricted term in filename: lottery"]
+
+    other = await engine.ruleset_for("fr").evaluate(img, "taxi_lottery.png", Metadata(market="fr"))
+    assert messages(other) == ["Restricted term in filename: taxi", "Restricted term in filename: lottery"]
+    assert engine.ruleset_for("fr") is engine.ruleset_for(None)
+
+# E.2: Short-circuiting stops at the first REJECTED rule, before any pixels are decoded
+async def test_short_circuit_skips_pixels(tmp_path, monkeypatch):
+    engine = RuleEngine(write_rulesets(tmp_path / "rules.json", RULESETS))
+    monkeypatch.setattr("src.engine.analyse_image", lambda *args: 1 / 0)
+
+    result = await engine.ruleset_for("us").evaluate(generate_test_image(400, 400).getvalue(), "tobacco.png", Metadata())
+    assert result.status == "REJECTED"
+    assert messages(result) == ["Prohibited term in filename: tobacco"]
+
+# E.3: Changing the file recompiles the rule sets; a broken file keeps the previous ones
+def test_hot_reload(tmp_path):
+    path = write_rulesets(tmp_path / "rules.json", RULESETS)
+    engine = RuleEngine(path)
+    version = engine.ruleset_for("uk").version
+
+    write_rulesets(tmp_path / "rules.json", {"markets": {"uk": {"thresholds": {"min_contrast": 5}}, "de": {}}})
+    os.utime(path, ns=(0, 1))
+    assert engine.reload_if_changed()
+    assert engine.ruleset_for("uk").thresholds.min_contrast == 5
+    assert engine.ruleset_for("uk").version != version
+    assert engine.markets == ["de", "uk"]
+
+    (tmp_path / "rules.json").write_text("{not json")
+    assert not engine.reload_if_changed()
+    assert engine.ruleset_for("uk").thresholds.min_contrast == 5
+
+# E.4: Responses list the stages that ran, cheapest first; FAST_REJECT stops every market at the first rejection
+async def test_stage_timings_and_fast_reject(monkeypatch):
+    img = make_high_contrast_png(400, 400).getvalue()
+    result = await RuleEngine().ruleset_for(None).evaluate(img, "banner.png", Metadata())
+    stages = [stage.stage for stage in result.stages]
+    assert stages == [
+        "header", "resolution_check", "aspect_ratio_check", "filename_check", "metadata_check",
+        "pixel_analysis", "gif_check", "contrast_check", "phash_lookup"
+    ]
+    assert all(stage.ms >= 0 for stage in result.stages) and not result.partial
+
+    monkeypatch.setattr("src.engine.FAST_REJECT", True)
+    result = await RuleEngine().ruleset_for("fr").evaluate(img, "tobacco.png", Metadata(market="fr"))
+    assert messages(result) == ["Prohibited term in filename: tobacco"]
+    assert "pixel_analysis" not in [stage.stage for stage in result.stages]
+
+# E.5: Past the deadline, the creative goes to review with the reasons found so far, and the result isn't cached
+async def test_deadline_returns_partial_review(client, monkeypatch):
+    def slow_analysis(*args):
+        time.sleep(0.5)
+        return 1 / 0
+
+    monkeypatch.setattr(ENGINE, "mode", "thread")
+    monkeypatch.setattr("src.engine.analyse_image", slow_analysis)
+    monkeypatch.setattr(RULE_ENGINE.ruleset_for(None), "deadline", 0.05)
+
+    img = make_high_contrast_png(400, 400).getvalue()
+    response = await client.post("/creative-approval", files={"file": ("vitamin_banner.png", img, "image/png")})
+    result = response.json()
+    assert result["status"] == "REQUIRES_REVIEW" and result["partial"]
+    assert result["reasons"] == [
+        "Restricted term in filename: vitamin",
+        "Evaluation deadline of 0.05s exceeded; not checked: gif_check, contrast_check"
+    ]
+    assert 40 < {stage["stage"]: stage["ms"] for stage in result["stages"]}["pixel_analysis"] < 400
+    assert len(RESULT_CACHE.backend) == 0
+
+# E.6: Reasons are rendered as messages, or with ?reason_codes=true as their codes and values as well
+async def test_reason_codes(client):
+    img = make_high_contrast_png(400, 400).getvalue()
+    request = dict(files={"file": ("vitamin_banner.png", img, "image/png")}, data={"metadata": '{"audience": "kids"}'})
+
+    response = await client.post("/creative-approval", **request)
+    assert response.json()["reasons"] == ["Restricted term in filename: vitamin", "Child-related audience found: kids"]
+
+    response = await client.post("/creative-approval?reason_codes=true", **request)
+    assert response.json()["reasons"] == [
+        {"code": "restricted_term_filename", "args": ["vitamin"], "message": "Restricted term in filename: vitamin"},
+        {"code": "child_audience", "args": ["kids"], "message": "Child-related audience found: kids"}
+    ]
+
+# E.7: GIF reasons come before the resolution and aspect ratio reasons, and a GIF too large to decode still gets
+# them - from its frame timing alone, without any pixels being decoded
+async def test_gif_reasons_first_even_when_oversized(monkeypatch):
+    monkeypatch.setattr("src.engine.analyse_image", lambda *args: 1 / 0)
+    img = bytearray(make_test_gif(400, 300, 120, duration=50).getvalue())
+    img[6:8] = (20000).to_bytes(2, "little")
+
+    result = await RuleEngine().ruleset_for(None).evaluate(bytes(img), "anim.gif", Metadata())
+    assert messages(result) == [
+        "GIF too complex: over 100 frames",
+        "GIF framerate too high: 20.0 fps",
+        "Image resolution too high: 20000x300px",
+        "Aspect ratio out of bounds (0.5-2.0): 66.67"
+    ]
+    stages = [stage.stage for stage in result.stages]
+    assert "gif_timing" in stages and "pixel_analysis" not in stages and "contrast_check" not in stages
@@ -0,0 +1,97 @@
+import asyncio
+import threading
+from concurrent.futures import Future
+from concurrent.futures.process import BrokenProcessPool
+import pytest
+from fastapi import HTTPException
+from src.executor import ExecutionEngine
+
+# X.1: A caller cancelled by a deadline leaves its task running - its slot is only freed once the task finishes
+async def test_cancelled_task_keeps_its_slot():
+    engine = ExecutionEngine(mode="thread", max_queue_depth=1)
+    started, finish = threading.Event(), threading.Event()
+
+    def work():
+        started.set()
+        finish.wait(5)
+
+    task = asyncio.create_task(engine.run_cpu(work))
+    await asyncio.to_thread(started.wait, 5)
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+
+    assert engine.in_flight == 1
+    with pytest.raises(HTTPException) as exc:
+        await engine.run_cpu(len, "")
+    assert exc.value.status_code == 503
+
+    finish.set()
+    for _ in range(100):
+        if engine.in_flight == 0:
+            break
+        await asyncio.sleep(0.01)
+    assert engine.in_flight == 0
+    assert await engine.run_cpu(len, "ok") == 2
+    engine.shutdown()
+
+# X.2: A task failing on a broken pool only replaces that pool - not one another task has already replaced it with
+async def test_broken_pool_replaced_once():
+    class BrokenPool:
+        def __init__(self):
+            self.future = Future()
+            self.shut_down = False
+
+        def submit(self, fn):
+            return self.future
+
+        def shutdown(self, wait=True, cancel_futures=False):
+            self.shut_down = True
+
+    engine = ExecutionEngine(mode="process")
+    broken, replacement = BrokenPool(), BrokenPool()
+    engine._process_pool = broken
+
+    task = asyncio.create_task(engine.run_cpu(len, "x"))
+    await asyncio.sleep(0)
+    engine._process_pool = replacement
+    broken.future.set_exception(BrokenProcessPool())
+
+    with pytest.raises(HTTPException) as exc:
+        await task
+    assert exc.value.status_code == 503
+    assert engine._process_pool is replacement
+    assert not broken.shut_down and not replacement.shut_down
+
+# X.3: CPU work and I/O are capped separately - a full analysis queue still takes I/O, and the other way round
+async def test_cpu_and_io_capped_separately():
+    engine = ExecutionEngine(mode="thread", max_queue_depth=1, max_io_queue_depth=1)
+    started, finish = threading.Event(), threading.Event()
+
+    def work():
+        started.set()
+        finish.wait(5)
+
+    cpu = asyncio.create_task(engine.run_cpu(work))
+    await asyncio.to_thread(started.wait, 5)
+    assert (engine.in_flight, engine.io_in_flight) == (1, 0)
+    assert await engine.run_io(len, "io") == 2
+    with pytest.raises(HTTPException) as exc:
+        await engine.run_cpu(len, "")
+    assert exc.value.status_code == 503
+
+    started.clear()
+    io = asyncio.create_task(engine.run_io(work))
+    await asyncio.to_thread(started.wait, 5)
+    with pytest.raises(HTTPException) as exc:
+        await engine.run_io(len, "")
+    assert exc.value.status_code == 503
+
+    finish.set()
+    await asyncio.gather(cpu, io)
+    for _ in range(100):
+        if engine.in_flight == engine.io_in_flight == 0:
+            break
+        await asyncio.sleep(0.01)
+    assert (engine.in_flight, engine.io_in_flight) == (0, 0)
+    engine.shutdown()
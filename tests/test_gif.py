@@ -0,0 +1,71 @@
+import io
+from PIL import Image, ImageDraw, ImageSequence
+from src.gif import inspect_gif
+from tests.test_img_gen import make_test_gif
+
+# G.1: Frame count and delays match what PIL reports after decoding every frame
+def test_inspect_gif_matches_pil():
+    for frames, duration in [(1, 100), (5, 40), (12, [20, 50, 100, 0, 30, 70, 10, 10, 500, 20, 60, 90])]:
+        data = make_test_gif(40, 30, frames, duration).getvalue()
+        pil_delays = [f.info.get("duration", 0) for f in ImageSequence.Iterator(Image.open(make_test_gif(40, 30, frames, duration)))]
+
+        info = inspect_gif(data)
+        assert info.frame_count == len(pil_delays)
+        assert info.delays == pil_delays
+        assert not info.truncated
+
+# G.2: Walk stops early once the frame limit is exceeded
+def test_inspect_gif_frame_limit():
+    data = make_test_gif(10, 10, 30, 50).getvalue()
+    info = inspect_gif(data, frame_limit=10)
+    assert info.truncated
+    assert info.frame_count == 10
+    assert info.peak_frames_per_second == 10
+    assert inspect_gif(data).peak_frames_per_second == 20
+
+# G.3: Alternating black/white frames flash in step with the frame delay; a still GIF never flashes
+def test_analyse_flashes():
+    from src.analyser import analyse_flashes
+    for duration, expected in [(50, 9), (200, 3), (500, 1)]:
+        data = make_test_gif(40, 30, 20, duration).getvalue()
+        flashes, max_delta, pixels = analyse_flashes(data, inspect_gif(data).delays, frame_limit=100)
+        assert flashes == expected
+        assert max_delta == 1.0
+        assert pixels == 20 * 40 * 30
+
+    buf = io.BytesIO()
+    Image.new("P", (40, 30)).save(buf, format="GIF")
+    assert analyse_flashes(buf.getvalue(), [100], frame_limit=100) == (0, 0.0, 40 * 30)
+
+# G.4: Frames drawn onto the sample canvas match PIL's composited frames, whatever the disposal and transparency
+def test_analyse_flashes_matches_pil():
+    from src.analyser import FrameAnalyser, analyse_flashes, peak_flashes_per_second
+
+    def pil_flashes(data, delays):
+        analyser, previous, transitions, elapsed = FrameAnalyser(), None, [], 0
+        for index, frame in enumerate(ImageSequence.Iterator(Image.open(io.BytesIO(data)))):
+            current = analyser.luminance(frame, name=f"frame{index % 2}")
+            if previous is not None and (direction := analyser.flash_transition(previous, current)):
+                transitions.append((elapsed, direction))
+            previous = current
+            elapsed += delays[index]
+        return peak_flashes_per_second(transitions)
+
+    # A white box over most of a black frame, on every other frame - saved as cropped frames
+    frames = []
+    for i in range(16):
+        frame = Image.new("P", (60, 40))
+        frame.putpalette([0, 0, 0, 255, 255, 255, 128, 0, 0])
+        if i % 2:
+            ImageDraw.Draw(frame).rectangle((5, 5, 50, 35), fill=1)
+        frames.append(frame)
+
+    for disposal in (1, 2, 3):
+        for options in ({}, {"transparency": 2}):
+            buf = io.BytesIO()
+            frames[0].save(buf, format="GIF", save_all=True, append_images=frames[1:], duration=60, disposal=disposal, **options)
+            data = buf.getvalue()
+            delays = inspect_gif(data).delays
+            flashes, _, pixels = analyse_flashes(data, delays, frame_limit=100)
+            assert flashes == pil_flashes(data, delays) == 7
+            assert pixels <= 16 * 60 * 40
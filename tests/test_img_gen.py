@@ -17,4 +17,12 @@ def make_high_contrast_png(width, height):
     buf = io.BytesIO()
     img.save(buf, format="PNG")
     buf.seek(0)
-    return buf
\ No newline at end of file
+    return buf
+
+def make_test_gif(width, height, frames, duration=100):
+    # Alternate black/white frames; duration may be a single value or one per frame
+    images = [Image.new("L", (width, height), 255 if i % 2 else 0) for i in range(frames)]
+    buf = io.BytesIO()
+    images[0].save(buf, format="GIF", save_all=True, append_images=images[1:], duration=duration, loop=0)
+    buf.seek(0)
+    return buf
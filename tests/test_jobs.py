@@ -0,0 +1,138 @@
+import asyncio
+import json
+import pytest_asyncio
+from src.jobs import JobQueue, JobStore
+from src.models import JobStatus, Metadata
+from tests.test_img_gen import make_high_contrast_png
+
+@pytest_asyncio.fixture
+async def job_queue(tmp_path, monkeypatch):
+    queue = JobQueue(JobStore(str(tmp_path / "jobs.sqlite3")), workers=2, max_pending=3)
+    monkeypatch.setattr("src.main.JOB_QUEUE", queue)
+    yield queue
+    await queue.stop()
+
+# J.1: Submit returns 202 and a job id at once; polling returns the result with its timings
+async def test_submit_and_poll_job(client, job_queue):
+    finished = []
+    job_queue.subscribe(finished.append)
+
+    response = await client.post(
+        "/jobs",
+        files={"file": ("test.png", make_high_contrast_png(400, 400), "image/png")},
+        data={"metadata": json.dumps({"market": "UK"})}
+    )
+    assert response.status_code == 202
+    job = response.json()
+    assert job["status"] == "queued"
+    assert response.headers["Location"] == f"/jobs/{job['job_id']}"
+
+    await job_queue.join()
+    polled = (await client.get(f"/jobs/{job['job_id']}")).json()
+    assert polled["status"] == "done"
+    assert polled["result"]["status"] == "APPROVED"
+    assert polled["timings"]["total_ms"] >= polled["timings"]["run_ms"] >= 0
+    assert [status.job_id for status in finished] == [job["job_id"]]
+
+    assert (await client.get("/jobs/unknown")).status_code == 404
+
+# J.2: An unreadable image fails its job, not the submission
+async def test_failed_job(client, job_queue):
+    response = await client.post("/jobs", files={"file": ("broken.png", b"not an image", "image/png")})
+    assert response.status_code == 202
+
+    await job_queue.join()
+    polled = (await client.get(f"/jobs/{response.json()['job_id']}")).json()
+    assert polled["status"] == "failed"
+    assert polled["error"] == {"status_code": 422, "detail": "Invalid or unreadable image file"}
+
+# J.3: Jobs past max_pending are refused with a 503
+async def test_job_backpressure(client, job_queue):
+    job_queue.workers = 0
+    img = make_high_contrast_png(100, 100).getvalue()
+    for _ in range(3):
+        assert (await client.post("/jobs", files={"file": ("a.png", img, "image/png")})).status_code == 202
+
+    response = await client.post("/jobs", files={"file": ("a.png", img, "image/png")})
+    assert response.status_code == 503
+    assert "Retry-After" in response.headers
+
+# J.4: Jobs queued or running when the process stopped are picked up by the next start
+async def test_jobs_resume_after_restart(tmp_path):
+    path = str(tmp_path / "jobs.sqlite3")
+    store = JobStore(path)
+    queued = store.add(make_high_contrast_png(400, 400).getvalue(), "a.png", Metadata(), None)
+    running = store.add(make_high_contrast_png(400, 400).getvalue(), "b.png", Metadata(), None)
+    store.claim(running)
+
+    queue = JobQueue(JobStore(path), workers=1)
+    queue.start()
+    await asyncio.wait_for(queue.join(), timeout=10)
+    await queue.stop()
+
+    assert (await queue.get(queued)).status == (await queue.get(running)).status == "done"
+
+# J.5: callback_url must be an http(s) URL, and on a listed host once JOBS_CALLBACK_HOSTS is set
+async def test_callback_url_checked_on_submit(client, job_queue):
+    img = make_high_contrast_png(100, 100).getvalue()
+
+    def submit(url):
+        return client.post("/jobs", files={"file": ("a.png", img, "image/png")}, data={"callback_url": url})
+
+    assert (await submit("ftp://hooks.example.com/done")).status_code == 422
+    job_queue.callback_hosts = ("hooks.example.com", ".partner.test")
+    assert (await submit("https://hooks.example.com/done")).status_code == 202
+    assert (await submit("https://eu.partner.test/done")).status_code == 202
+    response = await submit("http://169.254.169.254/latest/meta-data")
+    assert response.status_code == 422
+    assert response.json()["detail"] == "callback_url host is not allowed: 169.254.169.254"
+
+# J.6: A webhook to a loopback or private address is refused, unless its host is listed in JOBS_CALLBACK_HOSTS
+async def test_webhook_to_internal_address(tmp_path, caplog):
+    received = []
+
+    async def handle(reader, writer):
+        received.append(await reader.readuntil(b"\r\n\r\n"))
+        writer.write(b"HTTP/1.1 204 No Content\r\nConnection: close\r\n\r\n")
+        await writer.drain()
+        writer.close()
+
+    server = await asyncio.start_server(handle, "127.0.0.1", 0)
+    url = f"http://127.0.0.1:{server.sockets[0].getsockname()[1]}/done"
+    status = JobStatus(job_id="j", status="done", submitted_at=0)
+    queue = JobQueue(JobStore(str(tmp_path / "jobs.sqlite3")))
+    async with server:
+        for internal in (url, "http://10.1.2.3/done", "http://[::ffff:127.0.0.1]/done"):
+            await queue._notify(internal, status)
+        assert received == []
+        assert caplog.text.count("host is not public") == 3
+
+        queue.callback_hosts = ("127.0.0.1",)
+        await queue._notify(url, status)
+        assert received and received[0].startswith(b"POST /done ")
+
+# J.7: A webhook goes to the address that was checked, not one the host resolves to later; the Host header
+# still names the callback host
+async def test_webhook_connects_to_checked_address(tmp_path, monkeypatch):
+    received = []
+
+    async def handle(reader, writer):
+        received.append(await reader.readuntil(b"\r\n\r\n"))
+        writer.write(b"HTTP/1.1 204 No Content\r\nConnection: close\r\n\r\n")
+        await writer.drain()
+        writer.close()
+
+    server = await asyncio.start_server(handle, "127.0.0.1", 0)
+    port = server.sockets[0].getsockname()[1]
+    queue = JobQueue(JobStore(str(tmp_path / "jobs.sqlite3")))
+
+    async def checked(host, port):
+        return ["127.0.0.1"]
+
+    # hooks.invalid never resolves - it can only be reached through the checked address
+    monkeypatch.setattr(queue, "_public_addresses", checked)
+    async with server:
+        await queue._notify(f"http://hooks.invalid:{port}/done", JobStatus(job_id="j", status="done", submitted_at=0))
+    assert len(received) == 1
+    assert received[0].startswith(b"POST /done ")
+    assert f"host: hooks.invalid:{port}".encode() in received[0].lower()
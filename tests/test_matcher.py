@@ -0,0 +1,129 @@
+import random
+from src.checks import check_filename, check_metadata
+from src.constants import STATUS_APPROVED
+from src.matcher import (
+    KEYWORD_MATCHER,
+    KeywordMatcher,
+    TokenMatcher,
+    leet_variant,
+    normalise_text,
+    parse_term,
+    term_variants
+)
+from src.models import Metadata
+from src.terms import (
+    PROHIBITED_THEMES_KEYWORDS,
+    RESTRICTED_THEMES_KEYWORDS,
+    RESTRICTED_COUNTRY_KEYWORDS
+)
+
+# M.1: Overlapping terms and suffixes are all reported, in term list order
+def test_matcher_reports_overlapping_terms():
+    matcher = KeywordMatcher({"a": ["she", "he", "hers", "his"], "b": ["e"]})
+    assert matcher.scan("ushers") == {"a": ["she", "he", "hers"], "b": ["e"]}
+    assert matcher.scan("xyz") == {}
+
+# M.2: The substring automaton agrees with a naive substring search for every spelling of every term
+def test_matcher_matches_naive_substring_search():
+    rng = random.Random(1809)
+    vocab = PROHIBITED_THEMES_KEYWORDS + RESTRICTED_THEMES_KEYWORDS + RESTRICTED_COUNTRY_KEYWORDS + ["a", "the", "ad", "-", "_"]
+    matcher = KeywordMatcher({
+        name: [parse_term(t)[0] for t in terms] for name, terms in KEYWORD_MATCHER.categories.items()
+    })
+
+    for _ in range(200):
+        text = " ".join(parse_term(rng.choice(vocab))[0] for _ in range(rng.randint(0, 6)))
+        hits = matcher.scan(text)
+        readings = [normalise_text(text)]
+        readings.append(leet_variant(readings[0]) or "")
+        for name, terms in matcher.categories.items():
+            expected = [t for t in terms if any(v in r for v in term_variants(t) for r in readings)]
+            assert hits.get(name, []) == expected
+
+# M.3: Case, Unicode width, separators, joined-up words and leetspeak all match the listed term
+def test_matcher_normalises_spellings():
+    matcher = TokenMatcher({"a": ["lap dance", "cocaine", "tobacco"]})
+    for text in ["LAP-DANCE", "lap_dance", "lapdance", "Lap  Dance"]:
+        assert matcher.scan(text) == {"a": ["lap dance"]}
+    assert matcher.scan("c0ca1ne_banner.png") == {"a": ["cocaine"]}
+    assert matcher.scan("\uff34\uff2f\uff22\uff21\uff23\uff23\uff2f") == {"a": ["tobacco"]}
+    assert matcher.scan("banner_300x250.png") == {}
+
+# M.4: Exact terms match whole words, prefix terms the start of a word, substring terms anywhere
+def test_token_matcher_modes():
+    matcher = TokenMatcher({"a": ["green", "weapon*", "*porn*", "oil company", "hate"]})
+    assert matcher.scan("evergreen_whatever_toiletries.png") == {}
+    assert matcher.scan("GreenWeaponsSale.png") == {"a": ["green", "weapon"]}
+    assert matcher.scan("sweaponry") == {}
+    assert matcher.scan("antiporn-oil-company") == {"a": ["porn", "oil company"]}
+    assert matcher.scan("oil companies") == {}
+
+# Filenames and metadata that should go straight through, and ones that must still be caught
+BENIGN_CORPUS = [
+    ("evergreen_summer_sale_300x250.png", {"category": "retail"}),
+    ("economy_class_fares.jpg", {"category": "travel"}),
+    ("whatever_the_weather.png", {"category": "fashion"}),
+    ("method_cleaning_spray.png", {"category": "household"}),
+    ("charity_run.png", {"audience": "kidney patients"}),
+    ("devoted_pet_care.png", {"category": "pets"}),
+    ("greenwich_market_tour.png", {"market": "UK", "placement": "roadside"}),
+    ("firestone_tyres.png", {"category": "automotive"}),
+    ("seconds_left_sale.png", {"category": "retail"}),
+    ("bottomless_brunch_menu.png", {"category": "restaurants"}),
+    ("tokenring_networking.png", {"category": "technology"}),
+    ("ecommerce_platform.png", {"category": "software"}),
+    ("fireplace_collection.png", {"category": "home"}),
+    ("scunthorpe_fc_tickets.png", {"category": "sport"}),
+    ("heroine_book_launch.png", {"category": "books"}),
+    ("screaming_deals.png", {"category": "retail"}),
+    ("exuberant_colours.png", {"category": "paint"}),
+    ("chateau_breakfast.png", {"category": "hotels"}),
+    ("SomethingForEveryone.png", {"category": "retail"}),
+    ("burgundy_coats.png", {"category": "fashion"}),
+    ("piranha_aquarium.png", {"category": "attractions"}),
+    ("lunch_menu.png", {"audience": "canteen staff"}),
+    ("hated_mondays_coffee.png", {"category": "coffee"}),
+    ("ArtDecoLamps.png", {"category": "home"}),
+    ("gunther_bakery.png", {"category": "food"}),
+    ("GundamModelKits.png", {"category": "toys"}),
+    ("brass_sextant_replica.png", {"category": "gifts"}),
+    ("sexton_family_solicitors.png", {"category": "legal"}),
+    ("cigarbox_guitars.png", {"category": "music"}),
+    ("nazir_tailoring.png", {"category": "fashion"}),
+]
+
+FLAGGED_CORPUS = [
+    ("tobacco_promo.png", {}),
+    ("LapDance_club.png", {}),
+    ("weapons-sale.png", {}),
+    ("GunsForSale.png", {}),
+    ("gunshots_game.png", {}),
+    ("sexy-lingerie.png", {}),
+    ("sexual_health_clinic.png", {}),
+    ("cigars_and_whisky.png", {}),
+    ("nazis_documentary.png", {}),
+    ("c0ca1ne.png", {}),
+    ("green_energy.png", {}),
+    ("eco-friendly-bags.png", {}),
+    ("vape_deals.png", {}),
+    ("banner.png", {"market": "iran"}),
+    ("banner.png", {"category": "alcohol", "audience": "kids"}),
+    ("banner.png", {"placement": "school playground"}),
+]
+
+def needs_review(matcher, filename: str, meta: dict) -> bool:
+    statuses = [check_filename(filename, matcher)[0], check_metadata(Metadata(**meta), matcher)[0]]
+    return any(status != STATUS_APPROVED for status in statuses)
+
+# M.5: Over a corpus of everyday creatives, word-boundary matching sends far fewer to review than
+# substring matching did, while everything that should be flagged still is
+def test_token_matching_cuts_review_volume():
+    substring = KeywordMatcher({
+        name: [parse_term(t)[0] for t in terms] for name, terms in KEYWORD_MATCHER.categories.items()
+    })
+
+    before = sum(needs_review(substring, *item) for item in BENIGN_CORPUS)
+    after = sum(needs_review(KEYWORD_MATCHER, *item) for item in BENIGN_CORPUS)
+    assert (before, after) == (len(BENIGN_CORPUS), 0)
+
+    assert all(needs_review(KEYWORD_MATCHER, *item) for item in FLAGGED_CORPUS)
@@ -0,0 +1,33 @@
+from src.metrics import REGISTRY, Histogram, STAGE_DURATION, RESULTS
+from tests.test_img_gen import make_high_contrast_png
+
+# P.1: Histogram buckets are cumulative, with sum and count
+def test_histogram_render():
+    histogram = Histogram("t_seconds", "test", ("stage",), buckets=(0.1, 1.0))
+    histogram.observe(0.05, stage="a")
+    histogram.observe(0.5, stage="a")
+    histogram.observe(5, stage="a")
+    assert histogram.render() == [
+        't_seconds_bucket{stage="a",le="0.1"} 1',
+        't_seconds_bucket{stage="a",le="1.0"} 2',
+        't_seconds_bucket{stage="a",le="+Inf"} 3',
+        't_seconds_sum{stage="a"} 5.55',
+        't_seconds_count{stage="a"} 3',
+    ]
+
+# P.2: An approval records every stage it ran, its outcome, and shows up on /metrics
+async def test_metrics_endpoint(client):
+    REGISTRY.reset()
+    img = make_high_contrast_png(400, 400)
+    await client.post("/creative-approval", files={"file": ("test.png", img, "image/png")})
+
+    for stage in ("upload_read", "cache_lookup", "header", "pixel_analysis", "filename_check", "metadata_check"):
+        assert STAGE_DURATION.count(stage=stage) == 1
+    assert RESULTS.value(status="APPROVED", format="PNG") == 1
+
+    response = await client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    assert 'creative_results_total{status="APPROVED",format="PNG"} 1' in response.text
+    assert "creative_pixels_decoded_total 160000" in response.text
+    assert "# TYPE creative_stage_duration_seconds histogram" in response.text
@@ -0,0 +1,90 @@
+import io
+import shutil
+import time
+import pytest
+from PIL import Image, ImageChops, ImageDraw, ImageFont
+from src.executor import ENGINE
+from src.engine import RULE_ENGINE
+from src.ocr import OCR_CACHE, OCR_ENGINES, recognise_text, text_regions
+
+LINES = [((100, 150), "SUMMER SALE 50% OFF", 48), ((700, 420), "tobacco", 32)]
+
+# A 1200x600 banner: a dark strip along the top, and two lines of text
+def make_banner() -> Image.Image:
+    img = Image.new("L", (1200, 600), 255)
+    draw = ImageDraw.Draw(img)
+    draw.rectangle([0, 0, 1200, 60], fill=30)
+    for position, text, size in LINES:
+        draw.text(position, text, font=ImageFont.load_default(size=size), fill=0)
+    return img
+
+def png(img: Image.Image) -> bytes:
+    buf = io.BytesIO()
+    img.convert("RGB").save(buf, format="PNG")
+    return buf.getvalue()
+
+def ink_box(position, text, size) -> tuple[int, int, int, int]:
+    img = Image.new("L", (1200, 600), 255)
+    ImageDraw.Draw(img).text(position, text, font=ImageFont.load_default(size=size), fill=0)
+    return ImageChops.invert(img).getbbox()
+
+@pytest.fixture
+def fake_ocr(monkeypatch):
+    calls = []
+
+    def read(image: Image.Image, languages: str, timeout: float) -> str:
+        calls.append(image.size)
+        return "Buy tobacco now" if image.width < 200 else "summer sale"
+
+    monkeypatch.setitem(OCR_ENGINES, "fake", read)
+    monkeypatch.setattr(ENGINE, "mode", "inline")
+    monkeypatch.setattr(RULE_ENGINE.ruleset_for(None), "ocr_engine", "fake")
+    OCR_CACHE.clear()
+    yield calls
+    OCR_CACHE.clear()
+
+# O.1: Each line of text is found as its own region, largest first; flat areas and solid blocks aren't text
+def test_text_regions():
+    regions = text_regions(make_banner())
+    assert len(regions) == len(LINES)
+    for (left, top, right, bottom), line in zip(regions, LINES):
+        ink = ink_box(*line)
+        assert left <= ink[0] and top <= ink[1] and right >= ink[2] and bottom >= ink[3]
+        assert (right - left) * (bottom - top) < 1.5 * (ink[2] - ink[0]) * (ink[3] - ink[1]) + 2000
+
+# O.2: Recognised text goes through the keyword lists; a repeat of the same image is served from the cache,
+# and OCR doesn't run at all once a cheaper check has rejected the creative
+async def test_text_check(client, fake_ocr):
+    contents = png(make_banner())
+    response = await client.post("/creative-approval", files={"file": ("banner.png", contents, "image/png")})
+    assert response.json()["status"] == "REJECTED"
+    assert "Prohibited term found in image text: tobacco" in response.json()["reasons"]
+    assert len(fake_ocr) == 2
+
+    await client.post("/creative-approval", files={"file": ("renamed.png", contents, "image/png")})
+    assert len(fake_ocr) == 2
+
+    OCR_CACHE.clear()
+    response = await client.post("/creative-approval", files={"file": ("tobacco_banner.png", contents, "image/png")})
+    assert response.json()["status"] == "REJECTED"
+    assert len(fake_ocr) == 2
+
+# O.3: Recognition stops when the time budget runs out, and says so
+def test_ocr_budget(monkeypatch):
+    def slow(image: Image.Image, languages: str, timeout: float) -> str:
+        time.sleep(0.2)
+        return "summer sale"
+
+    monkeypatch.setitem(OCR_ENGINES, "slow", slow)
+    result = recognise_text(png(make_banner()), "slow", "eng", budget=0.1)
+    assert (result.text, result.regions, result.timed_out) == ("summer sale", 1, True)
+
+    result = recognise_text(png(make_banner()), "slow", "eng", budget=5)
+    assert (result.regions, result.timed_out) == (2, False)
+
+# O.4: Tesseract reads the banner, where it's installed
+@pytest.mark.skipif(shutil.which("tesseract") is None, reason="tesseract is not installed")
+def test_tesseract():
+    pytest.importorskip("pytesseract")
+    result = recognise_text(png(make_banner()), "tesseract", "eng", budget=10)
+    assert "tobacco" in result.text.lower()
@@ -0,0 +1,90 @@
+import io
+import json
+import random
+from PIL import Image, ImageEnhance
+from src.config import PHASH_MAX_DISTANCE
+from src.phash import PerceptualIndex, dhash, hamming
+from tests.benchmarks.corpus import make_image
+
+def encode(img: Image.Image, format: str, **options) -> bytes:
+    buf = io.BytesIO()
+    img.save(buf, format=format, **options)
+    return buf.getvalue()
+
+# P.1: Re-encodes, small re-crops and colour tweaks stay within PHASH_MAX_DISTANCE; a different creative doesn't
+def test_dhash_near_duplicates():
+    from src.services import perceptual_hash
+
+    original = make_image(1200, 900)
+    base = perceptual_hash(encode(original, "PNG"))
+    variants = [
+        encode(original, "JPEG", quality=60),
+        encode(original.crop((12, 9, 1188, 891)), "PNG"),
+        encode(ImageEnhance.Brightness(original).enhance(1.1), "JPEG", quality=85),
+        encode(original.resize((600, 450)), "PNG"),
+    ]
+    for variant in variants:
+        assert hamming(base, perceptual_hash(variant)) <= PHASH_MAX_DISTANCE
+
+    assert hamming(base, dhash(make_image(1200, 900, seed=1))) > PHASH_MAX_DISTANCE
+
+# P.2: Multi-index lookup finds exactly the nearest hash brute force finds - while background merges come
+# and go, and after them - and the index survives a reopen
+def test_index_matches_brute_force(tmp_path, monkeypatch):
+    monkeypatch.setattr("src.phash.MIN_PENDING", 128)
+    rng = random.Random(0)
+    path = str(tmp_path / "phash.sqlite3")
+    index = PerceptualIndex(path, max_distance=6)
+    hashes = [rng.getrandbits(64) for _ in range(2000)]
+    for value in hashes:
+        index.add(value, "v1", {"contrast_check": ("APPROVED", [])})
+
+    reopened = PerceptualIndex(path, max_distance=6)
+    for _ in range(200):
+        query = rng.choice(hashes)
+        for bit in rng.sample(range(64), rng.randrange(9)):
+            query ^= 1 << bit
+        nearest = min(hamming(query, value) for value in hashes)
+
+        match = reopened.lookup(query, "v1")
+        assert (match.distance if match else None) == (nearest if nearest <= 6 else None)
+        assert reopened.lookup(query, "v2") is None
+
+    reopened.wait_for_merge()
+    assert len(reopened) == reopened._merged() == len(set(hashes))
+
+# P.3: A near-duplicate gets the earlier decision as a hint; with the fast path its pixels aren't analysed
+async def test_near_duplicate_hint_and_fast_path(client, monkeypatch):
+    from src.engine import RULE_ENGINE
+
+    original = make_image(1200, 900)
+    first = await client.post("/creative-approval", files={"file": ("a.png", encode(original, "PNG"), "image/png")})
+    assert first.json()["near_duplicate"] is None
+
+    reencoded = encode(original, "JPEG", quality=70)
+    hinted = (await client.post("/creative-approval", files={"file": ("a.jpg", reencoded, "image/jpeg")})).json()
+    assert hinted["near_duplicate"]["status"] == first.json()["status"]
+    assert hinted["near_duplicate"]["distance"] <= PHASH_MAX_DISTANCE
+
+    ruleset = RULE_ENGINE.ruleset_for(None)
+    monkeypatch.setattr(ruleset, "phash_mode", "fast_path")
+    monkeypatch.setattr("src.engine.analyse_image", lambda *args: 1 / 0)
+    cropped = encode(original.crop((6, 6, 1194, 894)), "JPEG", quality=80)
+    fast = (await client.post("/creative-approval", files={"file": ("b.jpg", cropped, "image/jpeg")})).json()
+    assert fast["status"] == first.json()["status"]
+    assert fast["near_duplicate"] is not None
+
+# P.4: Only pixel check outcomes are kept - a look-alike never sees the earlier creative's filename or metadata reasons
+async def test_near_duplicate_only_pixel_outcomes(client):
+    original = make_image(1200, 900, seed=3)
+    first = await client.post(
+        "/creative-approval",
+        files={"file": ("lottery.png", encode(original, "PNG"), "image/png")},
+        data={"metadata": json.dumps({"audience": "kids", "category": "tobacco"})}
+    )
+    assert first.json()["status"] == "REJECTED"
+
+    lookalike = await client.post("/creative-approval", files={"file": ("a.jpg", encode(original, "JPEG", quality=70), "image/jpeg")})
+    near_duplicate = lookalike.json()["near_duplicate"]
+    assert near_duplicate["status"] == lookalike.json()["status"] == "APPROVED"
+    assert near_duplicate["reasons"] == []
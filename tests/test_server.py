@@ -0,0 +1,67 @@
+import contextlib
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
+import httpx
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+# Run python -m src.server on a free port until the block exits, then SIGTERM it and wait for the drain
+@contextlib.contextmanager
+def serve(tmp_path, workers: int, **env):
+    port = free_port()
+    env = {
+        **os.environ,
+        "SERVER_HOST": "127.0.0.1",
+        "SERVER_PORT": str(port),
+        "SERVER_WORKERS": str(workers),
+        "JOBS_SQLITE_PATH": str(tmp_path / "jobs.sqlite3"),
+        "PHASH_SQLITE_PATH": str(tmp_path / "phash.sqlite3"),
+        **{name: str(value) for name, value in env.items()}
+    }
+    process = subprocess.Popen([sys.executable, "-m", "src.server"], env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    url = f"http://127.0.0.1:{port}"
+    try:
+        deadline = time.monotonic() + 30
+        while True:
+            try:
+                httpx.get(f"{url}/health")
+                break
+            except httpx.TransportError:
+                if time.monotonic() > deadline or process.poll() is not None:
+                    raise RuntimeError("Server did not start")
+                time.sleep(0.1)
+        yield url, process
+    finally:
+        if process.poll() is None:
+            process.send_signal(signal.SIGTERM)
+            process.wait(timeout=30)
+
+# SV.1: Workers are replaced after SERVER_MAX_REQUESTS requests without dropping any - on new connections or
+# kept-alive ones, which are closed from the server side at the limit - and SIGTERM drains and exits cleanly
+def test_server_recycles_and_drains(tmp_path):
+    with serve(tmp_path, workers=2, SERVER_MAX_REQUESTS=2, SERVER_MAX_REQUESTS_JITTER=0) as (url, process):
+        assert [httpx.get(f"{url}/health").status_code for _ in range(8)] == [200] * 8
+
+        with httpx.Client() as client:
+            responses = [client.get(f"{url}/health") for _ in range(8)]
+        assert [response.status_code for response in responses] == [200] * 8
+        assert any(response.headers.get("connection") == "close" for response in responses)
+
+        # Connections accepted before a worker reached its limit are still served
+        port = int(url.rsplit(":", 1)[1])
+        connections = [socket.create_connection(("127.0.0.1", port), timeout=10) for _ in range(6)]
+        time.sleep(0.2)
+        for connection in connections:
+            with connection:
+                connection.sendall(b"GET /health HTTP/1.1\r\nHost: localhost\r\n\r\n")
+                assert connection.recv(12) == b"HTTP/1.1 200"
+
+        process.send_signal(signal.SIGTERM)
+        assert process.wait(timeout=30) == 0
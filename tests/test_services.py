@@ -0,0 +1,132 @@
+import io
+import pytest
+from fastapi import HTTPException, UploadFile
+from src.config import UPLOAD_CHUNK_BYTES
+from src.services import read_file
+
+# S.1: Oversized upload of unknown size is cut off after at most one chunk past the limit
+async def test_read_file_stops_at_limit():
+    body = io.BytesIO(b"\0" * (UPLOAD_CHUNK_BYTES * 10))
+    upload = UploadFile(file=body)
+
+    with pytest.raises(HTTPException) as exc:
+        await read_file(upload, max_bytes=UPLOAD_CHUNK_BYTES * 2)
+
+    assert exc.value.status_code == 422
+    assert body.tell() <= UPLOAD_CHUNK_BYTES * 3
+
+# S.2: Upload within the limit is returned whole
+async def test_read_file_within_limit():
+    upload = UploadFile(file=io.BytesIO(b"x" * (UPLOAD_CHUNK_BYTES + 1)))
+    assert len(await read_file(upload, max_bytes=UPLOAD_CHUNK_BYTES * 2)) == UPLOAD_CHUNK_BYTES + 1
+
+def png_header(width: int, height: int) -> bytes:
+    import struct, zlib
+    ihdr = struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)
+    chunk = lambda kind, data: struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+    return b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", ihdr) + chunk(b"IEND", b"")
+
+# S.3: Header-only PNG claiming 15000x10000px → dimensions read without decoding, decode refused
+def test_read_image_header_does_not_decode():
+    from PIL import Image
+    from src.services import ImageRejected, decode_image, read_image_header
+
+    png = png_header(15000, 10000)
+    with pytest.warns(Image.DecompressionBombWarning):
+        assert read_image_header(png) == ("PNG", 15000, 10000)
+        with pytest.raises(ImageRejected):
+            decode_image(png)
+
+# S.4: Estimated contrast stays close to the exact score, and drafted JPEGs fall back to exact when low
+def test_contrast_estimate_matches_exact():
+    from PIL import Image
+    from tests.test_img_gen import make_high_contrast_png
+    from src.services import analyse_image, calculate_contrast, estimate_contrast
+
+    png = make_high_contrast_png(3000, 2000).getvalue()
+    exact = analyse_image(png, contrast_mode="exact").contrast
+    assert abs(analyse_image(png, contrast_mode="estimate").contrast - exact) < 0.5
+
+    noise = Image.effect_noise((2000, 2000), 10).convert("RGB")
+    buf = io.BytesIO()
+    noise.save(buf, format="JPEG")
+    jpeg = buf.getvalue()
+    assert analyse_image(jpeg, contrast_mode="estimate").contrast == analyse_image(jpeg, contrast_mode="exact").contrast
+    assert estimate_contrast(noise) == pytest.approx(calculate_contrast(noise), abs=0.5)
+
+# S.5: An upload spooled to disk is memory-mapped, not copied, and hashed in the same pass
+async def test_read_file_maps_spooled_upload():
+    import hashlib, mmap, pickle, tempfile, tracemalloc
+    from src.services import read_image_header
+    from tests.test_img_gen import make_high_contrast_png
+
+    png = make_high_contrast_png(2000, 2000).getvalue() + b"\0" * (3 * 1024 * 1024)
+    spool = tempfile.SpooledTemporaryFile(max_size=1024 * 1024)
+    spool.write(png)
+    spool.seek(0)
+    upload = UploadFile(file=spool, size=len(png))
+
+    tracemalloc.start()
+    buffer = await read_file(upload)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    assert isinstance(buffer.data, mmap.mmap)
+    assert peak < 256 * 1024
+    assert buffer.digest == hashlib.sha256(png).hexdigest()
+    assert read_image_header(buffer) == ("PNG", 2000, 2000)
+
+    # Worker processes get the bytes and the digest already taken
+    copy = pickle.loads(pickle.dumps(buffer))
+    assert bytes(copy) == png and copy.digest == buffer.digest
+
+# S.6: Contrast matches the ImageStat score in every mode; luminance ratio spans 1:1 to 21:1
+def test_analyser_contrast_and_luminance():
+    from PIL import Image, ImageStat
+    from tests.test_img_gen import make_high_contrast_png
+    from src.analyser import FrameAnalyser
+    from src.services import analyse_image
+
+    img = Image.open(make_high_contrast_png(300, 200))
+    for mode in ("RGB", "RGBA", "L", "P", "CMYK"):
+        frame = img.convert(mode)
+        assert FrameAnalyser().contrast(frame) == pytest.approx(ImageStat.Stat(frame.convert("L")).stddev[0])
+
+    analysis = analyse_image(make_high_contrast_png(300, 200).getvalue())
+    assert analysis.luminance_ratio == pytest.approx(21)
+    assert 0 < analysis.mean_luminance < 1
+
+    buf = io.BytesIO()
+    Image.new("RGB", (300, 200), "grey").save(buf, format="PNG")
+    assert analyse_image(buf.getvalue()).luminance_ratio == pytest.approx(1)
+
+# S.7: GIF frames are only decoded for flashes when their timing allows more than the threshold
+def test_gif_flash_analysis_skipped_when_too_slow():
+    from src.services import analyse_image
+    from tests.test_img_gen import make_test_gif
+    slow = make_test_gif(40, 30, 20, 200).getvalue()
+    skipped = analyse_image(slow)
+    assert (skipped.frame_count, skipped.flashes_per_second, skipped.pixels_decoded) == (20, 0, 40 * 30)
+
+    analysed = analyse_image(slow, max_flashes=2)
+    assert analysed.flashes_per_second == 3
+    assert analysed.pixels_decoded > 40 * 30
+
+# S.8: PIL's bomb guard is the decode budget - an image over twice it is refused from its header alone, and
+# a GIF frame larger than the screen it's drawn on is refused rather than decoded
+def test_pixel_budget():
+    import struct
+    from PIL import Image
+    from src.services import ImageRejected, MAX_IMAGE_PIXELS, analyse_image, read_image_header
+    from tests.test_img_gen import make_test_gif
+
+    assert Image.MAX_IMAGE_PIXELS == MAX_IMAGE_PIXELS
+    with pytest.raises(ImageRejected, match="Image too large to decode: over"):
+        read_image_header(png_header(20000, 20000))
+
+    data = make_test_gif(10, 10, 3, 50).getvalue()
+    descriptor = b"\x2c\0\0\0\0\x0a\0\x0a\0"
+    second = data.index(descriptor, data.index(descriptor) + 1)
+    oversized = data[:second + 5] + struct.pack("<HH", 5000, 5000) + data[second + 9:]
+    with pytest.raises(ImageRejected, match="Invalid or unreadable"):
+        analyse_image(oversized, max_flashes=0)
@@ -0,0 +1,55 @@
+import json
+import os
+import subprocess
+import sys
+from src.matcher import KEYWORD_MATCHER, TokenMatcher, compile_matcher, matcher_artifact_path
+
+# Budget for `import src.main` in a fresh interpreter - the cold start of every worker and container
+IMPORT_BUDGET_SECONDS = float(os.getenv("IMPORT_BUDGET_SECONDS", 1.5))
+
+# Modules the app must not load at import time - they're only needed once an image is analysed or a webhook sent
+DEFERRED_MODULES = ("numpy", "httpx", "src.analyser", "PIL.TiffImagePlugin", "PIL.WebPImagePlugin")
+
+IMPORT_SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+import src.main
+print(json.dumps({"seconds": time.perf_counter() - start, "modules": sorted(sys.modules)}))
+"""
+
+def import_main(env: dict) -> dict:
+    output = subprocess.run(
+        [sys.executable, "-c", IMPORT_SCRIPT], env={**os.environ, **env}, capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(output)
+
+# ST.1: src.main imports within the budget (best of three), without NumPy, httpx or unused PIL plugins
+def test_import_time_budget(tmp_path):
+    env = {"MATCHER_CACHE_DIR": str(tmp_path)}
+    runs = [import_main(env) for _ in range(3)]
+
+    assert min(run["seconds"] for run in runs) < IMPORT_BUDGET_SECONDS
+    assert not set(DEFERRED_MODULES) & set(runs[0]["modules"])
+
+# ST.2: Compiled matchers are cached as artifacts and loaded back with the same results
+def test_matcher_artifact_round_trip(tmp_path):
+    categories = KEYWORD_MATCHER.categories
+    built = compile_matcher(categories, str(tmp_path))
+    assert os.path.exists(matcher_artifact_path(categories, str(tmp_path)))
+
+    loaded = compile_matcher(categories, str(tmp_path))
+    assert loaded is not built and isinstance(loaded, TokenMatcher)
+    for text in ("Kids_Lottery-Promo.png", "c0ca1ne party", "vape shop", "summer sale"):
+        assert loaded.scan(text) == built.scan(text) == TokenMatcher(categories).scan(text)
+
+    # A corrupt artifact is rebuilt, not trusted
+    with open(matcher_artifact_path(categories, str(tmp_path)), "wb") as artifact:
+        artifact.write(b"not a pickle")
+    assert compile_matcher(categories, str(tmp_path)).scan("vape shop") == built.scan("vape shop")
+
+# ST.3: Artifacts are keyed by the matcher's code as well as the term lists - a changed matcher.py never loads an old one
+def test_matcher_artifact_keyed_by_source(tmp_path, monkeypatch):
+    categories = KEYWORD_MATCHER.categories
+    before = matcher_artifact_path(categories, str(tmp_path))
+    monkeypatch.setattr("src.matcher.MATCHER_SOURCE_DIGEST", "edited")
+    assert matcher_artifact_path(categories, str(tmp_path)) != before
@@ -0,0 +1,60 @@
+import json
+import os
+import pytest
+from src.engine import RuleEngine
+from src.matcher import RESTRICTED, PROHIBITED
+from src.models import Metadata
+from src.terms_store import TermsStore, BUILTIN_INDEX
+from tests.test_img_gen import make_high_contrast_png
+
+# K.1: A terms file replaces the categories it lists; the rest keep their built-in terms
+def test_terms_file_overrides_categories(tmp_path):
+    path = tmp_path / "terms.json"
+    path.write_text(json.dumps({"restricted": ["Lottery", "lottery", " raffle "]}))
+    store = TermsStore(str(path))
+
+    assert store.index.categories[RESTRICTED] == ("lottery", "raffle")
+    assert store.index.categories[PROHIBITED] == BUILTIN_INDEX.categories[PROHIBITED]
+    assert store.index.matcher.scan("Raffle-Night.png") == {RESTRICTED: ["raffle"]}
+    assert store.index.version != BUILTIN_INDEX.version
+    with pytest.raises(AttributeError):
+        store.index.matcher = None
+
+# K.2: A directory of <category>.txt files reloads atomically; a broken source keeps the previous index
+def test_terms_directory_reload(tmp_path):
+    (tmp_path / "restricted.txt").write_text("lottery\n# comment\nraffle  # inline\n")
+    store = TermsStore(str(tmp_path))
+    seen = []
+    store.subscribe(seen.append)
+    first = store.index
+    assert first.categories[RESTRICTED] == ("lottery", "raffle")
+
+    (tmp_path / "restricted.txt").write_text("bingo\n")
+    os.utime(tmp_path / "restricted.txt", ns=(0, 1))
+    assert store.reload_if_changed()
+    assert store.index.categories[RESTRICTED] == ("bingo",)
+    assert seen == [store.index]
+    assert first.categories[RESTRICTED] == ("lottery", "raffle")
+
+    (tmp_path / "unknown.txt").write_text("anything\n")
+    assert not store.reload_if_changed()
+    assert store.index.categories[RESTRICTED] == ("bingo",)
+
+# K.3: The rule engine recompiles on new terms, and its rule set versions change with them
+async def test_rule_engine_follows_terms(tmp_path):
+    path = tmp_path / "terms.json"
+    path.write_text(json.dumps({"restricted": ["lottery"]}))
+    store = TermsStore(str(path))
+    engine = RuleEngine(None, store)
+    version = engine.ruleset_for(None).version
+    img = make_high_contrast_png(400, 400).getvalue()
+
+    result = await engine.ruleset_for(None).evaluate(img, "bingo_night.png", Metadata())
+    assert result.reasons == []
+
+    path.write_text(json.dumps({"restricted": ["lottery", "bingo"]}))
+    os.utime(path, ns=(0, 1))
+    assert store.reload_if_changed()
+    result = await engine.ruleset_for(None).evaluate(img, "bingo_night.png", Metadata())
+    assert [str(reason) for reason in result.reasons] == ["Restricted term in filename: bingo"]
+    assert engine.ruleset_for(None).version != version